@@ -0,0 +1,148 @@
+"""
+Allocation check for the UDP receive path (tracemalloc).
+
+Two measurements:
+
+1. Parser: transient memory allocated while dispatching one MOVE datagram,
+   for the in-place parser (_dispatch_datagram) versus the old
+   decode/split/int path (parse_input_packet).
+2. Receive loop: net memory still allocated in network.py after a steady
+   stream of loopback datagrams through UDPInputListener's receive loop
+   (run on the calling thread, so the result is deterministic).
+
+Exits non-zero if the in-place parser allocates, or if the receive loop
+keeps memory per packet. Small deltas are used on purpose: CPython caches
+ints -5..256, while larger values (e.g. ABS positions) create int objects
+that are freed again right away.
+
+Usage:
+    python3 -m server.alloc_check --packets 20000
+"""
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import tracemalloc
+
+from . import network
+from .network import UDPInputListener, parse_input_packet
+
+PACKET = b"MOVE 3 -2"
+
+
+def _peak_bytes(func, repeat: int) -> int:
+    """Peak memory above the starting point while calling func repeat times."""
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()[0]
+    for _ in range(repeat):
+        func()
+    return tracemalloc.get_traced_memory()[1] - start
+
+
+def transient_bytes(func, repeat: int) -> int:
+    """Like _peak_bytes, minus what the measuring loop itself allocates."""
+    baseline = _peak_bytes(lambda: None, repeat)
+    return max(0, _peak_bytes(func, repeat) - baseline)
+
+
+def check_parser(repeat: int) -> dict:
+    """Transient bytes per dispatch: in-place parser vs. the legacy path."""
+    listener = UDPInputListener(lambda ip: True, lambda dx, dy: None, lambda v, h: None, port=0)
+    buf = listener._buffer
+    buf[:len(PACKET)] = PACKET
+    n = len(PACKET)
+    
+    def legacy():
+        parse_input_packet(bytes(PACKET))
+    
+    # Warm up (method caches, first-call allocations)
+    for _ in range(100):
+        listener._dispatch_datagram(buf, n)
+        legacy()
+    
+    return {
+        "in_place": transient_bytes(lambda: listener._dispatch_datagram(buf, n), repeat),
+        "legacy": transient_bytes(legacy, repeat),
+    }
+
+
+def check_receive_loop(packets: int) -> int:
+    """
+    Net bytes allocated in network.py across a steady packet stream.
+    
+    The receive loop runs on this thread, in batches that fit the socket
+    buffer, and returns once the batch is dispatched. The snapshots are
+    therefore never taken in the middle of a datagram, so the result does
+    not depend on thread timing.
+    """
+    received = [0, 0]  # Dispatched so far, end of the current batch
+    
+    def on_move(dx: int, dy: int):
+        received[0] += 1
+        if received[0] >= received[1]:
+            listener._running = False  # Leave _listen_loop after this datagram
+    
+    listener = UDPInputListener(lambda ip: True, on_move, lambda v, h: None, port=0)
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.settimeout(0.1)
+    receiver.bind(("127.0.0.1", 0))
+    listener._socket = receiver
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    target = receiver.getsockname()
+    
+    def send(count: int):
+        while count > 0:
+            batch = min(count, 64)  # Stay below the socket buffer
+            for _ in range(batch):
+                sender.sendto(PACKET, target)
+            received[1] = received[0] + batch
+            # A lost datagram would leave the loop waiting: end it after a while
+            guard = threading.Timer(5.0, setattr, (listener, "_running", False))
+            guard.start()
+            listener._running = True
+            listener._listen_loop()
+            guard.cancel()
+            if received[0] < received[1]:
+                raise RuntimeError("loopback datagrams were lost")
+            count -= batch
+    
+    try:
+        send(1000)  # Warm up
+        network_file = os.path.abspath(network.__file__)
+        only_network = [tracemalloc.Filter(True, network_file)]
+        before = tracemalloc.take_snapshot().filter_traces(only_network)
+        send(packets)
+        after = tracemalloc.take_snapshot().filter_traces(only_network)
+    finally:
+        sender.close()
+        receiver.close()
+    return sum(stat.size_diff for stat in after.compare_to(before, "lineno"))
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="tracemalloc check of the UDP receive path")
+    parser.add_argument('--packets', type=int, default=20000,
+                        help='Datagrams sent through the receive loop (default: 20000)')
+    parser.add_argument('--repeat', type=int, default=10000,
+                        help='Parser calls per measurement (default: 10000)')
+    args = parser.parse_args()
+    
+    tracemalloc.start()
+    parse = check_parser(args.repeat)
+    growth = check_receive_loop(args.packets)
+    tracemalloc.stop()
+    
+    print(f"parser transient bytes ({args.repeat} calls): "
+          f"in-place={parse['in_place']} legacy={parse['legacy']}")
+    print(f"receive loop net growth in network.py ({args.packets} packets): {growth} bytes")
+    
+    ok = parse["in_place"] == 0 and growth <= 0
+    print("OK: steady state allocates nothing" if ok else "FAIL: allocations on the receive path")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,15 @@
 """
-Authentication module for 6-digit pairing code.
+Authentication module for 6-digit pairing code and resumable sessions.
 """
 
 import random
+import secrets
 import string
+import threading
 import time
-from typing import Optional
+from typing import Dict, Optional
 
-from .config import AUTH_CODE_LENGTH, AUTH_TIMEOUT
+from .config import AUTH_CODE_LENGTH, AUTH_TIMEOUT, SESSION_TTL, SESSION_TOKEN_BYTES
 
 
 class AuthManager:
@@ -16,12 +18,23 @@ class AuthManager:
     
     The pairing code is displayed on the server console and must be
     entered on the Android client to establish a connection.
+    
+    After a successful pairing the client is handed a session token.
+    Presenting it with RESUME restores the session without a new code.
+    Tokens are single-use (each resume issues a fresh one) and expire
+    SESSION_TTL seconds after they were issued or last refreshed.
+    Sessions survive reset(), which only clears the pairing code.
     """
     
-    def __init__(self):
+    def __init__(self, session_ttl: float = SESSION_TTL):
         self._code: Optional[str] = None
         self._generated_at: Optional[float] = None
         self._authenticated = False
+        
+        # === RESUMABLE SESSIONS ===
+        self._session_ttl = session_ttl
+        self._sessions: Dict[str, float] = {}  # token -> expires_at
+        self._sessions_lock = threading.Lock()
     
     def generate_code(self) -> str:
         """Generate a new 6-digit pairing code."""
@@ -55,6 +68,12 @@ class AuthManager:
         
         return False
     
+    def refresh_code(self) -> Optional[str]:
+        """Restart the lifetime of the current code; returns it (None if there is none)."""
+        if self._code is not None:
+            self._generated_at = time.time()
+        return self._code
+    
     @property
     def is_authenticated(self) -> bool:
         """Check if a client has been authenticated."""
@@ -66,7 +85,52 @@ class AuthManager:
         return self._code
     
     def reset(self):
-        """Reset authentication state."""
+        """Reset authentication state (resumable sessions are kept)."""
         self._code = None
         self._generated_at = None
         self._authenticated = False
+    
+    @property
+    def session_ttl(self) -> float:
+        """Lifetime of a session token in seconds."""
+        return self._session_ttl
+    
+    def issue_session(self) -> str:
+        """Issue a new resumable session token."""
+        token = secrets.token_urlsafe(SESSION_TOKEN_BYTES)
+        now = time.time()
+        with self._sessions_lock:
+            self._purge_expired(now)
+            self._sessions[token] = now + self._session_ttl
+        return token
+    
+    def refresh_session(self, token: str):
+        """Restart the TTL of a token (e.g. when its client disconnects)."""
+        with self._sessions_lock:
+            if token in self._sessions:
+                self._sessions[token] = time.time() + self._session_ttl
+    
+    def resume_session(self, token: str) -> bool:
+        """
+        Consume a session token.
+        
+        Returns True if the token existed and had not expired. The token
+        is invalidated either way; the caller issues a fresh one.
+        """
+        now = time.time()
+        with self._sessions_lock:
+            expires_at = self._sessions.pop(token.strip(), None)
+            self._purge_expired(now)
+        return expires_at is not None and expires_at >= now
+    
+    def has_session(self, token: str) -> bool:
+        """Check if a token is outstanding and unexpired (without consuming it)."""
+        with self._sessions_lock:
+            expires_at = self._sessions.get(token)
+        return expires_at is not None and expires_at >= time.time()
+    
+    def _purge_expired(self, now: float):
+        """Drop expired tokens (caller holds _sessions_lock)."""
+        expired = [token for token, expires_at in self._sessions.items() if expires_at < now]
+        for token in expired:
+            del self._sessions[token]
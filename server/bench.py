@@ -0,0 +1,299 @@
+"""
+Microbenchmarks for the hot-path functions, with a stored baseline.
+
+Each benchmark times one operation (best of several rounds, ns/op, the
+cost of calling an empty function subtracted) and measures the heap it
+allocates transiently (tracemalloc peak above the starting point, B/op;
+0 means the operation is allocation-free):
+
+    udp_parse_packet        UDPInputListener._parse_packet (decode/split/int)
+    udp_dispatch_datagram   UDPInputListener._dispatch_datagram (in place)
+    tcp_process_data        TCPControlListener._process_data: one KEY line,
+                            framing included
+    input_smoother_step     InputSmoother: one packet charged + one step()
+    scroll_smoother_step    ScrollSmoother: one packet charged + one step()
+    uinput_write_event      UInputDevice._write_event into a memfd (or pipe)
+    uinput_sync             UInputDevice._sync into the same stand-in
+    is_authorized_client    ConnectionManager.is_authorized_client
+
+Results are compared against server/bench_baseline.json. Timings depend on
+the machine, so a benchmark only counts as a regression when it is slower
+than the baseline by more than --tolerance, or when it allocates more
+than it did. Refresh the baseline (on the reference machine) together with
+the change that moves it.
+
+Usage:
+    python3 -m server.bench [--check] [--update-baseline] [--only NAME ...]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import threading
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .alloc_check import transient_bytes
+from .config import EV_REL, REL_X
+from .connection import ConnectionManager
+from .network import UDPInputListener, TCPControlListener
+from .simulator import VirtualClock
+from .smoother import InputSmoother, ScrollSmoother
+from .uinput_device import UInputDevice
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+FRAME = 1.0 / 60.0
+CLIENT_IP = "192.168.43.2"
+
+# setup() -> (operation, cleanup)
+Benchmark = Callable[[], Tuple[Callable[[], object], Callable[[], None]]]
+
+
+def _nothing():
+    pass
+
+
+def _udp_listener() -> UDPInputListener:
+    return UDPInputListener(lambda ip: True, lambda dx, dy: None, lambda v, h: None, port=0)
+
+
+def bench_udp_parse_packet():
+    listener = _udp_listener()
+    return (lambda: listener._parse_packet(b"MOVE 3 -2")), _nothing
+
+
+def bench_udp_dispatch_datagram():
+    listener = _udp_listener()
+    buf = listener._buffer
+    packet = b"MOVE 3 -2"
+    buf[:len(packet)] = packet
+    n = len(packet)
+    return (lambda: listener._dispatch_datagram(buf, n)), _nothing
+
+
+def bench_tcp_process_data():
+    listener = TCPControlListener(
+        lambda sock, ip, code: None,
+        lambda button, state: None,
+        lambda key, state: None,
+        lambda ip: None,
+        port=0
+    )
+    client, peer = socket.socketpair()
+    listener._authenticated.add(client)
+    data = b"KEY DOWN KEY_A\n"
+    
+    def cleanup():
+        client.close()
+        peer.close()
+    return (lambda: listener._process_data(client, CLIENT_IP, "", data)), cleanup
+
+
+def bench_input_smoother_step():
+    clock = VirtualClock()
+    smoother = InputSmoother(inject_move=lambda dx, dy: None, clock=clock)
+    
+    def op():
+        smoother.add_movement(4, 2, clock.now)
+        clock.now += FRAME
+        smoother.step(clock.now)
+    return op, _nothing
+
+
+def bench_scroll_smoother_step():
+    clock = VirtualClock()
+    smoother = ScrollSmoother(inject_scroll=lambda v, h: None, hires=True, clock=clock)
+    
+    def op():
+        smoother.add_scroll(1, 0)
+        clock.now += FRAME
+        smoother.step(clock.now)
+    return op, _nothing
+
+
+def _event_sink() -> Tuple[int, Callable[[], None], Callable[[], None]]:
+    """
+    A writable fd standing in for /dev/uinput.
+    
+    Returns:
+        (fd, rewind, close); a memfd is rewound between rounds, a pipe is
+        drained by a reader thread
+    """
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create("bench-uinput")
+        return fd, lambda: os.lseek(fd, 0, os.SEEK_SET), lambda: os.close(fd)
+    
+    read_fd, write_fd = os.pipe()
+    
+    def drain():
+        try:
+            while os.read(read_fd, 65536):
+                pass
+        except OSError:
+            pass
+    threading.Thread(target=drain, daemon=True).start()
+    
+    def close():
+        os.close(write_fd)
+        os.close(read_fd)
+    return write_fd, _nothing, close
+
+
+def _bench_device(write: Callable[[UInputDevice], None]):
+    fd, rewind, close = _event_sink()
+    device = UInputDevice("bench")
+    device.fd = fd
+    calls = [0]
+    
+    def op():
+        write(device)
+        calls[0] += 1
+        if calls[0] & 0xFFFF == 0:
+            rewind()  # Keep the memfd small
+    return op, close
+
+
+def bench_uinput_write_event():
+    return _bench_device(lambda device: device._write_event(EV_REL, REL_X, 3))
+
+
+def bench_uinput_sync():
+    return _bench_device(lambda device: device._sync())
+
+
+def bench_is_authorized_client():
+    manager = ConnectionManager()
+    client, peer = socket.socketpair()
+    manager.try_connect(CLIENT_IP, client)
+    
+    def cleanup():
+        client.close()
+        peer.close()
+    return (lambda: manager.is_authorized_client(CLIENT_IP)), cleanup
+
+
+BENCHMARKS: Dict[str, Benchmark] = {
+    "udp_parse_packet": bench_udp_parse_packet,
+    "udp_dispatch_datagram": bench_udp_dispatch_datagram,
+    "tcp_process_data": bench_tcp_process_data,
+    "input_smoother_step": bench_input_smoother_step,
+    "scroll_smoother_step": bench_scroll_smoother_step,
+    "uinput_write_event": bench_uinput_write_event,
+    "uinput_sync": bench_uinput_sync,
+    "is_authorized_client": bench_is_authorized_client,
+}
+
+
+def _best_ns(op: Callable[[], object], number: int, rounds: int) -> float:
+    """Fastest round, in nanoseconds per call."""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            op()
+        best = min(best, (time.perf_counter_ns() - start) / number)
+    return best
+
+
+def run(names: List[str], number: int, rounds: int, alloc_repeat: int) -> Dict[str, Dict[str, float]]:
+    """Run the named benchmarks; returns {name: {"ns_per_op", "bytes_per_op"}}."""
+    overhead = _best_ns(_nothing, number, rounds)
+    results = {}
+    
+    for name in names:
+        op, cleanup = BENCHMARKS[name]()
+        try:
+            for _ in range(1000):
+                op()  # Warm up (caches, thread-local cells, first-call allocations)
+            ns = max(0.0, _best_ns(op, number, rounds) - overhead)
+            
+            tracemalloc.start()
+            allocated = transient_bytes(op, alloc_repeat)
+            tracemalloc.stop()
+        finally:
+            cleanup()
+        results[name] = {"ns_per_op": round(ns, 1), "bytes_per_op": allocated}
+    return results
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, Dict[str, float]]:
+    """Stored results ({} if there is no baseline yet)."""
+    try:
+        with open(path) as f:
+            return json.load(f)["benchmarks"]
+    except FileNotFoundError:
+        return {}
+
+
+def write_baseline(results: Dict[str, Dict[str, float]], path: str = BASELINE_PATH):
+    """Store results with a note of where they were measured."""
+    data = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": results,
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(result: Dict[str, float], baseline: Optional[Dict[str, float]], tolerance: float) -> str:
+    """'' if within the baseline, else what regressed."""
+    if not baseline:
+        return ""
+    problems = []
+    if result["ns_per_op"] > baseline["ns_per_op"] * (1.0 + tolerance):
+        problems.append("slower")
+    if result["bytes_per_op"] > baseline["bytes_per_op"]:
+        problems.append("allocates more")
+    return ", ".join(problems)
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Hot-path microbenchmarks")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='Run only these benchmarks')
+    parser.add_argument('--number', type=int, default=20000, help='Calls per timing round (default: 20000)')
+    parser.add_argument('--rounds', type=int, default=5, help='Timing rounds, best is kept (default: 5)')
+    parser.add_argument('--alloc-repeat', type=int, default=2000,
+                        help='Calls per allocation measurement (default: 2000)')
+    parser.add_argument('--tolerance', type=float, default=1.0,
+                        help='Allowed slowdown against the baseline (default: 1.0 = twice as slow)')
+    parser.add_argument('--check', action='store_true', help='Exit non-zero on a regression')
+    parser.add_argument('--update-baseline', action='store_true', help='Rewrite server/bench_baseline.json')
+    args = parser.parse_args()
+    
+    names = args.only or list(BENCHMARKS)
+    results = run(names, args.number, args.rounds, args.alloc_repeat)
+    baseline = load_baseline()
+    
+    print(f"{'benchmark':24s} {'ns/op':>9} {'base':>9} {'ratio':>6} {'B/op':>6} {'base':>6}")
+    regressions = 0
+    for name in names:
+        result = results[name]
+        base = baseline.get(name)
+        problem = compare(result, base, args.tolerance)
+        regressions += bool(problem)
+        if base:
+            ratio = result["ns_per_op"] / base["ns_per_op"] if base["ns_per_op"] else 0.0
+            print(f"{name:24s} {result['ns_per_op']:>9.1f} {base['ns_per_op']:>9.1f} {ratio:>6.2f} "
+                  f"{result['bytes_per_op']:>6} {base['bytes_per_op']:>6}  {problem}")
+        else:
+            print(f"{name:24s} {result['ns_per_op']:>9.1f} {'-':>9} {'-':>6} {result['bytes_per_op']:>6} {'-':>6}")
+    
+    if args.update_baseline:
+        merged = dict(baseline)
+        merged.update(results)
+        write_baseline(merged)
+        print(f"Baseline written to {BASELINE_PATH}")
+    elif args.check:
+        print("OK: no regressions" if not regressions else f"FAIL: {regressions} regression(s)")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
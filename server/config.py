@@ -15,12 +15,98 @@ SERVER_RESPONSE_PREFIX = "HOTSPOT_KBM_SERVER"
 AUTH_CODE_LENGTH = 6
 AUTH_TIMEOUT = 60  # seconds
 
+# Session resumption (RESUME <token> after a Wi-Fi blip)
+SESSION_TTL = 300         # seconds a token stays valid after issue/disconnect
+SESSION_TOKEN_BYTES = 16  # entropy of each token
+
+# Heartbeat on the control channel (PING/PONG)
+HEARTBEAT_INTERVAL = 1.0  # seconds between server PINGs
+HEARTBEAT_DEADLINE = 5.0  # seconds without PONG before a client is dead
+RTT_WINDOW = 256          # RTT samples kept for the p99 estimate
+
+# Send-rate feedback to clients (RATE / RATE_ACK)
+RATE_EVAL_INTERVAL = 1.0    # seconds between rate evaluations
+RATE_MIN_HZ = 30            # never ask a client to send slower than this
+RATE_MAX_HZ = 120           # 2x the output frame rate: more gains nothing
+RATE_OVERRUN_HIGH = 0.05    # share of overrun frames that counts as "falling behind"
+RATE_OVERRUN_LOW = 0.01     # share below which the rate may go back up
+RATE_INBOX_HIGH_FRAMES = 4  # frames' worth of packets waiting in the smoother inbox
+RATE_HYSTERESIS = 0.1       # minimum relative change worth announcing
+
+# Input inter-arrival statistics
+INPUT_STROKE_GAP = 0.25     # seconds; longer gaps are pauses between strokes
+
+# Tuned smoother parameters (server defaults, also replayed by the simulator)
+INPUT_SMOOTHER_PARAMS = {
+    "target_fps": 60,
+    "discharge_rate": 0.16,           # Discharge 16% of buffer per frame (smooth)
+    "continuation_timeout_ms": 100,   # 100ms momentum after input stops
+    "smoothing_factor": 0.35,
+    "velocity_decay": 0.65,           # 65% decay for precision control
+}
+SCROLL_SMOOTHER_PARAMS = {
+    "target_fps": 60,
+    "sensitivity": 1.5,               # 1.5x sensitivity (balanced)
+    "discharge_rate": 0.18,           # Slower discharge for smoothness
+    "continuation_timeout_ms": 120,   # Balanced timeout
+    "hires": True,                    # REL_WHEEL_HI_RES output (1/120 notch)
+}
+
+# Adaptive smoother passthrough (dense, steady input skips the capacitor)
+PASSTHROUGH_ENTER_JITTER_MS = 2.0  # jitter below this (and rate >= FPS) ...
+PASSTHROUGH_MIN_PACKETS = 16       # ... for this many packets -> passthrough
+PASSTHROUGH_EXIT_JITTER_MS = 5.0   # jitter above this -> back to the capacitor
+
+# Network thread -> frame loop handoff
+INPUT_INBOX_SIZE = 64  # packets queued per smoother; more are folded into one
+
+# Receive process -> smoother process handoff (--receiver-process)
+IPC_RING_CAPACITY = 4096    # events in the shared-memory ring (power of two)
+IPC_POLL_INTERVAL = 0.0005  # consumer sleep when the ring is empty (seconds)
+
+# Recv-to-inject latency tracking
+LATENCY_TRACK_SAMPLES = 512  # movement samples followed through the capacitor at most
+
+# Session recorder (--record): fixed-size ring file of 64-byte records
+RECORD_CAPACITY = 65536  # records kept (4 MiB file); oldest are overwritten
+
+# Sampling profiler (--profile)
+PROFILE_SAMPLE_INTERVAL = 0.005  # stack samples every 5 ms (200 Hz)
+PROFILE_MAX_DEPTH = 48           # frames kept per sampled stack
+PROFILE_MAX_EVENTS = 200000      # timeline events kept (the most recent ones)
+
+# Asynchronous logging (a listener thread writes; callers only enqueue)
+LOG_QUEUE_SIZE = 10000  # records waiting for the listener; more are dropped
+LOG_RATE_LIMIT = 20.0   # records per second per call site (token bucket)
+LOG_RATE_BURST = 50     # records a call site may emit at once
+
+# Real-time mode for frame/injection threads (--realtime)
+REALTIME_PRIORITY = 10  # SCHED_FIFO priority (low, but above every normal task)
+REALTIME_NICE = -10     # fallback when SCHED_FIFO is not permitted
+
+# Key autorepeat (--key-repeat): the timer heap re-presses the held key
+KEY_REPEAT_DELAY_MS = 500  # Hold time before the first repeat
+KEY_REPEAT_RATE_HZ = 25    # Repeats per second after the delay
+KEY_NO_REPEAT = frozenset({  # Held for chords, never re-pressed
+    "KEY_LEFTCTRL", "KEY_RIGHTCTRL", "KEY_LEFTSHIFT", "KEY_RIGHTSHIFT",
+    "KEY_LEFTALT", "KEY_RIGHTALT", "KEY_LEFTMETA", "KEY_RIGHTMETA", "KEY_CAPSLOCK",
+})
+
 # Server Info
 SERVER_NAME = "HOTSPOT_KBM_SERVER"
 
 # uinput device names
 MOUSE_DEVICE_NAME = "HOTSPOT-KBM-Mouse"
 KEYBOARD_DEVICE_NAME = "HOTSPOT-KBM-Keyboard"
+ABSOLUTE_MOUSE_DEVICE_NAME = "HOTSPOT-KBM-Tablet"
+
+# Absolute pointer (tablet-style clients)
+# Clients send ABS <x> <y> scaled to 0..ABS_AXIS_MAX on both axes
+ABS_AXIS_MAX = 65535
+
+# uinput write backpressure
+# Max reports held per device while the kernel buffer is full (EAGAIN)
+UINPUT_PENDING_MAX = 64
 
 # Key mappings (Linux keycodes)
 # Standard alphanumeric keys
@@ -124,12 +210,23 @@ BUTTON_MAP = {
 EV_SYN = 0x00
 EV_KEY = 0x01
 EV_REL = 0x02
+EV_ABS = 0x03
 
 # Relative axes
 REL_X = 0x00
 REL_Y = 0x01
 REL_WHEEL = 0x08      # Vertical scroll
 REL_HWHEEL = 0x06     # Horizontal scroll
+REL_WHEEL_HI_RES = 0x0b   # Vertical scroll in 1/120 notch units
+REL_HWHEEL_HI_RES = 0x0c  # Horizontal scroll in 1/120 notch units
+
+# One legacy wheel notch in high-resolution units
+WHEEL_HI_RES_UNITS = 120
+
+# Absolute axes
+ABS_X = 0x00
+ABS_Y = 0x01
+ABS_CNT = 64          # Size of the abs arrays in uinput_user_dev
 
 # Sync event
 SYN_REPORT = 0x00
@@ -1,75 +1,104 @@
 """
-Connection manager for single-client enforcement.
+Connection manager for client admission (single-client by default).
 """
 
 import threading
 import socket
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 
 class ConnectionManager:
     """
-    Manages client connections with single-client enforcement.
+    Manages client connections with a configurable client limit.
     
-    Only one client can be connected at a time. New connection
-    attempts are rejected when a client is already connected.
+    By default only one client can be connected at a time and new
+    connection attempts are rejected while it is connected. With
+    max_clients > 1 (multi-client mode, e.g. two phones for a presenter)
+    up to that many clients are admitted, one per IP address, since UDP
+    input is routed to its client by source IP.
     """
     
-    def __init__(self):
+    def __init__(self, max_clients: int = 1):
         self._lock = threading.Lock()
-        self._active_client_ip: Optional[str] = None
-        self._active_client_socket: Optional[socket.socket] = None
-        self._connected = False
+        self._max_clients = max(1, max_clients)
+        self._clients: Dict[str, socket.socket] = {}  # IP -> control socket
     
     def try_connect(self, client_ip: str, client_socket: socket.socket) -> bool:
         """
         Attempt to register a new client connection.
         
-        Returns True if the connection was accepted (no other client connected).
-        Returns False if rejected (another client is already connected).
+        Returns True if the connection was accepted (a slot was free).
+        Returns False if rejected (server full, or this IP already connected).
         """
         with self._lock:
-            if self._connected:
+            if len(self._clients) >= self._max_clients or client_ip in self._clients:
                 return False
             
-            self._active_client_ip = client_ip
-            self._active_client_socket = client_socket
-            self._connected = True
+            self._clients[client_ip] = client_socket
             return True
     
-    def disconnect(self):
-        """Disconnect the current client and allow new connections."""
+    def disconnect(self, client_ip: Optional[str] = None, close: bool = True):
+        """
+        Disconnect a client and free its slot.
+        
+        Args:
+            client_ip: Client to disconnect, or None for all clients
+            close: Close the control socket(s); False only frees the slot
+        """
         with self._lock:
-            if self._active_client_socket:
-                try:
-                    self._active_client_socket.close()
-                except:
-                    pass
-            
-            self._active_client_ip = None
-            self._active_client_socket = None
-            self._connected = False
+            if client_ip is None:
+                sockets = list(self._clients.values())
+                self._clients.clear()
+            else:
+                client_socket = self._clients.pop(client_ip, None)
+                sockets = [client_socket] if client_socket else []
+        
+        if not close:
+            return
+        for client_socket in sockets:
+            try:
+                client_socket.close()
+            except:
+                pass
     
     def is_connected(self) -> bool:
-        """Check if a client is currently connected."""
+        """Check if any client is currently connected."""
+        with self._lock:
+            return bool(self._clients)
+    
+    def is_full(self) -> bool:
+        """Check if no further clients can be admitted."""
         with self._lock:
-            return self._connected
+            return len(self._clients) >= self._max_clients
     
     def is_authorized_client(self, client_ip: str) -> bool:
-        """Check if the given IP is the authorized client."""
+        """Check if the given IP is an authorized client."""
         with self._lock:
-            return self._connected and self._active_client_ip == client_ip
+            return client_ip in self._clients
+    
+    @property
+    def max_clients(self) -> int:
+        """Maximum number of simultaneous clients."""
+        return self._max_clients
+    
+    @property
+    def client_ips(self) -> List[str]:
+        """IPs of all connected clients."""
+        with self._lock:
+            return list(self._clients)
     
     @property
     def active_client(self) -> Optional[Tuple[str, socket.socket]]:
-        """Get the active client info (IP, socket) or None."""
+        """Get the (first) active client info (IP, socket) or None."""
         with self._lock:
-            if self._connected:
-                return (self._active_client_ip, self._active_client_socket)
+            for client_ip, client_socket in self._clients.items():
+                return (client_ip, client_socket)
             return None
     
     @property
     def active_client_ip(self) -> Optional[str]:
-        """Get the active client IP or None."""
+        """Get the (first) active client IP or None."""
         with self._lock:
-            return self._active_client_ip
+            for client_ip in self._clients:
+                return client_ip
+            return None
@@ -56,7 +56,7 @@ class DiscoveryService:
                 data, addr = self._socket.recvfrom(1024)
                 message = data.decode('utf-8', errors='ignore').strip()
                 
-                logger.debug(f"Discovery packet from {addr}: {message}")
+                logger.debug("Discovery packet from %s: %s", addr, message)
                 
                 if message == DISCOVERY_MAGIC:
                     # Only respond if no client is connected
@@ -65,7 +65,7 @@ class DiscoveryService:
                         self._socket.sendto(response, addr)
                         logger.info(f"Sent discovery response to {addr}")
                     else:
-                        logger.debug(f"Ignoring discovery (client already connected)")
+                        logger.debug("Ignoring discovery (client already connected)")
                         
             except socket.timeout:
                 continue
@@ -0,0 +1,220 @@
+"""
+Heartbeat and round-trip time measurement on the TCP control channel.
+
+The server sends PING <seq> to every authenticated client once per
+HEARTBEAT_INTERVAL; the client answers PONG <seq>. Each answer yields an
+RTT sample (EWMA, min and p99 are tracked per client). A client that has
+answered at least one PING and then stays silent past the deadline is
+declared dead, so its UDP authorization is revoked right away instead of
+waiting for the socket to error out. Clients that never answer PING
+(older apps) are not subject to the deadline; once they have stayed
+silent for a full deadline this is logged, so the exemption is visible.
+"""
+
+import threading
+import time
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+import socket
+
+from .config import HEARTBEAT_INTERVAL, HEARTBEAT_DEADLINE, RTT_WINDOW
+from .network import send_nowait
+from .scheduler import TimerScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class RttEstimator:
+    """
+    Round-trip time statistics for one client.
+    
+    - EWMA with the classic TCP gain of 1/8 (smooth, follows trends)
+    - Minimum ever seen (propagation floor)
+    - p99 over the last RTT_WINDOW samples (tail latency)
+    """
+    
+    def __init__(self, window: int = RTT_WINDOW, gain: float = 0.125):
+        self._gain = gain
+        self._window: Deque[float] = deque(maxlen=window)
+        self.ewma: Optional[float] = None
+        self.min: Optional[float] = None
+        self.last: Optional[float] = None
+        self.samples = 0
+    
+    def add_sample(self, rtt: float):
+        """Record one RTT sample in seconds."""
+        self.last = rtt
+        self.samples += 1
+        self._window.append(rtt)
+        self.ewma = rtt if self.ewma is None else self.ewma + self._gain * (rtt - self.ewma)
+        self.min = rtt if self.min is None else min(self.min, rtt)
+    
+    @property
+    def p99(self) -> Optional[float]:
+        """99th percentile over the recent window."""
+        if not self._window:
+            return None
+        ordered = sorted(self._window)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    
+    def as_dict(self) -> Dict[str, Optional[float]]:
+        """Snapshot in milliseconds (for stats output)."""
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000.0, 2) if value is not None else None
+        return {
+            "rtt_ewma_ms": ms(self.ewma),
+            "rtt_min_ms": ms(self.min),
+            "rtt_p99_ms": ms(self.p99),
+            "rtt_last_ms": ms(self.last),
+            "samples": self.samples,
+        }
+
+
+class _PeerState:
+    """Heartbeat bookkeeping for one client."""
+    
+    __slots__ = ("client_socket", "sent", "last_pong", "answered", "exempt", "rtt", "next_seq")
+    
+    def __init__(self, client_socket: socket.socket):
+        self.client_socket = client_socket
+        self.sent: Dict[str, float] = {}  # seq -> send time (monotonic)
+        self.last_pong = time.monotonic()
+        self.answered = False  # Has ever answered: deadline applies
+        self.exempt = False    # Never answered within a deadline (logged once)
+        self.rtt = RttEstimator()
+        self.next_seq = 0
+
+
+class HeartbeatMonitor:
+    """
+    Sends PINGs, matches PONGs and detects dead peers.
+    
+    Runs on the shared TimerScheduler (one recurring timer, no thread of
+    its own). PINGs are sent outside the lock without waiting (send_nowait),
+    so a dead or slow peer never delays the other timers on that heap.
+    """
+    
+    def __init__(
+        self,
+        scheduler: TimerScheduler,
+        on_dead: Callable[[str], None],
+        on_rtt: Optional[Callable[[str, float], None]] = None,
+        interval: float = HEARTBEAT_INTERVAL,
+        deadline: float = HEARTBEAT_DEADLINE
+    ):
+        """
+        Args:
+            scheduler: Shared timer heap
+            on_dead: Callback when a client misses the deadline (client_ip)
+            on_rtt: Optional callback with each new EWMA RTT (client_ip, seconds)
+            interval: Seconds between PINGs
+            deadline: Seconds without PONG before a client is dead (0 = never)
+        """
+        self._scheduler = scheduler
+        self._on_dead = on_dead
+        self._on_rtt = on_rtt
+        self._interval = interval
+        self._deadline = deadline
+        
+        self._peers: Dict[str, _PeerState] = {}
+        self._lock = threading.Lock()
+        self._timer = None
+    
+    def start(self):
+        """Start the recurring heartbeat timer."""
+        if self._timer is None:
+            self._timer = self._scheduler.call_later(self._interval, self._tick)
+    
+    def stop(self):
+        """Stop sending heartbeats."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+    
+    def add_client(self, client_ip: str, client_socket: socket.socket):
+        """Start monitoring an authenticated client."""
+        with self._lock:
+            self._peers[client_ip] = _PeerState(client_socket)
+    
+    def remove_client(self, client_ip: str):
+        """Stop monitoring a client."""
+        with self._lock:
+            self._peers.pop(client_ip, None)
+    
+    def on_pong(self, client_ip: str, seq: str):
+        """Match a PONG <seq> from a client and record the RTT."""
+        now = time.monotonic()
+        with self._lock:
+            peer = self._peers.get(client_ip)
+            if peer is None:
+                return
+            sent_at = peer.sent.pop(seq, None)
+            if sent_at is None:
+                return
+            peer.last_pong = now
+            peer.answered = True
+            peer.rtt.add_sample(now - sent_at)
+            rtt = peer.rtt.ewma
+        
+        if self._on_rtt:
+            self._on_rtt(client_ip, rtt)
+    
+    def rtt(self, client_ip: str) -> Optional[RttEstimator]:
+        """RTT statistics for a client, if monitored."""
+        peer = self._peers.get(client_ip)
+        return peer.rtt if peer else None
+    
+    def stats(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Per-client RTT snapshot (milliseconds)."""
+        with self._lock:
+            return {ip: peer.rtt.as_dict() for ip, peer in self._peers.items()}
+    
+    def _tick(self):
+        """Timer callback: check deadlines and send the next PING to everyone."""
+        now = time.monotonic()
+        dead = []
+        exempt = []
+        pings = []
+        
+        with self._lock:
+            for client_ip, peer in self._peers.items():
+                if self._deadline > 0 and now - peer.last_pong > self._deadline:
+                    if peer.answered:
+                        dead.append(client_ip)
+                        continue
+                    if not peer.exempt:
+                        peer.exempt = True
+                        exempt.append(client_ip)
+                
+                seq = str(peer.next_seq)
+                peer.next_seq += 1
+                peer.sent[seq] = now
+                # Forget PINGs that will never be answered
+                if len(peer.sent) > 16:
+                    peer.sent.pop(next(iter(peer.sent)))
+                pings.append((peer.client_socket, f"PING {seq}\n".encode('utf-8')))
+            
+            for client_ip in dead:
+                del self._peers[client_ip]
+        
+        # I/O outside the lock and never blocking: this is the shared timer thread
+        for client_socket, message in pings:
+            send_nowait(client_socket, message)  # Full buffer or closed: the deadline decides
+        
+        for client_ip in exempt:
+            logger.warning(
+                f"Client {client_ip} does not answer PING; exempt from the "
+                f"{self._deadline:g}s heartbeat deadline"
+            )
+        
+        for client_ip in dead:
+            logger.warning(f"Heartbeat deadline missed: {client_ip}")
+            try:
+                self._on_dead(client_ip)
+            except Exception as e:
+                logger.error(f"Dead-peer handler error: {e}")
+        
+        if self._timer is not None:
+            self._timer = self._scheduler.call_later(self._interval, self._tick)
@@ -0,0 +1,243 @@
+"""
+Priority-separated injection workers.
+
+Without this, every listener and smoother thread writes to the uinput fds
+itself, so under a motion flood a key event waits behind pointer writes
+(and behind the GIL contention they cause). With the injector each device
+is owned by ONE writer thread fed by two lanes:
+
+- Urgent lane: keys, buttons and macro buffers. FIFO, always served first.
+- Motion lane: relative motion, scroll and absolute positions. Coalesced
+  while waiting (deltas are summed, absolute positions are latest-wins),
+  so it holds at most one pending entry per kind however heavy the flood.
+
+The queued devices have the same interface as the devices they wrap, so
+the rest of the server does not change. Enabled with --injector.
+"""
+
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COALESCE_SUM = "sum"        # Add new values to the pending ones (deltas)
+COALESCE_LATEST = "latest"  # Replace the pending values (positions)
+
+
+class DeviceWriter:
+    """
+    Single writer thread for one output device with strict priority.
+    
+    Submitting never blocks on the device: callers only append to a lane
+    under a short lock. Urgent items are written in order, one at a time,
+    re-checking the urgent lane between every write; coalesced motion is
+    written only when no urgent item is waiting.
+    """
+    
+    def __init__(self, name: str, thread_setup: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            name: Device name (for log messages)
+            thread_setup: Optional hook run first on the writer thread (role)
+        """
+        self._name = name
+        self._thread_setup = thread_setup
+        self._cond = threading.Condition()
+        self._urgent: Deque[Tuple[float, Callable[..., None], tuple]] = deque()
+        self._motion: Dict[str, List[Any]] = {}  # kind -> [func, values]
+        
+        # === STATS ===
+        self.urgent_written = 0
+        self.motion_written = 0
+        self.motion_merged = 0      # Motion submissions folded into a pending one
+        self.urgent_wait_max = 0.0  # Worst submit-to-write delay (seconds)
+        self.urgent_wait_last = 0.0
+        
+        # === THREAD CONTROL ===
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        """Start the writer thread."""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop the writer thread after writing what is already queued."""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+    
+    def submit(self, func: Callable[..., None], *args, ordered: bool = False):
+        """
+        Queue an urgent write.
+        
+        Args:
+            func: Device method to call on the writer thread
+            args: Its arguments
+            ordered: Write the motion pending on this device first (a button
+                     edge must land after the movement that preceded it)
+        """
+        now = time.monotonic()
+        with self._cond:
+            if ordered and self._motion:
+                for motion_func, values in self._motion.values():
+                    self._urgent.append((now, motion_func, tuple(values)))
+                self._motion.clear()
+            self._urgent.append((now, func, args))
+            self._cond.notify()
+    
+    def coalesce(self, kind: str, func: Callable[..., None], values: Tuple[int, ...],
+                 mode: str = COALESCE_SUM):
+        """
+        Queue a coalescible write; merges with a pending write of the same kind.
+        
+        Args:
+            kind: Merge key (one pending entry per kind)
+            func: Device method to call with the merged values
+            values: Integer arguments (deltas or a position)
+            mode: COALESCE_SUM or COALESCE_LATEST
+        """
+        with self._cond:
+            pending = self._motion.get(kind)
+            if pending is None:
+                self._motion[kind] = [func, list(values)]
+                self._cond.notify()
+                return
+            
+            self.motion_merged += 1
+            if mode == COALESCE_SUM:
+                merged = pending[1]
+                for index, value in enumerate(values):
+                    merged[index] += value
+            else:
+                pending[1] = list(values)
+    
+    def _write_loop(self):
+        """Serve the urgent lane first, then one batch of coalesced motion."""
+        if self._thread_setup:
+            self._thread_setup(f"writer:{self._name}")
+        
+        while True:
+            with self._cond:
+                while self._running and not self._urgent and not self._motion:
+                    self._cond.wait()
+                
+                if self._urgent:
+                    queued_at, func, args = self._urgent.popleft()
+                    batch = None
+                elif self._motion:
+                    batch = list(self._motion.values())
+                    self._motion.clear()
+                else:
+                    return  # Stopped and drained
+            
+            if batch is None:
+                wait = time.monotonic() - queued_at
+                self.urgent_wait_last = wait
+                if wait > self.urgent_wait_max:
+                    self.urgent_wait_max = wait
+                self._call(func, args)
+                self.urgent_written += 1
+            else:
+                for func, values in batch:
+                    self._call(func, tuple(values))
+                    self.motion_written += 1
+    
+    def _call(self, func: Callable[..., None], args: tuple):
+        """Run one device write, logging instead of killing the thread."""
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error(f"Injection error on {self._name}: {e}")
+    
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Lane counters and urgent latency."""
+        return {
+            "urgent_written": self.urgent_written,
+            "motion_written": self.motion_written,
+            "motion_merged": self.motion_merged,
+            "urgent_wait_max_ms": round(self.urgent_wait_max * 1000.0, 3),
+            "urgent_wait_last_ms": round(self.urgent_wait_last * 1000.0, 3),
+        }
+
+
+class QueuedMouse:
+    """
+    VirtualMouse (or VirtualAbsoluteMouse / NullMouse) behind a DeviceWriter.
+    
+    Clicks use the urgent lane, ordered after the motion already pending;
+    move/scroll/frame deltas and move_to positions are coalesced.
+    """
+    
+    def __init__(self, device, thread_setup: Optional[Callable[[str], None]] = None):
+        self.device = device
+        self.writer = DeviceWriter(getattr(device, "name", "mouse"), thread_setup)
+        self.writer.start()
+    
+    def move(self, dx: int, dy: int):
+        self.writer.coalesce("move", self.device.move, (dx, dy))
+    
+    def scroll(self, vertical: int, horizontal: int = 0):
+        self.writer.coalesce("scroll", self.device.scroll, (vertical, horizontal))
+    
+    def scroll_hires(self, vertical: int, horizontal: int = 0):
+        self.writer.coalesce("scroll_hires", self.device.scroll_hires, (vertical, horizontal))
+    
+    def frame(self, dx: int, dy: int, vertical: int = 0, horizontal: int = 0):
+        self.writer.coalesce("frame", self.device.frame, (dx, dy, vertical, horizontal))
+    
+    def move_to(self, x: int, y: int):
+        self.writer.coalesce("move_to", self.device.move_to, (x, y), COALESCE_LATEST)
+    
+    def click(self, button: str, state: str):
+        self.writer.submit(self.device.click, button, state, ordered=True)
+    
+    @property
+    def write_stats(self) -> Dict[str, float]:
+        stats = dict(self.device.write_stats)
+        stats.update(self.writer.stats)
+        return stats
+    
+    def close(self):
+        self.writer.stop()
+        self.device.close()
+
+
+class QueuedKeyboard:
+    """VirtualKeyboard (or NullKeyboard) behind a DeviceWriter; all writes are urgent."""
+    
+    def __init__(self, device, thread_setup: Optional[Callable[[str], None]] = None):
+        self.device = device
+        self.writer = DeviceWriter(getattr(device, "name", "keyboard"), thread_setup)
+        self.writer.start()
+    
+    def key_event(self, key: str, state: str):
+        self.writer.submit(self.device.key_event, key, state)
+    
+    def type_key(self, key: str):
+        self.key_event(key, "DOWN")
+        self.key_event(key, "UP")
+    
+    def write_prebuilt(self, buffer: bytes):
+        self.writer.submit(self.device.write_prebuilt, buffer)
+    
+    @property
+    def write_stats(self) -> Dict[str, float]:
+        stats = dict(self.device.write_stats)
+        stats.update(self.writer.stats)
+        return stats
+    
+    def close(self):
+        self.writer.stop()
+        self.device.close()
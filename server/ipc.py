@@ -0,0 +1,411 @@
+"""
+Multi-process receive path: UDP input is received and parsed in its own
+process and handed to the server process through a shared-memory ring.
+
+The UDP parse loop, the TCP loop and the 60 Hz frame loops otherwise share
+one interpreter and its GIL, so anything slow on one thread (a burst of
+logging, a print) delays cursor output. With --receiver-process:
+
+    receiver process                      server process
+    ----------------                      --------------
+    recvfrom -> parse -> ShmRing.push ==> ShmRing.drain -> authorize -> smoothers
+
+The ring is single-producer/single-consumer and needs no lock: only the
+producer writes the head index, only the consumer writes the tail index,
+and each index is written after the record it publishes. The two processes
+are pinned to different CPUs when more than one is available.
+
+Authorization stays in the server process (the receiver only forwards the
+source IPv4 address with each event).
+"""
+
+import os
+import signal
+import socket
+import struct
+import threading
+import time
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .config import INPUT_PORT, IPC_RING_CAPACITY, IPC_POLL_INTERVAL
+from .network import parse_input_packet
+
+logger = logging.getLogger(__name__)
+
+# === RING LAYOUT ===
+# Header: producer and consumer fields on separate cache lines
+_HEAD_OFFSET = 0       # u64 records published (producer)
+_DROPPED_OFFSET = 8    # u64 records dropped because the ring was full (producer)
+_TAIL_OFFSET = 64      # u64 records consumed (consumer)
+_STOP_OFFSET = 128     # u8 stop request (server -> receiver)
+_HEADER_SIZE = 192
+
+_INDEX = struct.Struct("<Q")
+# kind (u8), pad, source IPv4 (u32), val1 (i32), val2 (i32),
+# receive stamp (f64, time.monotonic(): CLOCK_MONOTONIC is system-wide)
+_RECORD = struct.Struct("<BxxxIiid")
+
+# Event kinds carried in the ring
+EVENT_MOVE = 1
+EVENT_SCROLL = 2
+EVENT_ABS = 3
+EVENT_CODES = {"MOVE": EVENT_MOVE, "SCROLL": EVENT_SCROLL, "ABS": EVENT_ABS}
+EVENT_NAMES = {code: name for name, code in EVENT_CODES.items()}
+
+
+def _thread_ids() -> List[int]:
+    """Kernel thread ids of every thread in this process."""
+    try:
+        return [int(tid) for tid in os.listdir("/proc/self/task")]
+    except OSError:
+        return [thread.native_id for thread in threading.enumerate() if thread.native_id]
+
+
+def pin_process_threads(cpus: Set[int]) -> Tuple[int, List[str]]:
+    """
+    Restrict every existing thread of this process to cpus.
+    
+    On Linux sched_setaffinity() applies to one thread, and threads that
+    are already running keep their own mask, so each one is pinned by its
+    kernel thread id. Threads started later inherit the mask of the thread
+    that starts them. A thread already pinned to a subset of cpus (e.g. a
+    --realtime frame thread) keeps its narrower mask.
+    
+    Returns:
+        (threads pinned, error messages)
+    """
+    pinned = 0
+    errors: List[str] = []
+    for tid in _thread_ids():
+        try:
+            current = os.sched_getaffinity(tid)
+            os.sched_setaffinity(tid, (current & cpus) or cpus)
+            pinned += 1
+        except ProcessLookupError:
+            pass  # Thread exited meanwhile
+        except OSError as e:
+            errors.append(f"thread {tid}: {e}")
+    return pinned, errors
+
+
+class ShmRing:
+    """
+    Fixed-size SPSC ring of input events in multiprocessing shared memory.
+    
+    Indices only grow; the slot is index & (capacity - 1). The ring is full
+    when head - tail == capacity, in which case push() drops the event and
+    counts it (the producer never waits for the consumer).
+    """
+    
+    def __init__(self, capacity: int = IPC_RING_CAPACITY, name: Optional[str] = None):
+        """
+        Args:
+            capacity: Number of event slots (rounded up to a power of two)
+            name: Attach to an existing ring by name, or None to create one
+        """
+        self.capacity = 1 << max(1, capacity - 1).bit_length()
+        self._mask = self.capacity - 1
+        size = _HEADER_SIZE + self.capacity * _RECORD.size
+        
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._shm.buf[:_HEADER_SIZE] = bytes(_HEADER_SIZE)
+            self._owner = True
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+        self._buf = self._shm.buf
+        
+        # Each side caches its own index (it is the only writer of it)
+        self._head = _INDEX.unpack_from(self._buf, _HEAD_OFFSET)[0]
+        self._tail = _INDEX.unpack_from(self._buf, _TAIL_OFFSET)[0]
+    
+    @property
+    def name(self) -> str:
+        """Shared memory block name (passed to the other process)."""
+        return self._shm.name
+    
+    # === PRODUCER SIDE ===
+    
+    def push(self, kind: int, source: int, val1: int, val2: int, stamp: float = 0.0) -> bool:
+        """Publish one event; returns False (and counts a drop) if the ring is full."""
+        tail = _INDEX.unpack_from(self._buf, _TAIL_OFFSET)[0]
+        if self._head - tail >= self.capacity:
+            dropped = _INDEX.unpack_from(self._buf, _DROPPED_OFFSET)[0]
+            _INDEX.pack_into(self._buf, _DROPPED_OFFSET, dropped + 1)
+            return False
+        
+        offset = _HEADER_SIZE + (self._head & self._mask) * _RECORD.size
+        _RECORD.pack_into(self._buf, offset, kind, source, val1, val2, stamp)
+        self._head += 1
+        _INDEX.pack_into(self._buf, _HEAD_OFFSET, self._head)  # Publish after the record
+        return True
+    
+    # === CONSUMER SIDE ===
+    
+    def drain(self, handler: Callable[[int, int, int, int, float], None], limit: int = 256) -> int:
+        """
+        Pass up to limit pending events to handler(kind, source, val1, val2, stamp).
+        
+        Returns the number of events consumed (0 = ring empty).
+        """
+        head = _INDEX.unpack_from(self._buf, _HEAD_OFFSET)[0]
+        count = min(head - self._tail, limit)
+        
+        for _ in range(count):
+            offset = _HEADER_SIZE + (self._tail & self._mask) * _RECORD.size
+            handler(*_RECORD.unpack_from(self._buf, offset))
+            self._tail += 1
+        
+        if count:
+            _INDEX.pack_into(self._buf, _TAIL_OFFSET, self._tail)  # Free the slots
+        return count
+    
+    @property
+    def dropped(self) -> int:
+        """Events the producer dropped because the ring was full."""
+        return _INDEX.unpack_from(self._buf, _DROPPED_OFFSET)[0]
+    
+    @property
+    def pending(self) -> int:
+        """Events published but not yet consumed."""
+        head = _INDEX.unpack_from(self._buf, _HEAD_OFFSET)[0]
+        tail = _INDEX.unpack_from(self._buf, _TAIL_OFFSET)[0]
+        return head - tail
+    
+    # === CONTROL ===
+    
+    @property
+    def stop_requested(self) -> bool:
+        return self._buf[_STOP_OFFSET] != 0
+    
+    def request_stop(self):
+        self._buf[_STOP_OFFSET] = 1
+    
+    def close(self):
+        """Detach (and remove the block if this side created it)."""
+        self._buf = None
+        try:
+            self._shm.close()
+            if self._owner:
+                self._shm.unlink()
+        except:
+            pass
+
+
+def _receiver_main(ring_name: str, capacity: int, port: int, cpu: Optional[int]):
+    """
+    Entry point of the receiver process: recvfrom -> parse -> ring.
+    
+    Ctrl+C is left to the server process, which stops this one through
+    the ring's stop flag.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    
+    if cpu is not None:
+        try:
+            os.sched_setaffinity(0, {cpu})
+        except OSError as e:
+            logger.warning(f"Receiver: could not pin to CPU {cpu}: {e}")
+    
+    ring = ShmRing(capacity, name=ring_name)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.settimeout(0.5)
+    try:
+        sock.bind(('', port))
+    except OSError as e:
+        logger.error(f"Receiver: cannot bind UDP port {port}: {e}")
+        ring.close()
+        return
+    
+    sources: Dict[str, int] = {}  # Dotted IP -> packed u32 (few distinct senders)
+    
+    while not ring.stop_requested:
+        try:
+            data, addr = sock.recvfrom(256)
+            stamp = time.monotonic()
+        except socket.timeout:
+            continue
+        except OSError:
+            break
+        
+        parsed = parse_input_packet(data)
+        if parsed is None:
+            continue
+        kind = EVENT_CODES.get(parsed[0])
+        if kind is None:
+            continue
+        
+        source = sources.get(addr[0])
+        if source is None:
+            source = int.from_bytes(socket.inet_aton(addr[0]), "big")
+            sources[addr[0]] = source
+        
+        ring.push(kind, source, parsed[1], parsed[2], stamp)
+    
+    sock.close()
+    ring.close()
+
+
+class ProcessInputListener:
+    """
+    Drop-in replacement for UDPInputListener that receives in a child process.
+    
+    Same callbacks and sender_ip/recv_time attributes; the callbacks run on one
+    consumer thread in the server process that drains the ring.
+    """
+    
+    def __init__(
+        self,
+        is_authorized: Callable[[str], bool],
+        on_move: Callable[[int, int], None],
+        on_scroll: Callable[[int, int], None],
+        on_abs: Optional[Callable[[int, int], None]] = None,
+        on_datagram: Optional[Callable[[float, str, bytes, int], None]] = None,
+        port: int = INPUT_PORT,
+        pin_cpus: bool = True
+    ):
+        """
+        Args:
+            is_authorized: Callback to check if client IP is authorized
+            on_move: Callback for mouse movement (dx, dy)
+            on_scroll: Callback for scroll events (vertical, horizontal)
+            on_abs: Optional callback for absolute positions (x, y)
+            on_datagram: Optional callback for every event, before authorization
+                (recv_time, client_ip, packet, nbytes); the packet is rebuilt
+                from the ring record, since unparsable datagrams never reach it
+            port: UDP port to listen on
+            pin_cpus: Put the receiver and the server process on different CPUs
+        """
+        self._is_authorized = is_authorized
+        self._on_move = on_move
+        self._on_scroll = on_scroll
+        self._on_abs = on_abs
+        self._on_datagram = on_datagram
+        self._port = port
+        self._pin_cpus = pin_cpus
+        
+        self.sender_ip: Optional[str] = None
+        self.recv_time = 0.0  # Stamped in the receiver process
+        self._sources: Dict[int, str] = {}  # Packed u32 -> dotted IP
+        
+        self._ring: Optional[ShmRing] = None
+        self._process = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+    
+    def _dispatch(self, kind: int, source: int, val1: int, val2: int, stamp: float):
+        """Handle one event from the ring (consumer thread)."""
+        client_ip = self._sources.get(source)
+        if client_ip is None:
+            client_ip = socket.inet_ntoa(source.to_bytes(4, "big"))
+            self._sources[source] = client_ip
+        if self._on_datagram:
+            packet = f"{EVENT_NAMES.get(kind, '?')} {val1} {val2}".encode()
+            self._on_datagram(stamp, client_ip, packet, len(packet))
+        
+        if not self._is_authorized(client_ip):
+            return
+        self.sender_ip = client_ip
+        self.recv_time = stamp
+        
+        if kind == EVENT_MOVE:
+            self._on_move(val1, val2)
+        elif kind == EVENT_SCROLL:
+            self._on_scroll(val1, val2)
+        elif kind == EVENT_ABS and self._on_abs:
+            self._on_abs(val1, val2)
+    
+    def _consume_loop(self):
+        """Drain the ring; short sleeps while it is empty."""
+        while self._running:
+            try:
+                if self._ring.drain(self._dispatch) == 0:
+                    time.sleep(IPC_POLL_INTERVAL)
+            except Exception as e:
+                logger.error(f"Ring consumer error: {e}")
+    
+    def _plan_cpus(self) -> Tuple[Optional[int], Optional[Set[int]]]:
+        """Pick (receiver CPU, server CPUs), or (None, None) if pinning is off or pointless."""
+        if not self._pin_cpus:
+            return None, None
+        try:
+            cpus = sorted(os.sched_getaffinity(0))
+        except (AttributeError, OSError):
+            return None, None
+        if len(cpus) < 2:
+            return None, None
+        return cpus[-1], set(cpus[:-1])
+    
+    @property
+    def port(self) -> int:
+        """Configured UDP port (bound in the receiver process)."""
+        return self._port
+    
+    @property
+    def dropped(self) -> int:
+        """Events lost because the ring was full."""
+        return self._ring.dropped if self._ring else 0
+    
+    def start(self):
+        """Start the receiver process and the consumer thread."""
+        if self._running:
+            return
+        
+        receiver_cpu, server_cpus = self._plan_cpus()
+        
+        self._ring = ShmRing()
+        context = multiprocessing.get_context("spawn")
+        self._process = context.Process(
+            target=_receiver_main,
+            args=(self._ring.name, self._ring.capacity, self._port, receiver_cpu),
+            daemon=True
+        )
+        self._process.start()
+        
+        if server_cpus:
+            # Frame, timer, injector and log threads are already running
+            pinned, errors = pin_process_threads(server_cpus)
+            for error in errors:
+                logger.warning(f"Could not pin server {error}")
+            logger.info(
+                f"Receiver process on CPU {receiver_cpu}; server process "
+                f"({pinned} threads) on CPUs {sorted(server_cpus)}"
+            )
+        
+        self._running = True
+        self._thread = threading.Thread(target=self._consume_loop, daemon=True)
+        self._thread.start()
+        
+        logger.info(
+            f"UDP input receiver process started on port {self._port} "
+            f"(pid {self._process.pid}, ring of {self._ring.capacity} events)"
+        )
+    
+    def stop(self):
+        """Stop the receiver process and the consumer thread."""
+        self._running = False
+        
+        if self._ring:
+            self._ring.request_stop()
+        if self._process:
+            self._process.join(timeout=2.0)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+        
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        
+        if self._ring:
+            if self._ring.dropped:
+                logger.warning(f"Receiver ring dropped {self._ring.dropped} events")
+            self._ring.close()
+            self._ring = None
+        
+        logger.info("UDP input receiver process stopped")
@@ -0,0 +1,402 @@
+"""
+Synthetic client load generator for a running server.
+
+Unlike server.loadtest, which drives the listener and mixer in-process,
+this behaves like real phones: it performs discovery, authenticates over
+TCP with the pairing code, answers heartbeats, and then streams MOVE/SCROLL
+datagrams and KEY/CLICK commands with configurable rates, patterns, jitter,
+bursts and loss. Several sessions run in parallel, each from its own
+127.0.0.x address (start the server with --max-clients N for N > 1).
+
+At the end it reports achieved throughput, what the server actually
+counted (and so dropped), control-path RTT measured with client PINGs and,
+with --metrics-port, the server's receive-to-injection latency. Pair it
+with --null-output so no root or /dev/uinput is needed:
+
+    python3 -m server.main --null-output --max-clients 4 --metrics-port 9100
+    python3 -m server.loadgen --code 123456 --sessions 4 --rate 250 \\
+        --key-rate 20 --jitter-ms 4 --metrics-port 9100
+"""
+
+import math
+import socket
+import argparse
+import threading
+import time
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+from .config import (
+    DISCOVERY_PORT, INPUT_PORT, CONTROL_PORT,
+    DISCOVERY_MAGIC, SERVER_RESPONSE_PREFIX
+)
+from .simulator import synthetic_trace
+
+PATTERNS = ("line", "circle", "zigzag")
+PROBE_INTERVAL = 0.1  # Seconds between client PINGs (RTT probes)
+
+# (offset seconds, TCP?, payload)
+Schedule = List[Tuple[float, bool, bytes]]
+
+
+def _session_ip(index: int) -> str:
+    """Loopback source address of session number index."""
+    return f"127.0.0.{index + 2}"
+
+
+def discover(host: str, timeout: float = 1.0) -> Optional[Tuple[str, str, int]]:
+    """
+    Send the discovery probe to host (may be a broadcast address).
+    
+    Returns:
+        (server name, server IP, control port), or None without an answer
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sock.settimeout(timeout)
+    try:
+        sock.sendto(DISCOVERY_MAGIC.encode(), (host, DISCOVERY_PORT))
+        data, _ = sock.recvfrom(1024)
+    except OSError:
+        return None
+    finally:
+        sock.close()
+    
+    lines = data.decode("utf-8", errors="ignore").split("\n")
+    if len(lines) < 4 or lines[0] != SERVER_RESPONSE_PREFIX:
+        return None
+    try:
+        return lines[1], lines[2], int(lines[3])
+    except ValueError:
+        return None
+
+
+def _pattern_delta(pattern: str, t: float, speed: int) -> Tuple[int, int]:
+    """Per-packet movement of a pattern at offset t (seconds)."""
+    if pattern == "circle":
+        angle = 2.0 * math.pi * t  # One turn per second
+        return round(speed * math.cos(angle)), round(speed * math.sin(angle))
+    if pattern == "zigzag":
+        sign = 1 if int(t * 4) % 2 == 0 else -1  # Reverse every 250 ms
+        return sign * speed, speed // 2
+    return speed, speed // 2
+
+
+def build_schedule(args: argparse.Namespace, seed: int) -> Tuple[Schedule, int]:
+    """
+    Everything one session sends, in send order.
+    
+    Datagram timing (jitter, bursts, loss) comes from the simulator's
+    synthetic traces, so loadgen and simulator runs are comparable.
+    
+    Returns:
+        (schedule, datagrams dropped on purpose by --loss)
+    """
+    impairments = {
+        "jitter_ms": args.jitter_ms,
+        "loss": args.loss,
+        "burst_every": args.burst_every,
+        "burst_hold_ms": args.burst_hold_ms,
+    }
+    schedule: Schedule = []
+    planned = 0
+    
+    if args.rate > 0:
+        moves = synthetic_trace("MOVE", args.rate, args.duration, seed=seed, **impairments)
+        planned += int(args.duration * args.rate)
+        for t, _, _, _ in moves:
+            dx, dy = _pattern_delta(args.pattern, t, args.speed)
+            schedule.append((t, False, f"MOVE {dx} {dy}".encode()))
+    
+    if args.scroll_rate > 0:
+        scrolls = synthetic_trace("SCROLL", args.scroll_rate, args.duration, delta=(1, 0),
+                                  seed=seed + 1000, **impairments)
+        planned += int(args.duration * args.scroll_rate)
+        schedule.extend((t, False, b"SCROLL 1 0") for t, _, _, _ in scrolls)
+    
+    sent_udp = len(schedule)
+    
+    # Control commands: a press and its release 20 ms later
+    for rate, down, up in (
+        (args.key_rate, b"KEY DOWN KEY_A", b"KEY UP KEY_A"),
+        (args.click_rate, b"CLICK LEFT DOWN", b"CLICK LEFT UP"),
+    ):
+        if rate > 0:
+            for index in range(int(args.duration * rate)):
+                t = index / rate
+                schedule.append((t, True, down))
+                schedule.append((t + 0.02, True, up))
+    
+    schedule.sort(key=lambda item: item[0])
+    return schedule, planned - sent_udp
+
+
+class Session:
+    """One simulated phone: control connection, heartbeat answers, traffic."""
+    
+    def __init__(self, index: int, host: str, control_port: int, input_port: int,
+                 source_ip: Optional[str]):
+        self.index = index
+        self._host = host
+        self._control_port = control_port
+        self._input_port = input_port
+        self._source_ip = source_ip
+        
+        self._control: Optional[socket.socket] = None
+        self._udp: Optional[socket.socket] = None
+        self._reader: Optional[threading.Thread] = None
+        self._running = False
+        self._send_lock = threading.Lock()  # Sender thread + PONG answers
+        self._probes: Dict[str, float] = {}
+        
+        # === RESULTS ===
+        self.error: Optional[str] = None
+        self.udp_sent = 0
+        self.tcp_sent = 0
+        self.lost = 0  # Datagrams skipped on purpose (--loss)
+        self.rtts: List[float] = []
+        self.rate_suggestions = 0
+        self.max_send_lag = 0.0  # Worst lateness of the sender against the schedule
+        self.elapsed = 0.0
+    
+    def _send_line(self, line: str):
+        with self._send_lock:
+            self._control.sendall((line + "\n").encode())
+    
+    def connect(self, code: str) -> bool:
+        """Open the control connection and authenticate."""
+        try:
+            self._control = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            if self._source_ip:
+                self._control.bind((self._source_ip, 0))
+                self._udp.bind((self._source_ip, 0))
+            # Probes follow unacknowledged commands; Nagle would hold them back
+            self._control.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._control.settimeout(5.0)
+            self._control.connect((self._host, self._control_port))
+            self._send_line(f"AUTH {code}")
+            reply = self._control.recv(256).decode(errors="ignore")
+        except OSError as e:
+            self.error = f"connect failed: {e}"
+            return False
+        
+        if not reply.startswith("AUTH_OK"):
+            self.error = reply.strip().split("\n")[0] or "no AUTH reply"
+            return False
+        
+        self._running = True
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+        return True
+    
+    def _read_loop(self):
+        """Answer server PINGs, time our probes, count RATE suggestions."""
+        buffer = ""
+        self._control.settimeout(0.2)
+        while self._running:
+            try:
+                data = self._control.recv(1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            if not data:
+                return
+            now = time.monotonic()
+            buffer += data.decode(errors="ignore")
+            while "\n" in buffer:
+                line, buffer = buffer.split("\n", 1)
+                parts = line.split()
+                if not parts:
+                    continue
+                if parts[0] == "PING" and len(parts) >= 2:
+                    try:
+                        self._send_line(f"PONG {parts[1]}")
+                    except OSError:
+                        return
+                elif parts[0] == "PONG" and len(parts) >= 2:
+                    sent = self._probes.pop(parts[1], None)
+                    if sent is not None:
+                        self.rtts.append(now - sent)
+                elif parts[0] == "RATE":
+                    self.rate_suggestions += 1
+    
+    def run(self, schedule: Schedule, lost: int):
+        """Send the schedule in real time, probing RTT every PROBE_INTERVAL."""
+        self.lost = lost
+        target = (self._host, self._input_port)
+        started = time.monotonic()
+        next_probe = started
+        probe = 0
+        
+        try:
+            for offset, tcp, payload in schedule:
+                due = started + offset
+                now = time.monotonic()
+                while now < due:
+                    if now >= next_probe:
+                        self._probes[f"lg{probe}"] = now
+                        self._send_line(f"PING lg{probe}")
+                        probe += 1
+                        next_probe += PROBE_INTERVAL
+                    time.sleep(min(due, next_probe) - now if next_probe > now else 0)
+                    now = time.monotonic()
+                self.max_send_lag = max(self.max_send_lag, now - due)
+                
+                if tcp:
+                    with self._send_lock:
+                        self._control.sendall(payload + b"\n")
+                    self.tcp_sent += 1
+                else:
+                    self._udp.sendto(payload, target)
+                    self.udp_sent += 1
+        except OSError as e:
+            self.error = f"send failed: {e}"
+        self.elapsed = time.monotonic() - started
+    
+    def close(self):
+        """Let outstanding PONGs arrive, then disconnect."""
+        time.sleep(0.2)
+        self._running = False
+        for sock in (self._control, self._udp):
+            if sock:
+                sock.close()
+        if self._reader:
+            self._reader.join(timeout=1.0)
+
+
+def scrape(port: int) -> Dict[str, float]:
+    """Server metrics as {'name{labels}': value}; empty if unreachable."""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=2.0) as response:
+            body = response.read().decode()
+    except OSError:
+        return {}
+    samples = {}
+    for line in body.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            try:
+                samples[name] = float(value)
+            except ValueError:
+                pass
+    return samples
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Synthetic client load against a running server")
+    parser.add_argument('--code', required=True, help='Pairing code shown by the server')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='Server or broadcast address for discovery (default: 127.0.0.1)')
+    parser.add_argument('--skip-discovery', action='store_true', help='Connect to --host directly')
+    parser.add_argument('--input-port', type=int, default=INPUT_PORT)
+    parser.add_argument('--sessions', type=int, default=1,
+                        help='Parallel clients, each from its own 127.0.0.x (default: 1)')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds of traffic (default: 5)')
+    parser.add_argument('--rate', type=float, default=125.0, help='MOVE datagrams/s per session (default: 125)')
+    parser.add_argument('--scroll-rate', type=float, default=0.0, help='SCROLL datagrams/s per session')
+    parser.add_argument('--key-rate', type=float, default=0.0, help='Key presses/s per session')
+    parser.add_argument('--click-rate', type=float, default=0.0, help='Clicks/s per session')
+    parser.add_argument('--pattern', choices=PATTERNS, default='line', help='Movement shape (default: line)')
+    parser.add_argument('--speed', type=int, default=4, help='Pixels per MOVE datagram (default: 4)')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Send-time jitter (std dev, ms)')
+    parser.add_argument('--loss', type=float, default=0.0, help='Fraction of datagrams not sent')
+    parser.add_argument('--burst-every', type=float, default=0.0,
+                        help='Every this many seconds, hold datagrams back ...')
+    parser.add_argument('--burst-hold-ms', type=float, default=0.0, help='... for this long, then send at once')
+    parser.add_argument('--metrics-port', type=int, default=0,
+                        help="Server's --metrics-port, for server-side counts and latency")
+    args = parser.parse_args()
+    
+    host = args.host
+    control_port = CONTROL_PORT
+    if not args.skip_discovery:
+        found = discover(host)
+        if found is None:
+            parser.exit(1, f"No discovery answer from {host} (server full or not running?)\n")
+        name, server_ip, control_port = found
+        print(f"Discovered {name} at {server_ip}:{control_port}")
+        if host.endswith(".255") or host == "<broadcast>":
+            host = server_ip
+    
+    loopback = host.startswith("127.")
+    sessions = [
+        Session(index, host, control_port, args.input_port, _session_ip(index) if loopback else None)
+        for index in range(args.sessions)
+    ]
+    before = scrape(args.metrics_port) if args.metrics_port else {}
+    
+    connected = [session for session in sessions if session.connect(args.code)]
+    for session in sessions:
+        if session.error:
+            print(f"session {session.index}: {session.error}")
+    if not connected:
+        parser.exit(1, "No session authenticated\n")
+    
+    threads = []
+    for session in connected:
+        schedule, lost = build_schedule(args, seed=session.index + 1)
+        threads.append(threading.Thread(target=session.run, args=(schedule, lost), daemon=True))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for session in connected:
+        session.close()
+    
+    time.sleep(0.5)  # Let the capacitor drain before the final scrape
+    after = scrape(args.metrics_port) if args.metrics_port else {}
+    
+    print(f"{'session':>7} {'udp':>7} {'udp/s':>8} {'tcp':>6} {'lost':>5} {'rtt p50':>8} "
+          f"{'rtt p99':>8} {'lag max':>8} {'RATE':>5}")
+    for session in connected:
+        rtts = session.rtts or [0.0]
+        print(f"{session.index:>7} {session.udp_sent:>7} "
+              f"{session.udp_sent / max(session.elapsed, 1e-9):>8.1f} {session.tcp_sent:>6} "
+              f"{session.lost:>5} {_percentile(rtts, 0.5) * 1000:>6.2f}ms "
+              f"{_percentile(rtts, 0.99) * 1000:>6.2f}ms {session.max_send_lag * 1000:>6.2f}ms "
+              f"{session.rate_suggestions:>5}")
+    
+    udp_sent = sum(session.udp_sent for session in connected)
+    tcp_sent = sum(session.tcp_sent for session in connected)
+    elapsed = max(session.elapsed for session in connected)
+    print(f"total: {udp_sent} datagrams ({udp_sent / elapsed:.0f}/s), "
+          f"{tcp_sent} control commands ({tcp_sent / elapsed:.0f}/s) in {elapsed:.2f}s")
+    
+    if not after:
+        if args.metrics_port:
+            print(f"(no metrics on port {args.metrics_port})")
+        return
+    
+    def delta(name: str) -> int:
+        return int(after.get(name, 0.0) - before.get(name, 0.0))
+    
+    received = delta("hotspot_udp_packets_total")
+    print(f"server: {received} datagrams received ({udp_sent - received} dropped before the listener), "
+          f"{delta('hotspot_udp_unauthorized_total')} unauthorized, "
+          f"{delta('hotspot_udp_parse_errors_total')} malformed, "
+          f"{delta('hotspot_receiver_ring_dropped_total')} ring drops")
+    dropped = sum(delta(f'hotspot_uinput_reports_dropped_total{{device="{device}"}}')
+                  for device in ("mouse", "keyboard", "absolute"))
+    overruns = sum(delta(f'hotspot_smoother_frame_overruns_total{{smoother="{role}"}}')
+                   for role in ("input", "mixer"))
+    print(f"server: {delta('hotspot_tcp_commands_total')} control commands, "
+          f"{dropped} uinput reports dropped, {overruns} movement frame overruns")
+    for kind in ("move", "key", "click"):
+        p50 = after.get(f'hotspot_recv_to_inject_quantile_seconds{{input="{kind}",quantile="0.5"}}')
+        p99 = after.get(f'hotspot_recv_to_inject_quantile_seconds{{input="{kind}",quantile="0.99"}}')
+        worst = after.get(f'hotspot_recv_to_inject_max_seconds{{input="{kind}"}}')
+        if p50 is not None:
+            print(f"server latency {kind:5s} p50={p50 * 1000:.3f}ms p99={p99 * 1000:.3f}ms "
+                  f"max={worst * 1000:.3f}ms (since server start)")
+
+
+if __name__ == "__main__":
+    main()
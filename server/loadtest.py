@@ -0,0 +1,144 @@
+"""
+Loopback load test for multi-client mode.
+
+Runs the real UDPInputListener and SmootherMixer against several simulated
+phones, each sending MOVE/SCROLL datagrams from its own 127.0.0.x address,
+and reports how the per-frame cost scales with the number of clients.
+Output goes to a NullMouse, so no root or /dev/uinput is needed.
+
+Usage:
+    python3 -m server.loadtest --clients 1 2 4 8 --rate 120 --duration 3
+"""
+
+import argparse
+import socket
+import threading
+import time
+from typing import Dict, List
+
+from .network import UDPInputListener
+from .smoother import InputSmoother, ScrollSmoother, SmootherMixer
+from .uinput_device import NullMouse
+
+
+def _client_ip(index: int) -> str:
+    """Loopback source address for simulated client number index."""
+    return f"127.0.0.{index + 2}"
+
+
+def _run_client(client_ip: str, port: int, rate: float, duration: float, sent: Dict[str, int]):
+    """Send MOVE (and every 8th packet SCROLL) at a fixed rate."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((client_ip, 0))
+    interval = 1.0 / rate
+    count = 0
+    deadline = time.monotonic() + duration
+    next_send = time.monotonic()
+    
+    while time.monotonic() < deadline:
+        message = b"SCROLL 1 0" if count % 8 == 7 else b"MOVE 3 -2"
+        sock.sendto(message, ("127.0.0.1", port))
+        count += 1
+        next_send += interval
+        sleep_time = next_send - time.monotonic()
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+    
+    sock.close()
+    sent[client_ip] = count
+
+
+def run_load(clients: int, rate: float, duration: float) -> Dict[str, float]:
+    """Run one load round with the given number of clients; returns metrics."""
+    mouse = NullMouse()
+    mixer = SmootherMixer(inject_frame=mouse.frame, target_fps=60)
+    
+    for index in range(clients):
+        mixer.add_client(
+            _client_ip(index),
+            InputSmoother(inject_move=mouse.move),
+            ScrollSmoother(inject_scroll=mouse.scroll_hires, hires=True)
+        )
+    
+    listener: UDPInputListener
+    
+    def on_move(dx: int, dy: int):
+        smoothers = mixer.get_client(listener.sender_ip)
+        if smoothers:
+            smoothers[0].add_movement(dx, dy)
+    
+    def on_scroll(vertical: int, horizontal: int):
+        smoothers = mixer.get_client(listener.sender_ip)
+        if smoothers:
+            smoothers[1].add_scroll(vertical, horizontal)
+    
+    listener = UDPInputListener(
+        lambda ip: mixer.get_client(ip) is not None,
+        on_move,
+        on_scroll,
+        port=0
+    )
+    listener.start()
+    mixer.start()
+    
+    sent: Dict[str, int] = {}
+    threads = [
+        threading.Thread(
+            target=_run_client,
+            args=(_client_ip(index), listener.port, rate, duration, sent),
+            daemon=True
+        )
+        for index in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    time.sleep(0.3)  # Let the last packets drain through the smoothers
+    mixer.stop()
+    listener.stop()
+    
+    received = sum(
+        mixer.get_client(_client_ip(index))[0].packets_received
+        + mixer.get_client(_client_ip(index))[1].packets_received
+        for index in range(clients)
+    )
+    total_sent = sum(sent.values())
+    
+    return {
+        "clients": clients,
+        "sent": total_sent,
+        "received": received,
+        "loss_pct": 100.0 * (total_sent - received) / total_sent if total_sent else 0.0,
+        "frames": mixer.frames,
+        "overruns": mixer.frames_overrun,
+        "frame_cost_us": 1e6 * mixer.total_frame_cost / mixer.frames if mixer.frames else 0.0,
+        "reports": mouse.reports,
+    }
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Multi-client loopback load test")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='Client counts to test (default: 1 2 4 8)')
+    parser.add_argument('--rate', type=float, default=120.0,
+                        help='Packets per second per client (default: 120)')
+    parser.add_argument('--duration', type=float, default=3.0,
+                        help='Seconds per round (default: 3)')
+    args = parser.parse_args()
+    
+    results: List[Dict[str, float]] = []
+    for clients in args.clients:
+        results.append(run_load(clients, args.rate, args.duration))
+    
+    print(f"{'clients':>7} {'sent':>8} {'recv':>8} {'loss%':>6} {'frames':>7} "
+          f"{'overrun':>7} {'us/frame':>9} {'reports':>8}")
+    for r in results:
+        print(f"{r['clients']:>7} {r['sent']:>8} {r['received']:>8} {r['loss_pct']:>6.2f} "
+              f"{r['frames']:>7} {r['overruns']:>7} {r['frame_cost_us']:>9.1f} {r['reports']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Asynchronous logging and console event rendering.
+
+Network and frame threads must never wait for a slow terminal or a
+journald stall. While the pipeline runs, every logging call (including
+the styled console events of log_event / log_status) only appends the
+record to a bounded queue; a QueueListener thread formats and writes it:
+
+    caller thread                          listener thread
+    logger.info(...) -> rate limit -> queue -> format -> stderr handlers
+    log_event(...)   -> rate limit -> queue -> ANSI render -> stdout
+
+- Records are not formatted on the calling thread: message arguments,
+  timestamps and ANSI styling are rendered by the listener. Pass debug
+  arguments %-style so nothing is formatted at all while DEBUG is off.
+- Each call site (file and line) has a token bucket (LOG_RATE_LIMIT per
+  second, LOG_RATE_BURST at once). Records over the limit are counted and
+  dropped; the next record let through from that site notes how many were
+  suppressed.
+- A record that finds the queue full is dropped and counted.
+
+Before start() and after stop(), console events are written directly.
+"""
+
+import sys
+import queue
+import logging
+import logging.handlers
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .config import LOG_QUEUE_SIZE, LOG_RATE_LIMIT, LOG_RATE_BURST
+from .metrics import Counter
+
+CONSOLE_LOGGER = "server.console"
+
+# === ANSI STYLES ===
+DIM = "\033[2m"
+WHITE = "\033[97m"
+RESET = "\033[0m"
+
+# Event type -> (color, icon)
+EVENT_STYLES = {
+    "success": ("\033[92m", "✓"),   # Green
+    "warning": ("\033[93m", "⚠"),   # Yellow
+    "error": ("\033[91m", "✗"),     # Red
+    "info": ("\033[96m", "ℹ"),      # Cyan
+    "connect": ("\033[92m", "🔗"),  # Green
+    "disconnect": ("\033[93m", "🔄"),  # Yellow
+    "auth": ("\033[95m", "🔑"),     # Magenta
+}
+
+
+class ConsoleFormatter(logging.Formatter):
+    """
+    Renders console events: "[HH:MM:SS] <icon> <styled message>".
+    
+    The record carries event (a key of EVENT_STYLES, "status" or "raw")
+    and, for status lines, icon. "raw" text is written as-is (banner).
+    """
+    
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        event = getattr(record, "event", "info")
+        if event == "raw":
+            return message
+        
+        timestamp = datetime.fromtimestamp(record.created).strftime("%H:%M:%S")
+        if event == "status":
+            color, icon = WHITE, getattr(record, "icon", "⏳")
+        else:
+            color, icon = EVENT_STYLES.get(event, ("\033[97m", "•"))
+        return f"{DIM}[{timestamp}]{RESET} {icon} {color}{message}{RESET}"
+
+
+def _console_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(ConsoleFormatter())
+    return handler
+
+
+# Styled console output; its own handler until the pipeline takes over
+console = logging.getLogger(CONSOLE_LOGGER)
+console.propagate = False
+console.setLevel(logging.INFO)
+_direct_console = _console_handler()
+console.addHandler(_direct_console)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per call site, applied on the calling thread.
+    
+    Lock-free: concurrent callers of one site may be off by a token, which
+    is harmless for a limiter.
+    """
+    
+    def __init__(self, rate: float = LOG_RATE_LIMIT, burst: int = LOG_RATE_BURST):
+        super().__init__()
+        self._rate = rate
+        self._burst = float(burst)
+        self._sites: Dict[Tuple[str, int], List[float]] = {}  # site -> [tokens, last, suppressed]
+        self.dropped = Counter()
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.pathname, record.lineno)
+        now = record.created
+        site = self._sites.get(key)
+        if site is None:
+            site = self._sites.setdefault(key, [self._burst, now, 0])
+        
+        tokens = min(self._burst, site[0] + (now - site[1]) * self._rate)
+        site[1] = now
+        if tokens < 1.0:
+            site[0] = tokens
+            site[2] += 1
+            self.dropped.inc()
+            return False
+        
+        site[0] = tokens - 1.0
+        if site[2]:
+            record.suppressed = int(site[2])
+            site[2] = 0
+        return True
+
+
+class _BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks or formats on the calling thread."""
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = Counter()
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record  # Formatting happens on the listener thread
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped.inc()
+
+
+class _Dispatch(logging.Handler):
+    """Listener side: console events to stdout, everything else to the original handlers."""
+    
+    def __init__(self, handlers: List[logging.Handler], console_handler: logging.Handler):
+        super().__init__()
+        self._handlers = handlers
+        self._console = console_handler
+    
+    def handle(self, record: logging.LogRecord):
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} similar messages suppressed]"
+        
+        if record.name == CONSOLE_LOGGER:
+            self._console.handle(record)
+            return
+        for handler in self._handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)  # Blocking: the queue may be full, the thread drains it
+
+
+class AsyncLogging:
+    """
+    Moves the root logger's handlers and the console behind a queue.
+    
+    start() swaps the handlers of the root and console loggers for one
+    bounded QueueHandler and starts the listener thread; stop() drains the
+    queue and restores them.
+    """
+    
+    def __init__(
+        self,
+        capacity: int = LOG_QUEUE_SIZE,
+        rate: float = LOG_RATE_LIMIT,
+        burst: int = LOG_RATE_BURST
+    ):
+        self._queue: queue.Queue = queue.Queue(maxsize=capacity)
+        self._limiter = RateLimitFilter(rate, burst)
+        self._handler = _BoundedQueueHandler(self._queue)
+        self._handler.addFilter(self._limiter)
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._root_handlers: List[logging.Handler] = []
+    
+    @property
+    def dropped_rate_limited(self) -> int:
+        return self._limiter.dropped.value
+    
+    @property
+    def dropped_queue_full(self) -> int:
+        return self._handler.dropped.value
+    
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+    
+    def start(self):
+        """Route all logging through the queue."""
+        if self._listener:
+            return
+        root = logging.getLogger()
+        self._root_handlers = list(root.handlers)
+        dispatch = _Dispatch(self._root_handlers, _console_handler())
+        self._listener = _Listener(self._queue, dispatch)
+        self._listener.start()
+        
+        for handler in self._root_handlers:
+            root.removeHandler(handler)
+        root.addHandler(self._handler)
+        console.removeHandler(_direct_console)
+        console.addHandler(self._handler)
+    
+    def stop(self):
+        """Write everything still queued and restore direct output."""
+        if not self._listener:
+            return
+        root = logging.getLogger()
+        console.removeHandler(self._handler)
+        console.addHandler(_direct_console)
+        root.removeHandler(self._handler)
+        for handler in self._root_handlers:
+            root.addHandler(handler)
+        
+        self._listener.stop()  # Drains the queue
+        self._listener = None
+    
+    def stats(self) -> Dict[str, int]:
+        """Drop counters and queue depth."""
+        return {
+            "dropped_rate_limited": self.dropped_rate_limited,
+            "dropped_queue_full": self.dropped_queue_full,
+            "pending": self.pending,
+        }
@@ -0,0 +1,143 @@
+"""
+Server-side macro and chord engine.
+
+Named macros are defined in a JSON file and compiled once at load time
+into prebuilt uinput event buffers. Triggering one with MACRO <name>
+costs a single control line and one batched write per segment, instead
+of one KEY line per edge.
+
+File format (macro name -> list of steps):
+
+    {
+        "new_tab":    ["KEY_LEFTCTRL+KEY_LEFTSHIFT+KEY_T"],
+        "copy_paste": ["KEY_LEFTCTRL+KEY_C", {"delay_ms": 100}, "KEY_LEFTCTRL+KEY_V"]
+    }
+
+A chord step presses its keys left to right and releases them in reverse.
+A {"delay_ms": N} step splits the macro into segments that are written
+later from the shared timer heap, so the control thread never sleeps.
+"""
+
+import json
+import logging
+from typing import Callable, Dict, List, Tuple
+
+from .config import KEY_MAP, EV_KEY
+from .scheduler import TimerScheduler
+from .uinput_device import UInputDevice, SYN_EVENT
+
+logger = logging.getLogger(__name__)
+
+# A compiled macro: [(delay_before_seconds, event_buffer), ...]
+CompiledMacro = List[Tuple[float, bytes]]
+
+
+def compile_chord(chord: str) -> bytes:
+    """
+    Compile "KEY_A+KEY_B+..." into press/release event bytes.
+    
+    Every edge is followed by a SYN so applications see each key change
+    as its own report, exactly as if it came from a real keyboard.
+    """
+    names = [name.strip().upper() for name in chord.split('+') if name.strip()]
+    if not names:
+        raise ValueError("Empty chord")
+    
+    codes = []
+    for name in names:
+        if name not in KEY_MAP:
+            raise ValueError(f"Unknown key: {name}")
+        codes.append(KEY_MAP[name])
+    
+    buffer = b''
+    for code in codes:
+        buffer += UInputDevice._pack_event(EV_KEY, code, 1) + SYN_EVENT
+    for code in reversed(codes):
+        buffer += UInputDevice._pack_event(EV_KEY, code, 0) + SYN_EVENT
+    return buffer
+
+
+def compile_macro(steps: list) -> CompiledMacro:
+    """Compile a list of chord/delay steps into write segments."""
+    segments: CompiledMacro = []
+    delay = 0.0
+    buffer = b''
+    
+    for step in steps:
+        if isinstance(step, str):
+            buffer += compile_chord(step)
+        elif isinstance(step, dict) and "delay_ms" in step:
+            if buffer:
+                segments.append((delay, buffer))
+                buffer = b''
+                delay = 0.0
+            delay += float(step["delay_ms"]) / 1000.0
+        else:
+            raise ValueError(f"Invalid macro step: {step!r}")
+    
+    if buffer:
+        segments.append((delay, buffer))
+    if not segments:
+        raise ValueError("Macro has no key steps")
+    return segments
+
+
+class MacroEngine:
+    """
+    Holds compiled macros and plays them back.
+    
+    The first segment is written immediately from the caller's thread;
+    delayed segments are scheduled on the shared TimerScheduler.
+    """
+    
+    def __init__(self, write_buffer: Callable[[bytes], None], scheduler: TimerScheduler):
+        """
+        Args:
+            write_buffer: Callback that writes a prebuilt event buffer to the keyboard
+            scheduler: Shared timer heap for delayed segments
+        """
+        self._write_buffer = write_buffer
+        self._scheduler = scheduler
+        self._macros: Dict[str, CompiledMacro] = {}
+    
+    def load(self, path: str) -> int:
+        """
+        Load and compile macros from a JSON file.
+        
+        Invalid macros are logged and skipped. Returns the number loaded.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            definitions = json.load(f)
+        
+        if not isinstance(definitions, dict):
+            raise ValueError("Macro file must contain a JSON object")
+        
+        for name, steps in definitions.items():
+            try:
+                if isinstance(steps, str):
+                    steps = [steps]
+                self._macros[name.lower()] = compile_macro(steps)
+            except (ValueError, TypeError) as e:
+                logger.error(f"Skipping macro '{name}': {e}")
+        
+        return len(self._macros)
+    
+    @property
+    def names(self) -> List[str]:
+        """Names of all loaded macros."""
+        return sorted(self._macros)
+    
+    def run(self, name: str) -> bool:
+        """Trigger a macro by name. Returns False if it is not defined."""
+        segments = self._macros.get(name.lower())
+        if segments is None:
+            return False
+        
+        offset = 0.0
+        for delay, buffer in segments:
+            offset += delay
+            if offset <= 0:
+                self._write_buffer(buffer)
+            else:
+                self._scheduler.call_later(offset, self._write_buffer, buffer)
+        return True
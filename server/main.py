@@ -8,19 +8,39 @@ Requires root privileges to access uinput.
 
 import os
 import sys
+import time
 import signal
 import socket
 import logging
+import threading
 import argparse
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
-from .uinput_device import VirtualMouse, VirtualKeyboard
+from .uinput_device import (
+    VirtualMouse, VirtualKeyboard, VirtualAbsoluteMouse, NullMouse, NullKeyboard
+)
 from .auth import AuthManager
 from .connection import ConnectionManager
 from .discovery import DiscoveryService
 from .network import UDPInputListener, TCPControlListener
-from .smoother import InputSmoother, ScrollSmoother
-from .config import DISCOVERY_PORT, INPUT_PORT, CONTROL_PORT
+from .smoother import InputSmoother, ScrollSmoother, AbsolutePositionSampler, SmootherMixer
+from .scheduler import TimerScheduler, TimerHandle
+from .repeat import KeyRepeater
+from .macros import MacroEngine
+from .heartbeat import HeartbeatMonitor
+from .injector import QueuedMouse, QueuedKeyboard
+from .ipc import ProcessInputListener
+from .realtime import RealtimeTuner
+from .ratecontrol import LoadSample, RateController
+from .metrics import Histogram, MetricsRegistry, MetricsServer
+from .tuner import load_profile
+from .recorder import SessionRecorder
+from .profiler import Profiler
+from .logqueue import AsyncLogging, console
+from .config import (
+    DISCOVERY_PORT, INPUT_PORT, CONTROL_PORT, HEARTBEAT_DEADLINE, AUTH_TIMEOUT,
+    INPUT_SMOOTHER_PARAMS, SCROLL_SMOOTHER_PARAMS
+)
 
 # Configure logging
 logging.basicConfig(
@@ -63,7 +83,8 @@ def print_banner(ip: str, pairing_code: str):
     Print the server startup banner with styled formatting.
     
     Uses box-drawing characters and ANSI colors for a professional,
-    visually appealing terminal display.
+    visually appealing terminal display. The banner is one console record,
+    so it is never interleaved with other output.
     """
     # === ANSI Color Codes ===
     CYAN = "\033[96m"
@@ -77,54 +98,33 @@ def print_banner(ip: str, pairing_code: str):
     
     width = 62
     
-    print()
-    print(f"{CYAN}╔{'═' * width}╗{RESET}")
-    print(f"{CYAN}║{BOLD}{WHITE}{'HOTSPOT KEYBOARD & MOUSE SERVER':^{width}}{RESET}{CYAN}║{RESET}")
-    print(f"{CYAN}║{DIM}{'v1.0.0 (Production) - Created by Flex':^{width}}{RESET}{CYAN}║{RESET}")
-    print(f"{CYAN}╠{'═' * width}╣{RESET}")
-    print(f"{CYAN}║{RESET}  {WHITE}IP Address:{RESET}    {GREEN}{ip:<44}{RESET} {CYAN}║{RESET}")
-    print(f"{CYAN}║{RESET}  {WHITE}Discovery:{RESET}     {DIM}UDP {DISCOVERY_PORT:<40}{RESET} {CYAN}║{RESET}")
-    print(f"{CYAN}║{RESET}  {WHITE}Input (UDP):{RESET}   {DIM}{INPUT_PORT:<44}{RESET} {CYAN}║{RESET}")
-    print(f"{CYAN}║{RESET}  {WHITE}Control (TCP):{RESET} {DIM}{CONTROL_PORT:<44}{RESET} {CYAN}║{RESET}")
-    print(f"{CYAN}╠{'═' * width}╣{RESET}")
-    print(f"{CYAN}║{RESET}  {YELLOW}🔑 PAIRING CODE:{RESET}  {BOLD}{MAGENTA}{pairing_code}{RESET}                                    {CYAN}║{RESET}")
-    print(f"{CYAN}╚{'═' * width}╝{RESET}")
-    print()
+    lines = [
+        "",
+        f"{CYAN}╔{'═' * width}╗{RESET}",
+        f"{CYAN}║{BOLD}{WHITE}{'HOTSPOT KEYBOARD & MOUSE SERVER':^{width}}{RESET}{CYAN}║{RESET}",
+        f"{CYAN}║{DIM}{'v1.0.0 (Production) - Created by Flex':^{width}}{RESET}{CYAN}║{RESET}",
+        f"{CYAN}╠{'═' * width}╣{RESET}",
+        f"{CYAN}║{RESET}  {WHITE}IP Address:{RESET}    {GREEN}{ip:<44}{RESET} {CYAN}║{RESET}",
+        f"{CYAN}║{RESET}  {WHITE}Discovery:{RESET}     {DIM}UDP {DISCOVERY_PORT:<40}{RESET} {CYAN}║{RESET}",
+        f"{CYAN}║{RESET}  {WHITE}Input (UDP):{RESET}   {DIM}{INPUT_PORT:<44}{RESET} {CYAN}║{RESET}",
+        f"{CYAN}║{RESET}  {WHITE}Control (TCP):{RESET} {DIM}{CONTROL_PORT:<44}{RESET} {CYAN}║{RESET}",
+        f"{CYAN}╠{'═' * width}╣{RESET}",
+        f"{CYAN}║{RESET}  {YELLOW}🔑 PAIRING CODE:{RESET}  {BOLD}{MAGENTA}{pairing_code}{RESET}                                    {CYAN}║{RESET}",
+        f"{CYAN}╚{'═' * width}╝{RESET}",
+        "",
+    ]
+    console.info("\n".join(lines), extra={"event": "raw"})
     log_status("Server started successfully. Waiting for App connection...")
 
 
 def log_status(message: str, icon: str = "⏳"):
-    """Log a status message with timestamp and icon."""
-    from datetime import datetime
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    CYAN = "\033[96m"
-    WHITE = "\033[97m"
-    DIM = "\033[2m"
-    RESET = "\033[0m"
-    print(f"{DIM}[{timestamp}]{RESET} {icon} {WHITE}{message}{RESET}")
+    """Log a status message with timestamp and icon (rendered by the log listener)."""
+    console.info(message, extra={"event": "status", "icon": icon}, stacklevel=2)
 
 
 def log_event(event_type: str, message: str):
-    """Log an event with appropriate styling based on type."""
-    from datetime import datetime
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    
-    # Color map for different event types
-    colors = {
-        "success": ("\033[92m", "✓"),   # Green
-        "warning": ("\033[93m", "⚠"),   # Yellow
-        "error": ("\033[91m", "✗"),     # Red
-        "info": ("\033[96m", "ℹ"),      # Cyan
-        "connect": ("\033[92m", "🔗"),  # Green
-        "disconnect": ("\033[93m", "🔄"),  # Yellow
-        "auth": ("\033[95m", "🔑"),     # Magenta
-    }
-    
-    color, icon = colors.get(event_type, ("\033[97m", "•"))
-    DIM = "\033[2m"
-    RESET = "\033[0m"
-    
-    print(f"{DIM}[{timestamp}]{RESET} {icon} {color}{message}{RESET}")
+    """Log an event, styled by type (see logqueue.EVENT_STYLES)."""
+    console.info(message, extra={"event": event_type}, stacklevel=2)
 
 
 def log_pairing_code(code: str):
@@ -138,31 +138,133 @@ def log_pairing_code(code: str):
 class HotspotKBMServer:
     """Main server class that orchestrates all components."""
     
-    def __init__(self):
+    def __init__(
+        self,
+        absolute_pointer: bool = False,
+        key_repeat: bool = False,
+        macros_path: Optional[str] = None,
+        max_clients: int = 1,
+        null_output: bool = False,
+        heartbeat_deadline: float = HEARTBEAT_DEADLINE,
+        passthrough: bool = False,
+        click_barrier: bool = False,
+        injector: bool = False,
+        receiver_process: bool = False,
+        realtime: bool = False,
+        metrics_port: int = 0,
+        tuning_path: Optional[str] = None,
+        record_path: Optional[str] = None,
+        profile_prefix: Optional[str] = None
+    ):
+        """
+        Args:
+            absolute_pointer: Also create a tablet-style EV_ABS pointer and
+                              accept ABS <x> <y> packets from clients
+            key_repeat: Repeat held keys from the server's timer heap with
+                        the configured delay and rate
+            macros_path: JSON file of named macros for MACRO <name> commands
+            max_clients: >1 enables multi-client mode: per-client smoothers
+                         merged into one report per frame
+            null_output: Count events instead of writing to uinput (no root)
+            heartbeat_deadline: Seconds without PONG before a client is
+                                considered dead (0 = never)
+            passthrough: Let the movement smoother bypass the capacitor
+                         while input is dense and steady
+            click_barrier: Flush pending movement before every button edge
+                           so clicks land exactly where the cursor was sent
+            injector: Give each device its own writer thread with key and
+                      button writes ahead of coalesced motion
+            receiver_process: Receive and parse UDP input in a separate
+                              process (shared-memory ring, own CPU)
+            realtime: SCHED_FIFO/affinity for frame and injection threads,
+                      mlockall and gc.freeze (whatever is permitted)
+            metrics_port: Serve Prometheus metrics on 127.0.0.1:<port>
+                          (0 = disabled)
+            tuning_path: Smoother parameter profile written by server.tuner
+            record_path: Record every datagram and control line to this
+                         ring file (python3 -m server.recorder replays it)
+            profile_prefix: Sample all threads and record pipeline spans;
+                            <prefix>.trace.json and <prefix>.folded are
+                            written on shutdown
+        """
         self.mouse: Optional[VirtualMouse] = None
         self.keyboard: Optional[VirtualKeyboard] = None
+        self.abs_mouse: Optional[VirtualAbsoluteMouse] = None
+        self.abs_sampler: Optional[AbsolutePositionSampler] = None
+        self._absolute_pointer = absolute_pointer
+        self.timers = TimerScheduler()
+        self.key_repeater: Optional[KeyRepeater] = None
+        self._key_repeat = key_repeat
+        self.macro_engine: Optional[MacroEngine] = None
+        self._macros_path = macros_path
         self.auth_manager = AuthManager()
-        self.connection_manager = ConnectionManager()
+        self._pairing_timer: Optional[TimerHandle] = None  # Renews an expiring code
+        self._pairing_lock = threading.Lock()
+        self.connection_manager = ConnectionManager(max_clients)
+        self._null_output = null_output
+        self._passthrough = passthrough
+        self._click_barrier = click_barrier
+        self._injector = injector
+        self._receiver_process = receiver_process
+        self.realtime: Optional[RealtimeTuner] = RealtimeTuner() if realtime else None
+        self._metrics_port = metrics_port
+        self._tuning_path = tuning_path
+        self._record_path = record_path
+        self.recorder: Optional[SessionRecorder] = None
+        self._profile_prefix = profile_prefix
+        self.profiler: Optional[Profiler] = Profiler() if profile_prefix else None
+        self.log_pipeline = AsyncLogging()  # Callers only enqueue; a listener thread writes
+        self._input_params = dict(INPUT_SMOOTHER_PARAMS)
+        self._scroll_params = dict(SCROLL_SMOOTHER_PARAMS)
+        # Recv-to-inject latency (movement: until its last pixel leaves the smoother)
+        self.latency: Dict[str, Histogram] = {
+            "move": Histogram(),
+            "key": Histogram(),
+            "click": Histogram(),
+        }
+        self.metrics_server: Optional[MetricsServer] = None
         self.discovery_service: Optional[DiscoveryService] = None
-        self.udp_listener: Optional[UDPInputListener] = None
+        self.udp_listener = None  # UDPInputListener or ProcessInputListener
         self.tcp_listener: Optional[TCPControlListener] = None
         self.input_smoother: Optional[InputSmoother] = None
         self.scroll_smoother: Optional[ScrollSmoother] = None
+        self.mixer: Optional[SmootherMixer] = None  # Multi-client mode only
+        self.heartbeat = HeartbeatMonitor(
+            self.timers,
+            on_dead=self._on_dead_peer,
+            on_rtt=self._on_rtt,
+            deadline=heartbeat_deadline
+        )
+        self.rate_controller = RateController(
+            self.timers,
+            load_probe=self._rate_load_probe,
+            on_ack=self._on_rate_acked
+        )
+        self._session_tokens: Dict[str, str] = {}  # client IP -> current token
+        # Multi-client: smoothers of disconnected clients, kept for RESUME
+        self._parked_smoothers: Dict[str, Tuple[InputSmoother, ScrollSmoother]] = {}
         self._running = False
         self._local_ip = ""
     
     def _on_auth(self, client_socket: socket.socket, client_ip: str, code: str):
         """Handle authentication attempt."""
         expected_code = self.auth_manager.current_code
-        logger.debug(f"Auth attempt from {client_ip}: received='{code}' expected='{expected_code}'")
+        logger.debug("Auth attempt from %s: received='%s' expected='%s'", client_ip, code, expected_code)
         
         if self.auth_manager.validate_code(code):
             # Check if we can accept this client
             if self.connection_manager.try_connect(client_ip, client_socket):
                 self.tcp_listener.set_authenticated(True)
                 self.tcp_listener.send_to_client("AUTH_OK")
+                self._send_session_token(client_ip)
+                self._attach_client(client_ip)
+                self.heartbeat.add_client(client_ip, client_socket)
+                self.rate_controller.add_client(client_ip, client_socket)
                 logger.info(f"Client authenticated: {client_ip}")
                 log_event("connect", f"Client connected: {client_ip}")
+                if not self.connection_manager.is_full():
+                    # Slots left: the code on screen pairs the next phone too
+                    log_pairing_code(self._pairing_code(fresh=False))
             else:
                 self.tcp_listener.send_to_client("AUTH_FAIL:ALREADY_CONNECTED")
                 log_event("warning", f"Auth rejected (already connected): {client_ip}")
@@ -170,26 +272,236 @@ class HotspotKBMServer:
             self.tcp_listener.send_to_client("AUTH_FAIL:INVALID_CODE")
             log_event("warning", f"Auth failed (invalid code): {client_ip} - received='{code}' expected='{expected_code}'")
     
+    def _on_resume(self, client_socket: socket.socket, client_ip: str, token: str):
+        """
+        Handle session resume - restores a paired session in one round trip.
+        
+        In single-client mode the smoothers are server-wide and keep running
+        across a disconnect, so the resumed client picks up their state
+        as-is. In multi-client mode the client's own smoothers were parked
+        under its token and are re-attached.
+        
+        The token is only consumed once the client holds a slot, so a
+        rejected attempt (server full, slot race) leaves it valid for a
+        retry instead of forcing a new pairing.
+        """
+        token = token.strip()
+        if not self.auth_manager.has_session(token):
+            self.tcp_listener.send_to_client("RESUME_FAIL:INVALID_TOKEN")
+            log_event("warning", f"Resume failed (invalid or expired token): {client_ip}")
+            return
+        
+        if not self.connection_manager.try_connect(client_ip, client_socket):
+            self.tcp_listener.send_to_client("RESUME_FAIL:ALREADY_CONNECTED")
+            log_event("warning", f"Resume rejected (already connected): {client_ip}")
+            return
+        
+        if not self.auth_manager.resume_session(token):
+            # Expired or used by a concurrent RESUME since the check above
+            self.connection_manager.disconnect(client_ip, close=False)
+            self.tcp_listener.send_to_client("RESUME_FAIL:INVALID_TOKEN")
+            log_event("warning", f"Resume failed (invalid or expired token): {client_ip}")
+            return
+        
+        self.tcp_listener.set_authenticated(True)
+        self.tcp_listener.send_to_client("RESUME_OK")
+        self._send_session_token(client_ip)
+        self._attach_client(client_ip, self._parked_smoothers.pop(token, None))
+        self.heartbeat.add_client(client_ip, client_socket)
+        self.rate_controller.add_client(client_ip, client_socket)
+        logger.info(f"Client resumed session: {client_ip}")
+        log_event("connect", f"Client reconnected: {client_ip}")
+    
+    def _pairing_code(self, fresh: bool = True) -> str:
+        """
+        Make a pairing code valid for the next AUTH_TIMEOUT seconds.
+        
+        A timer renews the code when it expires while a client slot is
+        free, so the code on the console always works.
+        
+        Args:
+            fresh: Generate a new code; False restarts the lifetime of the
+                   current one (after a pairing that left slots free)
+        
+        Returns:
+            The code to display
+        """
+        with self._pairing_lock:
+            if self._pairing_timer:
+                self._pairing_timer.cancel()
+            code = (not fresh and self.auth_manager.refresh_code()) or self.auth_manager.generate_code()
+            self._pairing_timer = self.timers.call_later(AUTH_TIMEOUT, self._renew_pairing_code)
+        return code
+    
+    def _renew_pairing_code(self):
+        """Timer callback: replace an expired code while a client can still pair."""
+        if not self.connection_manager.is_full():
+            log_pairing_code(self._pairing_code())
+    
+    def _send_session_token(self, client_ip: str):
+        """Issue a fresh session token to the connected client."""
+        token = self.auth_manager.issue_session()
+        self._session_tokens[client_ip] = token
+        self.tcp_listener.send_to_client(f"SESSION {token} {int(self.auth_manager.session_ttl)}")
+    
+    def _create_smoothers(self) -> Tuple[InputSmoother, ScrollSmoother]:
+        """Create a movement/scroll smoother pair with the tuned parameters."""
+        # Uses optimized parameters for smooth, responsive cursor movement
+        input_smoother = InputSmoother(
+            inject_move=self._traced("inject", self._inject_mouse_move),
+            adaptive_passthrough=self._passthrough,
+            thread_setup=self._thread_setup,
+            latency=self.latency["move"],
+            **self._input_params
+        )
+        scroll_smoother = ScrollSmoother(
+            inject_scroll=self._traced("inject", self._inject_scroll),
+            thread_setup=self._thread_setup,
+            **self._scroll_params
+        )
+        if self.profiler and not self.mixer:
+            # Own frame loops (in multi-client mode the mixer's step is traced)
+            input_smoother.step = self._traced("discharge", input_smoother.step)
+            scroll_smoother.step = self._traced("discharge", scroll_smoother.step)
+        return input_smoother, scroll_smoother
+    
+    def _traced(self, name: str, func, since=None):
+        """func, recorded as a profiler span under --profile (else unchanged)."""
+        return self.profiler.traced(name, func, since) if self.profiler else func
+    
+    def _udp_recv_time(self) -> float:
+        return self.udp_listener.recv_time if self.udp_listener else 0.0
+    
+    def _on_datagram(self, stamp: float, client_ip: str, buf, nbytes: int):
+        """Every received datagram, before authorization (--record, --profile)."""
+        if self.recorder:
+            self.recorder.record_datagram(stamp, client_ip, buf, nbytes)
+        if self.profiler:
+            self.profiler.instant("recv", stamp)
+    
+    def _on_line(self, stamp: float, client_ip: str, line: str):
+        """Every received control line, before processing (--record, --profile)."""
+        if self.recorder:
+            self.recorder.record_line(stamp, client_ip, line)
+        if self.profiler:
+            self.profiler.instant("recv", stamp)
+    
+    @property
+    def _thread_setup(self):
+        """Hook for frame/injection threads (real-time mode only)."""
+        return self.realtime.setup_thread if self.realtime else None
+    
+    def _attach_client(
+        self,
+        client_ip: str,
+        smoothers: Optional[Tuple[InputSmoother, ScrollSmoother]] = None
+    ):
+        """Multi-client mode: give a client its own smoothers in the mixer."""
+        if self.mixer:
+            input_smoother, scroll_smoother = smoothers or self._create_smoothers()
+            self.mixer.add_client(client_ip, input_smoother, scroll_smoother)
+    
+    def _on_pong(self, client_ip: str, seq: str):
+        """Handle heartbeat answer - updates the client's RTT estimate."""
+        self.heartbeat.on_pong(client_ip, seq)
+    
+    def _client_input_smoother(self, client_ip: str) -> Optional[InputSmoother]:
+        """The movement smoother that serves a client."""
+        if self.mixer:
+            smoothers = self.mixer.get_client(client_ip)
+            return smoothers[0] if smoothers else None
+        return self.input_smoother
+    
+    def _on_rtt(self, client_ip: str, rtt: float):
+        """Feed the latest RTT estimate to the client's smoother."""
+        smoother = self._client_input_smoother(client_ip)
+        if smoother:
+            smoother.set_network_rtt(rtt)
+    
+    def _rate_load_probe(self, client_ip: str) -> LoadSample:
+        """Server load seen by a client: its frame loop's counters and inbox."""
+        smoother = self._client_input_smoother(client_ip)
+        if smoother is None:
+            return 0, 0, 0.0, 0
+        loop = self.mixer or smoother
+        return loop.frames, loop.frames_overrun, loop.frame_lag, smoother.inbox_depth
+    
+    def _on_rate_acked(self, client_ip: str, hz: float):
+        """The client adopted a send rate - let its smoother expect that spacing."""
+        smoother = self._client_input_smoother(client_ip)
+        if smoother:
+            smoother.set_input_rate(hz)
+    
+    def _on_dead_peer(self, client_ip: str):
+        """Heartbeat deadline missed - revoke the client immediately."""
+        log_event("warning", f"Client timed out (no heartbeat): {client_ip}")
+        # Closing the socket ends its handler, which runs _on_disconnect
+        self.connection_manager.disconnect(client_ip)
+    
     def _on_click(self, button: str, state: str):
         """Handle mouse click event."""
+        if self._click_barrier:
+            # Movement sent before the click must be injected before it
+            if self.mixer:
+                self.mixer.flush_movement()
+            elif self.input_smoother:
+                self.input_smoother.flush()
+        
         if self.mouse:
             try:
                 self.mouse.click(button, state)
             except Exception as e:
                 logger.error(f"Click error: {e}")
+        self._note_latency("click")
     
     def _on_key(self, key: str, state: str):
-        """Handle keyboard event."""
+        """Handle keyboard event - routes through the repeat engine."""
+        if self.key_repeater:
+            self.key_repeater.key_event(key, state, self.tcp_listener.client_ip)
+        self._note_latency("key")
+    
+    def _note_latency(self, kind: str):
+        """Record recv-to-inject latency of the control command just handled."""
+        recv_time = self.tcp_listener.recv_time if self.tcp_listener else 0.0
+        if recv_time:
+            self.latency[kind].observe(time.monotonic() - recv_time)
+    
+    def _inject_key(self, key: str, state: str):
+        """Actually inject a key event (called by the repeat engine)."""
         if self.keyboard:
             try:
                 self.keyboard.key_event(key, state)
             except Exception as e:
                 logger.error(f"Key error: {e}")
     
+    def _on_macro(self, name: str):
+        """Handle macro trigger - plays a precompiled event sequence."""
+        if not self.macro_engine:
+            return
+        try:
+            if not self.macro_engine.run(name):
+                self.tcp_listener.send_to_client("MACRO_FAIL:UNKNOWN")
+                log_event("warning", f"Unknown macro: {name}")
+        except Exception as e:
+            logger.error(f"Macro error: {e}")
+    
+    def _write_keyboard_buffer(self, buffer: bytes):
+        """Write a prebuilt keyboard event buffer (called by the macro engine)."""
+        if self.keyboard:
+            try:
+                self.keyboard.write_prebuilt(buffer)
+            except Exception as e:
+                logger.error(f"Macro write error: {e}")
+    
     def _on_move(self, dx: int, dy: int):
         """Handle mouse movement - routes through smoother for interpolation."""
-        if self.input_smoother:
-            self.input_smoother.add_movement(dx, dy)
+        self.rate_controller.note_packet(self.udp_listener.sender_ip)
+        if self.mixer:
+            smoothers = self.mixer.get_client(self.udp_listener.sender_ip)
+            if smoothers:
+                smoothers[0].add_movement(dx, dy, self.udp_listener.recv_time)
+        elif self.input_smoother:
+            self.input_smoother.add_movement(dx, dy, self.udp_listener.recv_time)
     
     def _inject_mouse_move(self, dx: int, dy: int):
         """Actually inject mouse movement (called by smoother)."""
@@ -200,75 +512,310 @@ class HotspotKBMServer:
                 logger.error(f"Move error: {e}")
     
     def _inject_scroll(self, vertical: int, horizontal: int):
-        """Actually inject scroll event (called by smoother)."""
+        """Actually inject scroll event in 1/120-notch units (called by smoother)."""
         if self.mouse:
             try:
-                self.mouse.scroll(vertical, horizontal)
+                self.mouse.scroll_hires(vertical, horizontal)
             except Exception as e:
                 logger.error(f"Scroll error: {e}")
     
     def _on_scroll(self, vertical: int, horizontal: int):
         """Handle scroll event - routes through smoother."""
-        if self.scroll_smoother:
+        if self.mixer:
+            smoothers = self.mixer.get_client(self.udp_listener.sender_ip)
+            if smoothers:
+                smoothers[1].add_scroll(vertical, horizontal)
+        elif self.scroll_smoother:
             self.scroll_smoother.add_scroll(vertical, horizontal)
     
-    def _on_disconnect(self):
-        """Handle client disconnect - regenerates pairing code dynamically."""
-        self.connection_manager.disconnect()
-        self.auth_manager.reset()
+    def _inject_frame(self, dx: int, dy: int, vertical: int, horizontal: int):
+        """Inject all clients' merged output as one report (called by mixer)."""
+        if self.mouse:
+            try:
+                self.mouse.frame(dx, dy, vertical, horizontal)
+            except Exception as e:
+                logger.error(f"Frame error: {e}")
+    
+    def _on_abs(self, x: int, y: int):
+        """Handle absolute position - latest sample wins each frame."""
+        if self.abs_sampler:
+            self.abs_sampler.set_position(x, y)
+    
+    def _inject_abs_position(self, x: int, y: int):
+        """Actually inject absolute position (called by sampler)."""
+        if self.abs_mouse:
+            try:
+                self.abs_mouse.move_to(x, y)
+            except Exception as e:
+                logger.error(f"Absolute move error: {e}")
+    
+    def _on_disconnect(self, client_ip: str):
+        """
+        Handle an authenticated client's disconnect.
+        
+        Only that client's held keys are released; clients still connected
+        (multi-client mode) are not affected. The freed slot gets a fresh
+        pairing code.
+        """
+        # Never leave a key held (or repeating) after its client is gone
+        if self.key_repeater:
+            self.key_repeater.release_all(client_ip)
+        
+        self.connection_manager.disconnect(client_ip)
+        self.heartbeat.remove_client(client_ip)
+        self.rate_controller.remove_client(client_ip)
+        
+        # Keep the session resumable for a full TTL from now
+        token = self._session_tokens.pop(client_ip, None)
+        smoothers = self.mixer.remove_client(client_ip) if self.mixer else None
+        if token:
+            self.auth_manager.refresh_session(token)
+            if smoothers:
+                self._parked_smoothers[token] = smoothers
         
-        # Generate new pairing code and display dynamically
-        new_code = self.auth_manager.generate_code()
-        log_event("disconnect", "Client disconnected")
-        log_pairing_code(new_code)
-        log_status("Waiting for connection...")
+        # Forget parked smoothers whose token can no longer be resumed
+        for parked in [t for t in self._parked_smoothers if not self.auth_manager.has_session(t)]:
+            del self._parked_smoothers[parked]
+        
+        log_event("disconnect", f"Client disconnected: {client_ip}")
+        
+        # A slot is free again: display a new code (the last one may have expired)
+        log_pairing_code(self._pairing_code())
+        if not self.connection_manager.is_connected():
+            log_status("Waiting for connection...")
     
     def _can_respond_to_discovery(self) -> bool:
-        """Check if discovery should respond."""
-        return not self.connection_manager.is_connected()
+        """Check if discovery should respond (a client slot is free)."""
+        return not self.connection_manager.is_full()
     
     def _is_authorized_client(self, client_ip: str) -> bool:
         """Check if client is authorized for UDP input."""
         return self.connection_manager.is_authorized_client(client_ip)
     
+    def get_stats(self) -> Dict[str, object]:
+        """Snapshot of runtime statistics from all components."""
+        stats: Dict[str, object] = {
+            "clients": self.connection_manager.client_ips,
+            "rtt": self.heartbeat.stats(),
+            "rate": self.rate_controller.stats(),
+            "latency": {kind: histogram.summary() for kind, histogram in self.latency.items()},
+            "logging": self.log_pipeline.stats(),
+        }
+        if self.mouse:
+            stats["mouse_writes"] = self.mouse.write_stats
+        if self.keyboard:
+            stats["keyboard_writes"] = self.keyboard.write_stats
+        if self.abs_sampler:
+            stats["abs_samples"] = {
+                "injected": self.abs_sampler.samples_injected,
+                "discarded": self.abs_sampler.samples_discarded,
+            }
+        if self.input_smoother:
+            stats["smoother"] = {
+                "passthrough": self.input_smoother.passthrough,
+                "mode_switches": self.input_smoother.mode_switches,
+            }
+        if isinstance(self.udp_listener, ProcessInputListener):
+            stats["receiver_ring_dropped"] = self.udp_listener.dropped
+        if self.mixer:
+            stats["mixer"] = {
+                "clients": self.mixer.client_count,
+                "frames": self.mixer.frames,
+                "overruns": self.mixer.frames_overrun,
+            }
+        return stats
+    
+    def _build_metrics(self) -> MetricsRegistry:
+        """
+        Metrics registry over the live components.
+        
+        Sources are resolved at scrape time, so components created later
+        (or per client) are picked up; absent ones are simply omitted.
+        """
+        registry = MetricsRegistry()
+        
+        def attr(component, name):
+            return lambda: getattr(component(), name, None)
+        
+        udp = lambda: self.udp_listener
+        tcp = lambda: self.tcp_listener
+        registry.register("hotspot_udp_packets_total", "counter",
+                          "UDP input datagrams received", attr(udp, "packets_received"))
+        registry.register("hotspot_udp_unauthorized_total", "counter",
+                          "UDP datagrams from unauthorized senders", attr(udp, "packets_unauthorized"))
+        registry.register("hotspot_udp_parse_errors_total", "counter",
+                          "Malformed UDP datagrams", attr(udp, "parse_errors"))
+        registry.register("hotspot_receiver_ring_dropped_total", "counter",
+                          "Events dropped by the receiver process ring", attr(udp, "dropped"))
+        registry.register("hotspot_tcp_connections_total", "counter",
+                          "Control connections accepted", attr(tcp, "connections_accepted"))
+        registry.register("hotspot_tcp_commands_total", "counter", "Control commands received",
+                          lambda: self.tcp_listener.commands.value if self.tcp_listener else None)
+        registry.register("hotspot_tcp_commands_rejected_total", "counter",
+                          "Input commands from unauthenticated connections",
+                          lambda: self.tcp_listener.commands_rejected.value if self.tcp_listener else None)
+        registry.register("hotspot_clients", "gauge", "Connected clients",
+                          lambda: len(self.connection_manager.client_ips))
+        
+        smoothers = {
+            "input": lambda: self.input_smoother,
+            "scroll": lambda: self.scroll_smoother,
+            "mixer": lambda: self.mixer,
+        }
+        for role, component in smoothers.items():
+            labels = {"smoother": role}
+            if role != "mixer":
+                registry.register("hotspot_smoother_packets_total", "counter",
+                                  "Packets charged into the smoother", attr(component, "packets_received"), labels)
+            registry.register("hotspot_smoother_frames_total", "counter",
+                              "Frames run", attr(component, "frames"), labels)
+            registry.register("hotspot_smoother_frame_overruns_total", "counter",
+                              "Frames whose work exceeded the frame interval",
+                              attr(component, "frames_overrun"), labels)
+            registry.register("hotspot_smoother_frame_seconds", "histogram",
+                              "Step + inject cost per frame", attr(component, "frame_time"), labels)
+            if role != "scroll":
+                registry.register("hotspot_smoother_frame_lag_seconds", "gauge",
+                                  "EWMA of frame wake-up lateness", attr(component, "frame_lag"), labels)
+        for kind, histogram in self.latency.items():
+            labels = {"input": kind}
+            registry.register("hotspot_recv_to_inject_seconds", "histogram",
+                              "Receive-to-injection latency", lambda histogram=histogram: histogram, labels)
+            for quantile in (0.5, 0.99):
+                registry.register("hotspot_recv_to_inject_quantile_seconds", "gauge",
+                                  "Receive-to-injection latency quantiles (bucket upper bound)",
+                                  lambda histogram=histogram, quantile=quantile: histogram.quantile(quantile),
+                                  {"input": kind, "quantile": str(quantile)})
+            registry.register("hotspot_recv_to_inject_max_seconds", "gauge",
+                              "Worst receive-to-injection latency",
+                              lambda histogram=histogram: histogram.snapshot()[3], labels)
+        registry.register("hotspot_smoother_passthrough", "gauge", "1 while movement bypasses the capacitor",
+                          attr(smoothers["input"], "passthrough"))
+        registry.register("hotspot_log_dropped_total", "counter", "Log records dropped",
+                          lambda: self.log_pipeline.dropped_rate_limited, {"reason": "rate_limited"})
+        registry.register("hotspot_log_dropped_total", "counter", "Log records dropped",
+                          lambda: self.log_pipeline.dropped_queue_full, {"reason": "queue_full"})
+        registry.register("hotspot_log_pending", "gauge", "Log records waiting for the writer thread",
+                          lambda: self.log_pipeline.pending)
+        
+        devices = {
+            "mouse": lambda: self.mouse,
+            "keyboard": lambda: self.keyboard,
+            "absolute": lambda: self.abs_mouse,
+        }
+        device_metrics = [
+            ("hotspot_uinput_reports_written_total", "counter", "Reports written to uinput", "written"),
+            ("hotspot_uinput_reports_queued_total", "counter", "Reports parked on EAGAIN", "queued"),
+            ("hotspot_uinput_reports_coalesced_total", "counter", "Motion reports merged while queued", "coalesced"),
+            ("hotspot_uinput_reports_dropped_total", "counter", "Reports dropped (queue full or write error)", "dropped"),
+            ("hotspot_uinput_write_errors_total", "counter", "uinput writes that failed", "errors"),
+            ("hotspot_uinput_pending", "gauge", "Reports waiting for the device", "pending"),
+        ]
+        for device_name, device in devices.items():
+            for name, kind, help_text, key in device_metrics:
+                registry.register(
+                    name, kind, help_text,
+                    lambda device=device, key=key: device().write_stats.get(key) if device() else None,
+                    {"device": device_name}
+                )
+        return registry
+    
     def start(self):
         """Start the server."""
-        check_privileges()
+        if not self._null_output:
+            check_privileges()
         
         self._local_ip = get_local_ip()
         
         try:
+            self.log_pipeline.start()
+            
+            if self.profiler:
+                self.profiler.start()
+            
+            if self.realtime:
+                self.realtime.apply_process()
+            
             # Initialize uinput devices
-            logger.info("Creating virtual input devices...")
-            self.mouse = VirtualMouse()
-            self.keyboard = VirtualKeyboard()
+            if self._null_output:
+                logger.info("Using null output sinks (no uinput)")
+                self.mouse = NullMouse()
+                self.keyboard = NullKeyboard()
+            else:
+                logger.info("Creating virtual input devices...")
+                self.mouse = VirtualMouse()
+                self.keyboard = VirtualKeyboard()
             
-            # Initialize capacitor-style input smoother
-            # Uses optimized parameters for smooth, responsive cursor movement
-            self.input_smoother = InputSmoother(
-                inject_move=self._inject_mouse_move,
-                target_fps=60,
-                discharge_rate=0.16,  # Discharge 16% of buffer per frame (smooth)
-                continuation_timeout_ms=100,  # 100ms momentum after input stops
-                smoothing_factor=0.35,
-                velocity_decay=0.65  # 65% decay for precision control
-            )
-            self.input_smoother.start()
-            logger.info("Capacitor smoother started (60 FPS, 16% discharge rate)")
+            if self._injector:
+                # One writer thread per device: keys/buttons before motion
+                self.mouse = QueuedMouse(self.mouse, self._thread_setup)
+                self.keyboard = QueuedKeyboard(self.keyboard, self._thread_setup)
+                logger.info("Priority injection workers enabled")
             
-            # Initialize scroll smoother with capacitor logic
-            self.scroll_smoother = ScrollSmoother(
-                inject_scroll=self._inject_scroll,
-                target_fps=60,
-                sensitivity=1.5,        # 1.8x sensitivity (balanced)
-                discharge_rate=0.18,    # Slower discharge for smoothness
-                continuation_timeout_ms=120  # Balanced timeout
+            # Shared timer heap; held keys are tracked to release them on
+            # disconnect, and repeated with --key-repeat
+            self.timers.start()
+            self.key_repeater = KeyRepeater(
+                inject_key=self._inject_key,
+                scheduler=self.timers,
+                emit_repeats=self._key_repeat
             )
-            self.scroll_smoother.start()
-            logger.info("Scroll smoother started (Capacitor logic)")
             
-            # Generate pairing code
-            pairing_code = self.auth_manager.generate_code()
+            # Macros are compiled once here, never per trigger
+            if self._macros_path:
+                self.macro_engine = MacroEngine(self._write_keyboard_buffer, self.timers)
+                count = self.macro_engine.load(self._macros_path)
+                logger.info(f"Loaded {count} macros from {self._macros_path}")
+            
+            # Smoother constants from an offline sweep (server.tuner)
+            if self._tuning_path:
+                self._input_params, self._scroll_params = load_profile(self._tuning_path)
+                logger.info(f"Loaded tuning profile {self._tuning_path}: {self._input_params}")
+            
+            if self.connection_manager.max_clients > 1:
+                # Multi-client: per-client smoothers, one shared frame loop
+                self.mixer = SmootherMixer(
+                    inject_frame=self._traced("inject", self._inject_frame),
+                    target_fps=60,
+                    thread_setup=self._thread_setup
+                )
+                if self.profiler:
+                    self.mixer.step = self._traced("discharge", self.mixer.step)
+                self.mixer.start()
+                logger.info(
+                    f"Multi-client mode: up to {self.connection_manager.max_clients} clients, "
+                    "merged 60 FPS output"
+                )
+            else:
+                # Initialize capacitor-style input and scroll smoothers
+                self.input_smoother, self.scroll_smoother = self._create_smoothers()
+                self.input_smoother.start()
+                logger.info(
+                    f"Capacitor smoother started ({self._input_params['target_fps']} FPS, "
+                    f"{self._input_params['discharge_rate']:.0%} discharge rate)"
+                )
+                self.scroll_smoother.start()
+                logger.info("Scroll smoother started (Capacitor logic, hi-res wheel)")
+            
+            # Optional tablet-style absolute pointer
+            if self._absolute_pointer:
+                self.abs_mouse = NullMouse() if self._null_output else VirtualAbsoluteMouse()
+                if self._injector:
+                    self.abs_mouse = QueuedMouse(self.abs_mouse, self._thread_setup)
+                self.abs_sampler = AbsolutePositionSampler(
+                    inject_position=self._inject_abs_position,
+                    target_fps=60
+                )
+                self.abs_sampler.start()
+                logger.info("Absolute pointer enabled (EV_ABS, latest-sample-wins)")
+            
+            # Generate pairing code (renewed while a client slot is free)
+            pairing_code = self._pairing_code()
+            
+            if self._record_path:
+                self.recorder = SessionRecorder(self._record_path)
+                logger.info(f"Recording session to {self._record_path} "
+                            f"({self.recorder.capacity} records, ring)")
             
             # Start discovery service
             self.discovery_service = DiscoveryService(
@@ -277,22 +824,42 @@ class HotspotKBMServer:
             )
             self.discovery_service.start()
             
-            # Start UDP input listener
-            self.udp_listener = UDPInputListener(
+            # Start UDP input listener (optionally in its own process)
+            listener_class = ProcessInputListener if self._receiver_process else UDPInputListener
+            self.udp_listener = listener_class(
                 self._is_authorized_client,
-                self._on_move,
-                self._on_scroll
+                self._traced("charge", self._on_move, since=self._udp_recv_time),
+                self._traced("charge", self._on_scroll, since=self._udp_recv_time),
+                on_abs=self._on_abs if self._absolute_pointer else None,
+                on_datagram=self._on_datagram if self.recorder or self.profiler else None
             )
             self.udp_listener.start()
             
             # Start TCP control listener
             self.tcp_listener = TCPControlListener(
                 self._on_auth,
-                self._on_click,
-                self._on_key,
-                self._on_disconnect
+                self._traced("inject", self._on_click),
+                self._traced("inject", self._on_key),
+                self._on_disconnect,
+                on_macro=self._on_macro if self._macros_path else None,
+                on_resume=self._on_resume,
+                on_pong=self._on_pong,
+                on_rate_ack=self.rate_controller.on_ack,
+                on_line=self._on_line if self.recorder or self.profiler else None,
+                max_clients=self.connection_manager.max_clients
             )
             self.tcp_listener.start()
+            self.heartbeat.start()
+            self.rate_controller.start()
+            
+            if self._metrics_port:
+                self.metrics_server = MetricsServer(self._build_metrics(), self._metrics_port)
+                self.metrics_server.start()
+            
+            if self.realtime:
+                # Everything long-lived exists now: keep it out of GC scans
+                self.realtime.freeze_gc()
+                logger.info(f"Real-time mode applied: {self.realtime.report()}")
             
             # Print banner
             print_banner(self._local_ip, pairing_code)
@@ -304,7 +871,7 @@ class HotspotKBMServer:
                 signal.pause()
                 
         except KeyboardInterrupt:
-            print("\n\nShutting down...")
+            console.info("\n\nShutting down...", extra={"event": "raw"})
         except Exception as e:
             logger.error(f"Server error: {e}")
             raise
@@ -326,12 +893,42 @@ class HotspotKBMServer:
         if self.discovery_service:
             self.discovery_service.stop()
         
+        if self.key_repeater:
+            self.key_repeater.release_all()
+        
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        
+        self.heartbeat.stop()
+        self.rate_controller.stop()
+        self.timers.stop()
+        
         if self.input_smoother:
             self.input_smoother.stop()
         
         if self.scroll_smoother:
             self.scroll_smoother.stop()
         
+        if self.mixer:
+            self.mixer.stop()
+        
+        if self.abs_sampler:
+            self.abs_sampler.stop()
+        
+        if self.abs_mouse:
+            self.abs_mouse.close()
+        
+        if self.recorder:
+            self.recorder.close()
+        
+        if self.profiler:
+            self.profiler.stop()
+            self.profiler.write(self._profile_prefix)
+            self.profiler = None
+        
+        logger.info(f"Runtime stats: {self.get_stats()}")
+        
         if self.keyboard:
             self.keyboard.close()
         
@@ -341,6 +938,7 @@ class HotspotKBMServer:
         self.connection_manager.disconnect()
         
         logger.info("Server stopped")
+        self.log_pipeline.stop()
 
 
 def main():
@@ -353,12 +951,110 @@ def main():
         action='store_true',
         help='Enable debug logging'
     )
+    parser.add_argument(
+        '--absolute',
+        action='store_true',
+        help='Create a tablet-style absolute pointer for ABS <x> <y> clients'
+    )
+    parser.add_argument(
+        '--key-repeat',
+        action='store_true',
+        help='Repeat held keys on the server (500 ms delay, 25 Hz) instead of '
+             'relying on the desktop\'s repeat settings'
+    )
+    parser.add_argument(
+        '--max-clients',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Allow up to N simultaneous clients with merged output (default: 1)'
+    )
+    parser.add_argument(
+        '--null-output',
+        action='store_true',
+        help='Count events instead of injecting them (testing, no root needed)'
+    )
+    parser.add_argument(
+        '--heartbeat-deadline',
+        type=float,
+        default=HEARTBEAT_DEADLINE,
+        metavar='SECONDS',
+        help=f'Drop a client after this long without PONG (0 = never, default: {HEARTBEAT_DEADLINE})'
+    )
+    parser.add_argument(
+        '--passthrough',
+        action='store_true',
+        help='Bypass movement smoothing while input is already dense and steady'
+    )
+    parser.add_argument(
+        '--click-barrier',
+        action='store_true',
+        help='Flush smoothed movement before each click for exact placement'
+    )
+    parser.add_argument(
+        '--injector',
+        action='store_true',
+        help='Write each device from its own thread, keys and clicks before motion'
+    )
+    parser.add_argument(
+        '--receiver-process',
+        action='store_true',
+        help='Receive and parse UDP input in a separate process on its own CPU'
+    )
+    parser.add_argument(
+        '--realtime',
+        action='store_true',
+        help='SCHED_FIFO + CPU affinity for frame/injection threads, mlockall, gc.freeze'
+    )
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        default=0,
+        metavar='PORT',
+        help='Serve Prometheus metrics on http://127.0.0.1:PORT/metrics (default: off)'
+    )
+    parser.add_argument(
+        '--tuning',
+        metavar='PATH',
+        help='Smoother parameter profile written by python3 -m server.tuner'
+    )
+    parser.add_argument(
+        '--record',
+        metavar='PATH',
+        help='Record received input and control lines to a ring file (see server.recorder)'
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='PREFIX',
+        help='Sample all threads; write PREFIX.trace.json (Chrome timeline) and PREFIX.folded on exit'
+    )
+    parser.add_argument(
+        '--macros',
+        metavar='PATH',
+        help='JSON file of named macros triggered with MACRO <name>'
+    )
     args = parser.parse_args()
     
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
-    server = HotspotKBMServer()
+    server = HotspotKBMServer(
+        absolute_pointer=args.absolute,
+        key_repeat=args.key_repeat,
+        macros_path=args.macros,
+        max_clients=args.max_clients,
+        null_output=args.null_output,
+        heartbeat_deadline=args.heartbeat_deadline,
+        passthrough=args.passthrough,
+        click_barrier=args.click_barrier,
+        injector=args.injector,
+        receiver_process=args.receiver_process,
+        realtime=args.realtime,
+        metrics_port=args.metrics_port,
+        tuning_path=args.tuning,
+        record_path=args.record,
+        profile_prefix=args.profile
+    )
     
     # Handle signals
     def signal_handler(signum, frame):
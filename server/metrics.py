@@ -0,0 +1,366 @@
+"""
+Runtime metrics: per-thread counters, log-bucketed histograms, and a
+Prometheus text endpoint on localhost (--metrics-port).
+
+Hot paths never take a lock to count something:
+
+- Counter keeps one cell per thread; inc() touches only the calling
+  thread's cell, and a scrape sums the cells. A thread's cell is folded
+  into a shared base when the thread exits.
+- Histogram does the same with a fixed array of log-linear buckets per
+  thread (power-of-two octaves split into four linear sub-buckets,
+  microsecond resolution, ~8 s range), so memory is constant no matter
+  how many samples are observed.
+- Everything else (smoother frames, uinput write counters, ...) already
+  lives in plain attributes written by a single thread; those are read at
+  scrape time through callbacks.
+
+The HTTP server binds 127.0.0.1 only and serves GET /metrics.
+"""
+
+import threading
+import logging
+import weakref
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Buckets: exact below 2**HISTOGRAM_SUB_BITS microseconds, then each
+# power-of-two octave split into 2**HISTOGRAM_SUB_BITS linear sub-buckets
+# (a bucket spans at most 25% of its value) up to 2**HISTOGRAM_RANGE_BITS
+# microseconds (~8 s); the last bucket is +Inf.
+HISTOGRAM_SUB_BITS = 2
+HISTOGRAM_RANGE_BITS = 23
+HISTOGRAM_BUCKETS = ((HISTOGRAM_RANGE_BITS - HISTOGRAM_SUB_BITS + 1) << HISTOGRAM_SUB_BITS) + 1
+
+_SUB_BUCKETS = 1 << HISTOGRAM_SUB_BITS
+_SUB_MASK = _SUB_BUCKETS - 1
+
+
+class _ThreadExit:
+    """Sentinel kept in a thread's local storage; collected when the thread ends."""
+    
+    __slots__ = ("__weakref__",)
+
+
+class _PerThread(ABC):
+    """
+    Lock-free per-thread cells that fold into a shared base on thread exit.
+    
+    The cell lives in the thread's local storage next to a _ThreadExit
+    sentinel. Thread-local storage is cleared when the thread ends, so the
+    sentinel's finalizer moves the cell into the base and forgets it: a
+    server that starts a thread per TCP connection keeps a fixed number of
+    cells instead of one per connection ever made.
+    """
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._cells: Dict[int, object] = {}
+        self._next_id = 0
+        self._cells_lock = threading.Lock()  # Taken once per thread, at exit and by scrapes
+        self._base = self._new_cell()  # Cells of finished threads
+    
+    @abstractmethod
+    def _new_cell(self):
+        """A zeroed cell."""
+    
+    @abstractmethod
+    def _merge(self, into, cell):
+        """Add cell into another cell."""
+    
+    def _cell(self):
+        """Create and register the calling thread's cell."""
+        cell = self._new_cell()
+        sentinel = _ThreadExit()
+        with self._cells_lock:
+            cell_id = self._next_id
+            self._next_id += 1
+            self._cells[cell_id] = cell
+        weakref.finalize(sentinel, self._retire, cell_id)
+        self._local.cell = cell
+        self._local.exit = sentinel
+        return cell
+    
+    def _retire(self, cell_id: int):
+        """Fold a finished thread's cell into the base."""
+        with self._cells_lock:
+            cell = self._cells.pop(cell_id, None)
+            if cell is not None:
+                self._merge(self._base, cell)
+    
+    def _merged(self):
+        """Base plus every live cell (a new cell)."""
+        total = self._new_cell()
+        with self._cells_lock:
+            self._merge(total, self._base)
+            for cell in self._cells.values():
+                self._merge(total, cell)
+        return total
+    
+    @property
+    def thread_cells(self) -> int:
+        """Cells of threads that are still running."""
+        return len(self._cells)
+
+
+class Counter(_PerThread):
+    """Monotonic counter with one lock-free cell per thread."""
+    
+    def _new_cell(self) -> List[int]:
+        return [0]
+    
+    def _merge(self, into: List[int], cell: List[int]):
+        into[0] += cell[0]
+    
+    def inc(self, amount: int = 1):
+        """Add to the calling thread's cell."""
+        cell = getattr(self._local, "cell", None) or self._cell()
+        cell[0] += amount
+    
+    @property
+    def value(self) -> int:
+        """Sum over all threads, finished ones included."""
+        return self._merged()[0]
+
+
+class _HistogramCell:
+    """One thread's share of a histogram."""
+    
+    __slots__ = ("buckets", "count", "total", "max")
+    
+    def __init__(self):
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class Histogram(_PerThread):
+    """
+    Fixed-memory latency histogram with log-linear buckets.
+    
+    observe() takes seconds. The microsecond count is bucketed by its bit
+    length (the octave) and the next HISTOGRAM_SUB_BITS bits (the linear
+    sub-bucket), so bucket width grows with the value but stays within
+    25% of it. Quantiles are reported as the upper bound of the bucket
+    they fall in.
+    """
+    
+    def _new_cell(self) -> _HistogramCell:
+        return _HistogramCell()
+    
+    def _merge(self, into: _HistogramCell, cell: _HistogramCell):
+        buckets = into.buckets
+        for index, value in enumerate(cell.buckets):
+            if value:
+                buckets[index] += value
+        into.count += cell.count
+        into.total += cell.total
+        if cell.max > into.max:
+            into.max = cell.max
+    
+    @staticmethod
+    def bucket_index(seconds: float) -> int:
+        """Bucket of a sample (seconds)."""
+        micros = int(seconds * 1e6) if seconds > 0 else 0
+        if micros < _SUB_BUCKETS:
+            return micros
+        octave = micros.bit_length() - HISTOGRAM_SUB_BITS
+        index = (octave << HISTOGRAM_SUB_BITS) + ((micros >> (octave - 1)) & _SUB_MASK)
+        return index if index < HISTOGRAM_BUCKETS else HISTOGRAM_BUCKETS - 1
+    
+    def observe(self, seconds: float):
+        """Record one sample (seconds) in the calling thread's cell."""
+        cell = getattr(self._local, "cell", None) or self._cell()
+        cell.buckets[self.bucket_index(seconds)] += 1
+        cell.count += 1
+        cell.total += seconds
+        if seconds > cell.max:
+            cell.max = seconds
+    
+    def snapshot(self) -> Tuple[List[int], int, float, float]:
+        """Merged (buckets, count, sum, max) over all threads."""
+        merged = self._merged()
+        return merged.buckets, merged.count, merged.total, merged.max
+    
+    @staticmethod
+    def bucket_bound(index: int) -> float:
+        """Upper bound (seconds) of bucket index."""
+        if index < _SUB_BUCKETS:
+            return (index + 1) / 1e6
+        octave, sub = divmod(index, _SUB_BUCKETS)
+        return ((_SUB_BUCKETS + sub + 1) << (octave - 1)) / 1e6
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate q-quantile (bucket upper bound, capped at the max seen)."""
+        buckets, count, _, maximum = self.snapshot()
+        if count == 0:
+            return None
+        rank = q * count
+        seen = 0
+        for index, value in enumerate(buckets):
+            seen += value
+            if seen >= rank and value:
+                return min(self.bucket_bound(index), maximum)
+        return maximum
+    
+    def summary(self) -> Dict[str, Optional[float]]:
+        """p50 / p99 / max / count, in milliseconds (for stats output)."""
+        _, count, _, maximum = self.snapshot()
+        
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000.0, 3) if value is not None else None
+        return {
+            "count": count,
+            "p50_ms": ms(self.quantile(0.50)),
+            "p99_ms": ms(self.quantile(0.99)),
+            "max_ms": ms(maximum) if count else None,
+        }
+
+
+class MetricsRegistry:
+    """
+    Named metrics rendered in Prometheus text exposition format.
+    
+    Each metric is a callable evaluated at scrape time, returning a number,
+    a Histogram, or None (sample omitted, e.g. component not running).
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> (type, help, [(labels, source)])
+        self._metrics: Dict[str, Tuple[str, str, List[Tuple[Dict[str, str], Callable[[], object]]]]] = {}
+    
+    def register(
+        self,
+        name: str,
+        kind: str,
+        help_text: str,
+        source: Callable[[], object],
+        labels: Optional[Dict[str, str]] = None
+    ):
+        """
+        Add one sample source.
+        
+        Args:
+            name: Metric name (same name + different labels = one family)
+            kind: "counter", "gauge" or "histogram"
+            help_text: HELP line
+            source: Callable returning a number, a Histogram or None
+            labels: Optional label set for this sample
+        """
+        with self._lock:
+            family = self._metrics.setdefault(name, (kind, help_text, []))
+            family[2].append((labels or {}, source))
+    
+    def render(self) -> str:
+        """Prometheus text format of all metrics."""
+        lines: List[str] = []
+        with self._lock:
+            families = list(self._metrics.items())
+        
+        for name, (kind, help_text, samples) in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, source in samples:
+                try:
+                    value = source()
+                except Exception as e:
+                    logger.debug("Metric %s failed: %s", name, e)
+                    continue
+                if value is None:
+                    continue
+                if isinstance(value, Histogram):
+                    lines.extend(_render_histogram(name, labels, value))
+                else:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: Dict[str, str], extra: Optional[Tuple[str, str]] = None) -> str:
+    """Render a label set ({a="b",...}) or nothing."""
+    items = list(labels.items())
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+def _number(value: object) -> str:
+    """Render a sample value."""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _render_histogram(name: str, labels: Dict[str, str], histogram: Histogram) -> List[str]:
+    """Cumulative _bucket/_sum/_count lines for one histogram."""
+    buckets, count, total, _ = histogram.snapshot()
+    lines = []
+    cumulative = 0
+    for index, value in enumerate(buckets[:-1]):
+        cumulative += value
+        bound = repr(Histogram.bucket_bound(index))  # Exact: %g would merge neighbouring bounds
+        lines.append(f"{name}_bucket{_labels(labels, ('le', bound))} {cumulative}")
+    lines.append(f"{name}_bucket{_labels(labels, ('le', '+Inf'))} {count}")
+    lines.append(f"{name}_sum{_labels(labels)} {total!r}")
+    lines.append(f"{name}_count{_labels(labels)} {count}")
+    return lines
+
+
+class MetricsServer:
+    """Serves GET /metrics from a registry on 127.0.0.1 (daemon thread)."""
+    
+    def __init__(self, registry: MetricsRegistry, port: int):
+        self._registry = registry
+        self._port = port
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        """Start the HTTP server."""
+        registry = self._registry
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass  # Scrapes are not worth a log line each
+        
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", self._port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Metrics endpoint on http://127.0.0.1:{self.port}/metrics")
+    
+    @property
+    def port(self) -> int:
+        """Bound port (resolves port 0)."""
+        if self._httpd:
+            return self._httpd.server_address[1]
+        return self._port
+    
+    def stop(self):
+        """Stop the HTTP server."""
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
@@ -2,15 +2,104 @@
 Network listeners for UDP (mouse/scroll) and TCP (control/auth) protocols.
 """
 
+import os
 import socket
 import threading
+import time
+import weakref
 import logging
-from typing import Optional, Callable, Tuple
+from typing import Optional, Callable, Dict, Set, Tuple
 
 from .config import INPUT_PORT, CONTROL_PORT, BUTTON_MAP, KEY_MAP
+from .metrics import Counter
 
 logger = logging.getLogger(__name__)
 
+# Input commands by upper-cased first byte: (command word, handler slot)
+_INPUT_COMMANDS = {
+    ord("M"): (b"MOVE", 0),
+    ord("S"): (b"SCROLL", 1),
+    ord("A"): (b"ABS", 2),
+}
+_INPUT_BUFFER_SIZE = 256
+
+
+# One write lock per control socket: lines from the client's handler thread
+# and from the timer thread (PING, RATE) must never interleave
+_write_locks: "weakref.WeakKeyDictionary[socket.socket, threading.Lock]" = weakref.WeakKeyDictionary()
+_write_locks_guard = threading.Lock()
+
+
+def _write_lock(client_socket: socket.socket) -> threading.Lock:
+    """The write lock of a control socket."""
+    with _write_locks_guard:
+        lock = _write_locks.get(client_socket)
+        if lock is None:
+            lock = _write_locks[client_socket] = threading.Lock()
+        return lock
+
+
+def _drop_peer(client_socket: socket.socket):
+    """
+    Shut a connection down after a partial line was written.
+    
+    The newline framing is broken from that point on, so the connection
+    cannot be used any more; the handler thread sees EOF and runs the
+    usual disconnect handling.
+    """
+    try:
+        client_socket.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+def send_nowait(client_socket: socket.socket, data: bytes) -> bool:
+    """
+    Send a whole line without ever waiting; False if it was not sent.
+    
+    Either all of data is written or none of it: if another thread is
+    writing to the socket, or the send buffer is full, nothing is sent.
+    A partial write (send buffer nearly full) leaves half a line on the
+    wire, so the peer is dropped instead of framing the next line wrong.
+    
+    With a timeout set, socket.send() polls for writability before sending,
+    even with MSG_DONTWAIT, and can block for the whole timeout. Such a
+    socket's descriptor is non-blocking, so it is written directly.
+    """
+    lock = _write_lock(client_socket)
+    if not lock.acquire(blocking=False):
+        return False  # The handler thread is sending
+    try:
+        if client_socket.gettimeout() is None:
+            written = client_socket.send(data, socket.MSG_DONTWAIT)
+        else:
+            written = os.write(client_socket.fileno(), data)
+        if written != len(data):
+            logger.warning("Partial control write (%d of %d bytes); dropping the peer", written, len(data))
+            _drop_peer(client_socket)
+            return False
+        return True
+    except (OSError, ValueError):  # Full buffer, closed socket
+        return False
+    finally:
+        lock.release()
+
+
+def parse_input_packet(data: bytes) -> Optional[Tuple[str, int, int]]:
+    """Parse a UDP input packet into (command, val1, val2)."""
+    try:
+        message = data.decode('utf-8', errors='ignore').strip()
+        parts = message.split()
+        
+        if len(parts) == 3:
+            cmd = parts[0].upper()
+            val1 = int(parts[1])
+            val2 = int(parts[2])
+            return (cmd, val1, val2)
+    except (ValueError, IndexError):
+        pass
+    return None
+
 
 class UDPInputListener:
     """
@@ -19,13 +108,17 @@ class UDPInputListener:
     Packet format:
         MOVE <dx> <dy>
         SCROLL <v> <h>
+        ABS <x> <y>      (only when an absolute handler is registered)
     """
     
     def __init__(
         self,
         is_authorized: Callable[[str], bool],
         on_move: Callable[[int, int], None],
-        on_scroll: Callable[[int, int], None]
+        on_scroll: Callable[[int, int], None],
+        on_abs: Optional[Callable[[int, int], None]] = None,
+        on_datagram: Optional[Callable[[float, str, bytearray, int], None]] = None,
+        port: int = INPUT_PORT
     ):
         """
         Initialize the UDP input listener.
@@ -34,10 +127,34 @@ class UDPInputListener:
             is_authorized: Callback to check if client IP is authorized
             on_move: Callback for mouse movement (dx, dy)
             on_scroll: Callback for scroll events (vertical, horizontal)
+            on_abs: Optional callback for absolute positions (x, y)
+            on_datagram: Optional callback for every received datagram,
+                before authorization (recv_time, client_ip, buffer, nbytes)
+            port: UDP port to listen on
         """
         self._is_authorized = is_authorized
         self._on_move = on_move
         self._on_scroll = on_scroll
+        self._on_abs = on_abs
+        self._on_datagram = on_datagram
+        self._port = port
+        
+        # IP and time.monotonic() receive stamp of the datagram being
+        # dispatched (valid inside callbacks, which all run on the single
+        # listener thread)
+        self.sender_ip: Optional[str] = None
+        self.recv_time = 0.0
+        
+        # === PREALLOCATED RECEIVE STATE ===
+        # One buffer for every datagram; parsing reads it in place
+        self._buffer = bytearray(_INPUT_BUFFER_SIZE)
+        self._values = [0, 0]  # Parsed numbers (avoids returning tuples)
+        self._handlers = (on_move, on_scroll, on_abs)
+        
+        # === STATS === (written only by the listener thread)
+        self.packets_received = 0
+        self.packets_unauthorized = 0
+        self.parse_errors = 0
         
         self._socket: Optional[socket.socket] = None
         self._thread: Optional[threading.Thread] = None
@@ -45,40 +162,96 @@ class UDPInputListener:
     
     def _parse_packet(self, data: bytes) -> Optional[Tuple[str, int, int]]:
         """Parse a UDP packet into (command, val1, val2)."""
-        try:
-            message = data.decode('utf-8', errors='ignore').strip()
-            parts = message.split()
-            
-            if len(parts) == 3:
-                cmd = parts[0].upper()
-                val1 = int(parts[1])
-                val2 = int(parts[2])
-                return (cmd, val1, val2)
-        except (ValueError, IndexError):
-            pass
-        return None
+        return parse_input_packet(data)
+    
+    def _dispatch_datagram(self, buf: bytearray, n: int) -> bool:
+        """
+        Parse buf[:n] in place and call the matching handler with plain ints.
+        
+        Accepts the same packets as _parse_packet ("<CMD> <int> <int>",
+        command case-insensitive, optional sign) without creating bytes,
+        str, list or tuple objects: the bytes are read as cached small
+        ints and both values go into the preallocated self._values.
+        Returns False if the datagram is malformed.
+        """
+        i = 0
+        while i < n and buf[i] <= 32:
+            i += 1
+        if i >= n:
+            return False
+        
+        entry = _INPUT_COMMANDS.get(buf[i] & 0xDF)  # ASCII upper-case
+        if entry is None:
+            return False
+        word, slot = entry
+        length = len(word)
+        if not buf.startswith(word, i):  # Clients send upper case; check the rest
+            k = 1
+            while k < length:
+                if i + k >= n or (buf[i + k] & 0xDF) != word[k]:
+                    return False
+                k += 1
+        i += length
+        
+        # === TWO SIGNED DECIMALS, EACH AFTER A BLANK ===
+        values = self._values
+        field = 0
+        while field < 2:
+            if i >= n or buf[i] > 32:
+                return False  # Word or number must end at a blank
+            i += 1
+            while i < n and buf[i] <= 32:
+                i += 1
+            negative = False
+            if i < n and (buf[i] == 45 or buf[i] == 43):  # '-' / '+'
+                negative = buf[i] == 45
+                i += 1
+            start = i
+            value = 0
+            while i < n and 48 <= buf[i] <= 57:
+                value = value * 10 + buf[i] - 48
+                i += 1
+            if i == start:
+                return False
+            values[field] = -value if negative else value
+            field += 1
+        
+        while i < n and buf[i] <= 32:
+            i += 1
+        if i != n:
+            return False  # Trailing garbage
+        
+        handler = self._handlers[slot]
+        if handler is not None:
+            handler(values[0], values[1])
+        return True
     
     def _listen_loop(self):
-        """Main UDP listening loop."""
+        """
+        Main UDP listening loop.
+        
+        Receives into the preallocated buffer (recvfrom_into) and parses it
+        in place, so a steady packet stream allocates nothing per packet
+        beyond the (ip, port) address the socket API returns.
+        """
+        buf = self._buffer
         while self._running:
             try:
-                data, addr = self._socket.recvfrom(256)
+                nbytes, addr = self._socket.recvfrom_into(buf)
+                self.recv_time = time.monotonic()
                 client_ip = addr[0]
+                self.packets_received += 1
+                if self._on_datagram:
+                    self._on_datagram(self.recv_time, client_ip, buf, nbytes)
                 
                 # Check authorization
                 if not self._is_authorized(client_ip):
+                    self.packets_unauthorized += 1
                     continue
+                self.sender_ip = client_ip
                 
-                parsed = self._parse_packet(data)
-                if parsed is None:
-                    continue
-                
-                cmd, val1, val2 = parsed
-                
-                if cmd == "MOVE":
-                    self._on_move(val1, val2)
-                elif cmd == "SCROLL":
-                    self._on_scroll(val1, val2)
+                if not self._dispatch_datagram(buf, nbytes):
+                    self.parse_errors += 1
                     
             except socket.timeout:
                 continue
@@ -87,6 +260,13 @@ class UDPInputListener:
                     logger.error(f"UDP socket error: {e}")
                 break
     
+    @property
+    def port(self) -> int:
+        """Bound UDP port (resolves port 0 to the kernel-assigned port)."""
+        if self._socket:
+            return self._socket.getsockname()[1]
+        return self._port
+    
     def start(self):
         """Start the UDP listener."""
         if self._running:
@@ -95,13 +275,13 @@ class UDPInputListener:
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self._socket.settimeout(1.0)
-        self._socket.bind(('', INPUT_PORT))
+        self._socket.bind(('', self._port))
         
         self._running = True
         self._thread = threading.Thread(target=self._listen_loop, daemon=True)
         self._thread.start()
         
-        logger.info(f"UDP input listener started on port {INPUT_PORT}")
+        logger.info(f"UDP input listener started on port {self._port}")
     
     def stop(self):
         """Stop the UDP listener."""
@@ -127,8 +307,18 @@ class TCPControlListener:
     
     Packet format:
         AUTH <code>
+        RESUME <token>   (only when a resume handler is registered)
         CLICK <button> <state>
         KEY <state> <keycode>
+        MACRO <name>     (only when a macro handler is registered)
+        PING <payload>   (answered with PONG <payload>, any time)
+        PONG <seq>       (answer to a server PING; only with a pong handler)
+        RATE_ACK <hz>    (client adopted a suggested send rate)
+    
+    Each connection is handled on its own thread, up to max_clients at a
+    time (1 by default: further connections wait in the backlog). Callbacks
+    run on the thread of the client that sent the command, so
+    set_authenticated() and send_to_client() default to that client.
     """
     
     def __init__(
@@ -136,7 +326,14 @@ class TCPControlListener:
         on_auth: Callable[[socket.socket, str, str], None],
         on_click: Callable[[str, str], None],
         on_key: Callable[[str, str], None],
-        on_disconnect: Callable[[], None]
+        on_disconnect: Callable[[str], None],
+        on_macro: Optional[Callable[[str], None]] = None,
+        on_resume: Optional[Callable[[socket.socket, str, str], None]] = None,
+        on_pong: Optional[Callable[[str, str], None]] = None,
+        on_rate_ack: Optional[Callable[[str, str], None]] = None,
+        on_line: Optional[Callable[[float, str, str], None]] = None,
+        max_clients: int = 1,
+        port: int = CONTROL_PORT
     ):
         """
         Initialize the TCP control listener.
@@ -145,26 +342,52 @@ class TCPControlListener:
             on_auth: Callback for auth attempt (socket, client_ip, code)
             on_click: Callback for click events (button, state)
             on_key: Callback for key events (key, state)
-            on_disconnect: Callback when client disconnects
+            on_disconnect: Callback when an authenticated client disconnects
+                (client_ip); connections that never authenticated, such as
+                a rejected second connection, close silently
+            on_macro: Optional callback for macro triggers (name)
+            on_resume: Optional callback for session resume (socket, client_ip, token)
+            on_pong: Optional callback for heartbeat answers (client_ip, seq)
+            on_rate_ack: Optional callback for send-rate acknowledgements (client_ip, hz)
+            on_line: Optional callback for every received line, before it is
+                processed (recv_time, client_ip, line)
+            max_clients: Maximum simultaneous control connections
+            port: TCP port to listen on
         """
         self._on_auth = on_auth
         self._on_click = on_click
         self._on_key = on_key
         self._on_disconnect = on_disconnect
+        self._on_macro = on_macro
+        self._on_resume = on_resume
+        self._on_pong = on_pong
+        self._on_rate_ack = on_rate_ack
+        self._on_line = on_line
+        self._port = port
         
         self._socket: Optional[socket.socket] = None
         self._thread: Optional[threading.Thread] = None
-        self._client_thread: Optional[threading.Thread] = None
         self._running = False
-        self._client_socket: Optional[socket.socket] = None
-        self._authenticated = False
+        
+        # === PER-CLIENT STATE ===
+        self._slots = threading.BoundedSemaphore(max(1, max_clients))
+        self._clients_lock = threading.Lock()
+        self._client_threads: Dict[socket.socket, threading.Thread] = {}
+        self._authenticated: Set[socket.socket] = set()
+        self._local = threading.local()  # .socket = client served by this thread
+        
+        # === STATS === (Counters: one client thread per connection)
+        self.connections_accepted = 0
+        self.commands = Counter()
+        self.commands_rejected = Counter()  # Input commands before AUTH
     
     def _handle_client(self, client_socket: socket.socket, client_addr: Tuple[str, int]):
         """Handle a connected client."""
         client_ip = client_addr[0]
         logger.info(f"TCP client connected: {client_ip}")
         
-        self._client_socket = client_socket
+        self._local.socket = client_socket
+        self._local.client_ip = client_ip
         buffer = ""
         
         try:
@@ -173,13 +396,8 @@ class TCPControlListener:
                     data = client_socket.recv(1024)
                     if not data:
                         break
-                    
-                    buffer += data.decode('utf-8', errors='ignore')
-                    
-                    # Process complete lines
-                    while '\n' in buffer:
-                        line, buffer = buffer.split('\n', 1)
-                        self._process_command(client_socket, client_ip, line.strip())
+                    self._local.recv_time = time.monotonic()
+                    buffer = self._process_data(client_socket, client_ip, buffer, data)
                         
                 except socket.timeout:
                     continue
@@ -190,13 +408,32 @@ class TCPControlListener:
             logger.error(f"Client handler error: {e}")
         finally:
             logger.info(f"TCP client disconnected: {client_ip}")
-            self._authenticated = False
-            self._client_socket = None
+            with self._clients_lock:
+                was_authenticated = client_socket in self._authenticated
+                self._authenticated.discard(client_socket)
+                self._client_threads.pop(client_socket, None)
             try:
                 client_socket.close()
             except:
                 pass
-            self._on_disconnect()
+            try:
+                if was_authenticated:
+                    self._on_disconnect(client_ip)
+            finally:
+                self._slots.release()
+    
+    def _process_data(self, client_socket: socket.socket, client_ip: str, buffer: str, data: bytes) -> str:
+        """Append received bytes, process every complete line, return the remainder."""
+        buffer += data.decode('utf-8', errors='ignore')
+        
+        # Process complete lines
+        while '\n' in buffer:
+            line, buffer = buffer.split('\n', 1)
+            line = line.strip()
+            if self._on_line:
+                self._on_line(self._local.recv_time, client_ip, line)
+            self._process_command(client_socket, client_ip, line)
+        return buffer
     
     def _process_command(self, client_socket: socket.socket, client_ip: str, command: str):
         """Process a single command from the client."""
@@ -208,12 +445,23 @@ class TCPControlListener:
             return
         
         cmd = parts[0].upper()
+        self.commands.inc()
         
         if cmd == "AUTH" and len(parts) >= 2:
             code = parts[1]
             self._on_auth(client_socket, client_ip, code)
+        
+        elif cmd == "RESUME" and len(parts) >= 2 and self._on_resume:
+            self._on_resume(client_socket, client_ip, parts[1])
+        
+        elif cmd == "PING":
+            # Echo for client-side RTT measurement
+            self.send_to_client("PONG " + " ".join(parts[1:]), client_socket)
+        
+        elif cmd == "PONG" and len(parts) >= 2 and self._on_pong:
+            self._on_pong(client_ip, parts[1])
             
-        elif self._authenticated:
+        elif client_socket in self._authenticated:
             if cmd == "CLICK" and len(parts) >= 3:
                 button = parts[1].upper()
                 state = parts[2].upper()
@@ -225,43 +473,84 @@ class TCPControlListener:
                 key = parts[2].upper()
                 if key in KEY_MAP and state in ("DOWN", "UP"):
                     self._on_key(key, state)
+            
+            elif cmd == "MACRO" and len(parts) >= 2 and self._on_macro:
+                self._on_macro(parts[1])
+            
+            elif cmd == "RATE_ACK" and len(parts) >= 2 and self._on_rate_ack:
+                self._on_rate_ack(client_ip, parts[1])
+        
+        else:
+            self.commands_rejected.inc()
     
-    def set_authenticated(self, authenticated: bool):
-        """Set the authentication state."""
-        self._authenticated = authenticated
+    @property
+    def recv_time(self) -> float:
+        """time.monotonic() when the calling client thread last received data."""
+        return getattr(self._local, "recv_time", 0.0)
     
-    def send_to_client(self, message: str):
-        """Send a message to the connected client."""
-        if self._client_socket:
-            try:
-                self._client_socket.send((message + "\n").encode('utf-8'))
-            except:
-                pass
+    @property
+    def client_ip(self) -> str:
+        """IP of the client served by the calling thread ("" outside client threads)."""
+        return getattr(self._local, "client_ip", "")
+    
+    def _current_socket(self, client_socket: Optional[socket.socket]) -> Optional[socket.socket]:
+        """Resolve the target client: explicit socket, else the calling client thread's."""
+        if client_socket is not None:
+            return client_socket
+        return getattr(self._local, "socket", None)
+    
+    def set_authenticated(self, authenticated: bool, client_socket: Optional[socket.socket] = None):
+        """Set the authentication state of a client (default: the calling client)."""
+        client_socket = self._current_socket(client_socket)
+        if client_socket is None:
+            return
+        with self._clients_lock:
+            if authenticated:
+                self._authenticated.add(client_socket)
+            else:
+                self._authenticated.discard(client_socket)
+    
+    def send_to_client(self, message: str, client_socket: Optional[socket.socket] = None):
+        """Send a message to a client (default: the calling client)."""
+        client_socket = self._current_socket(client_socket)
+        if client_socket:
+            with _write_lock(client_socket):
+                try:
+                    client_socket.sendall((message + "\n").encode('utf-8'))
+                except socket.timeout:
+                    _drop_peer(client_socket)  # Part of the line may have been sent
+                except:
+                    pass
     
     def _accept_loop(self):
         """Main TCP accept loop."""
         while self._running:
+            # Wait for a free client slot before accepting new connections
+            if not self._slots.acquire(timeout=1.0):
+                continue
+            
             try:
                 client_socket, client_addr = self._socket.accept()
                 client_socket.settimeout(1.0)
-                
-                # Handle client in a separate thread
-                self._client_thread = threading.Thread(
-                    target=self._handle_client,
-                    args=(client_socket, client_addr),
-                    daemon=True
-                )
-                self._client_thread.start()
-                
-                # Wait for this client to disconnect before accepting new ones
-                self._client_thread.join()
-                
+                self.connections_accepted += 1
             except socket.timeout:
+                self._slots.release()
                 continue
             except OSError as e:
+                self._slots.release()
                 if self._running:
                     logger.error(f"TCP accept error: {e}")
                 break
+            
+            # Handle client in a separate thread (releases its slot on exit)
+            client_thread = threading.Thread(
+                target=self._handle_client,
+                args=(client_socket, client_addr),
+                daemon=True
+            )
+            with self._clients_lock:
+                self._client_threads[client_socket] = client_thread
+            client_thread.start()
     
     def start(self):
         """Start the TCP listener."""
@@ -271,25 +560,27 @@ class TCPControlListener:
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self._socket.settimeout(1.0)
-        self._socket.bind(('', CONTROL_PORT))
+        self._socket.bind(('', self._port))
         self._socket.listen(1)
         
         self._running = True
         self._thread = threading.Thread(target=self._accept_loop, daemon=True)
         self._thread.start()
         
-        logger.info(f"TCP control listener started on port {CONTROL_PORT}")
+        logger.info(f"TCP control listener started on port {self._port}")
     
     def stop(self):
         """Stop the TCP listener."""
         self._running = False
         
-        if self._client_socket:
+        with self._clients_lock:
+            clients = list(self._client_threads.items())
+        
+        for client_socket, _ in clients:
             try:
-                self._client_socket.close()
+                client_socket.close()
             except:
                 pass
-            self._client_socket = None
         
         if self._socket:
             try:
@@ -298,8 +589,8 @@ class TCPControlListener:
                 pass
             self._socket = None
         
-        if self._client_thread:
-            self._client_thread.join(timeout=2.0)
+        for _, client_thread in clients:
+            client_thread.join(timeout=2.0)
         if self._thread:
             self._thread.join(timeout=2.0)
         
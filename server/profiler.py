@@ -0,0 +1,247 @@
+"""
+Built-in sampling profiler and thread timeline (--profile PREFIX).
+
+Two sources of data, both kept in bounded memory:
+
+- Stack samples: a daemon thread reads every thread's stack with
+  sys._current_frames() every PROFILE_SAMPLE_INTERVAL. Stacks are counted
+  per thread for the flamegraph, and consecutive samples with the same
+  innermost function become one timeline slice.
+- Spans: the server wraps the callbacks it wires together (recv, parse,
+  charge, discharge, inject) with traced(). A span is one deque append on
+  the thread that ran it; the components themselves are not changed.
+
+On stop() it writes:
+
+    PREFIX.trace.json   Chrome trace-event timeline (chrome://tracing,
+                        ui.perfetto.dev): one row per thread, spans and
+                        sampled activity on one time axis
+    PREFIX.folded       collapsed stacks ("thread;outer;...;inner count"),
+                        input for flamegraph.pl / speedscope
+
+Only the most recent PROFILE_MAX_EVENTS timeline events are kept, so a
+long session shows the minutes before shutdown.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import logging
+from collections import Counter, deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from .config import PROFILE_SAMPLE_INTERVAL, PROFILE_MAX_DEPTH, PROFILE_MAX_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# (thread ident, name, category, start, end); end == start for instants
+Event = Tuple[int, str, str, float, float]
+
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class Profiler:
+    """Samples all threads' stacks and collects span events."""
+    
+    def __init__(
+        self,
+        interval: float = PROFILE_SAMPLE_INTERVAL,
+        max_events: int = PROFILE_MAX_EVENTS,
+        max_depth: int = PROFILE_MAX_DEPTH
+    ):
+        self._interval = interval
+        self._max_depth = max_depth
+        self._origin = time.monotonic()  # Timeline zero
+        
+        # Spans and instants are appended by any thread (deque.append is atomic)
+        self._events: Deque[Event] = deque(maxlen=max_events)
+        # Sampler thread only
+        self._slices: Deque[Event] = deque(maxlen=max_events)
+        self._stacks: Counter = Counter()  # (thread name, stack) -> samples
+        self._open: Dict[int, Tuple[str, float, float]] = {}  # ident -> (leaf, first, last)
+        self._names: Dict[int, str] = {}
+        
+        self.samples = 0
+        self.sample_time = 0.0  # Seconds spent sampling (overhead)
+        
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+    
+    # === SPANS ===
+    
+    def span(self, name: str, start: float, end: float, category: str = "span"):
+        """Record a span between two time.monotonic() stamps."""
+        self._events.append((threading.get_ident(), name, category, start, end))
+    
+    def instant(self, name: str, stamp: float, category: str = "span"):
+        """Record a point event at a time.monotonic() stamp."""
+        self._events.append((threading.get_ident(), name, category, stamp, stamp))
+    
+    def traced(
+        self,
+        name: str,
+        func: Callable,
+        since: Optional[Callable[[], float]] = None,
+        since_name: str = "parse"
+    ) -> Callable:
+        """
+        Wrap func so every call is recorded as a span.
+        
+        Args:
+            name: Span name for the call itself
+            func: Callable to wrap
+            since: Optional stamp source; the time from since() to the call
+                   is recorded as a since_name span (e.g. recv -> callback)
+            since_name: Name of that leading span
+        """
+        events = self._events
+        get_ident = threading.get_ident
+        monotonic = time.monotonic
+        
+        def wrapper(*args):
+            start = monotonic()
+            if since:
+                stamp = since()
+                if 0.0 < stamp <= start:
+                    events.append((get_ident(), since_name, "span", stamp, start))
+            try:
+                return func(*args)
+            finally:
+                events.append((get_ident(), name, "span", start, monotonic()))
+        return wrapper
+    
+    # === SAMPLING ===
+    
+    def _sample(self, now: float):
+        """Take one sample of every other thread."""
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack: List[str] = []
+            while frame is not None and len(stack) < self._max_depth:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if not stack:
+                continue
+            leaf = stack[0]
+            stack.reverse()
+            
+            name = self._names.get(ident)
+            if name is None:
+                self._refresh_names()
+                name = self._names.get(ident, str(ident))
+            self._stacks[(name, tuple(stack))] += 1
+            
+            # === TIMELINE SLICES ===
+            # Extend the open slice while the innermost function stays the same
+            current = self._open.get(ident)
+            if current and current[0] == leaf and now - current[2] < 2.5 * self._interval:
+                self._open[ident] = (leaf, current[1], now)
+                continue
+            if current:
+                self._slices.append((ident, current[0], "sample", current[1], current[2] + self._interval))
+            self._open[ident] = (leaf, now, now)
+    
+    def _refresh_names(self):
+        # Names of finished threads are kept: their events are still exported
+        self._names.update((thread.ident, thread.name) for thread in threading.enumerate())
+    
+    def _sample_loop(self):
+        interval = self._interval
+        next_sample = time.monotonic()
+        while self._running:
+            now = time.monotonic()
+            try:
+                self._sample(now)
+            except Exception as e:
+                logger.debug("Profiler sample failed: %s", e)
+            self.samples += 1
+            self.sample_time += time.monotonic() - now
+            
+            next_sample += interval
+            delay = next_sample - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_sample = time.monotonic()  # Fell behind: do not burst
+    
+    def start(self):
+        """Start the sampler thread."""
+        if self._running:
+            return
+        self._refresh_names()
+        self._running = True
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"Profiler sampling all threads every {self._interval * 1000:.0f} ms")
+    
+    def stop(self):
+        """Stop sampling and close open slices."""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        for ident, (leaf, first, last) in self._open.items():
+            self._slices.append((ident, leaf, "sample", first, last + self._interval))
+        self._open.clear()
+    
+    # === EXPORT ===
+    
+    def chrome_trace(self) -> Dict[str, object]:
+        """Trace-event JSON (timestamps in microseconds since start)."""
+        pid = os.getpid()
+        origin = self._origin
+        self._refresh_names()
+        trace: List[Dict[str, object]] = []
+        idents = set()
+        
+        for ident, name, category, start, end in list(self._events) + list(self._slices):
+            idents.add(ident)
+            event = {
+                "name": name,
+                "cat": category,
+                "pid": pid,
+                "tid": ident,
+                "ts": round((start - origin) * 1e6, 1),
+            }
+            if end > start:
+                event["ph"] = "X"
+                event["dur"] = round((end - start) * 1e6, 1)
+            else:
+                event["ph"] = "i"
+                event["s"] = "t"
+            trace.append(event)
+        
+        for ident in idents:
+            trace.append({
+                "name": "thread_name", "ph": "M", "pid": pid, "tid": ident,
+                "args": {"name": self._names.get(ident, str(ident))},
+            })
+        trace.sort(key=lambda event: event.get("ts", -1.0))
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+    
+    def collapsed(self) -> List[str]:
+        """Collapsed-stack lines, heaviest first."""
+        return [
+            f"{';'.join((thread,) + stack)} {count}"
+            for (thread, stack), count in self._stacks.most_common()
+        ]
+    
+    def write(self, prefix: str) -> Tuple[str, str]:
+        """Write PREFIX.trace.json and PREFIX.folded; returns both paths."""
+        trace_path = f"{prefix}.trace.json"
+        folded_path = f"{prefix}.folded"
+        with open(trace_path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+        with open(folded_path, "w") as f:
+            f.write("\n".join(self.collapsed()) + "\n")
+        
+        overhead = self.sample_time / max(time.monotonic() - self._origin, 1e-9)
+        logger.info(f"Profile written: {trace_path}, {folded_path} "
+                    f"({self.samples} samples, {overhead:.1%} of one core spent sampling)")
+        return trace_path, folded_path
@@ -0,0 +1,273 @@
+"""
+Send-rate feedback to clients on the TCP control channel.
+
+The phone sends MOVE packets as fast as its touch events arrive, whether or
+not the server can use them. Once per RATE_EVAL_INTERVAL the controller
+looks at each client's inter-arrival behaviour and at the server side of
+the pipeline (frame overruns, frame lateness, packets waiting in the
+smoother inbox) and, when a different rate would help, suggests one:
+
+    server -> client:  RATE <hz> <window_ms>
+    client -> server:  RATE_ACK <hz>
+
+window_ms is the coalescing window matching <hz>: the client sums its
+deltas for that long and sends one packet. The acknowledged rate is handed
+back to the server (on_ack) so the smoother can expect that packet spacing.
+Clients that never acknowledge simply keep sending as before.
+"""
+
+import threading
+import time
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+import socket
+
+from .config import (
+    RATE_EVAL_INTERVAL, RATE_MIN_HZ, RATE_MAX_HZ,
+    RATE_OVERRUN_HIGH, RATE_OVERRUN_LOW, RATE_INBOX_HIGH_FRAMES, RATE_HYSTERESIS,
+    INPUT_STROKE_GAP
+)
+from .network import send_nowait
+from .scheduler import TimerScheduler
+
+logger = logging.getLogger(__name__)
+
+# (frames, frames overrun, frame lag seconds, packets waiting in the inbox)
+LoadSample = Tuple[int, int, float, int]
+
+
+class _ClientRate:
+    """Rate bookkeeping for one client."""
+    
+    __slots__ = (
+        "client_socket", "last_arrival", "interval_ewma", "jitter_ewma",
+        "packets", "suggested_hz", "acked_hz", "frames", "frames_overrun"
+    )
+    
+    def __init__(self, client_socket: socket.socket):
+        self.client_socket = client_socket
+        self.last_arrival = 0.0
+        self.interval_ewma = 0.0   # Mean inter-arrival time (seconds)
+        self.jitter_ewma = 0.0     # Mean deviation from interval_ewma
+        self.packets = 0           # Since the last evaluation
+        self.suggested_hz: Optional[float] = None
+        self.acked_hz: Optional[float] = None
+        self.frames = -1           # Frame counters at the last evaluation (-1 = none yet)
+        self.frames_overrun = 0
+
+
+class RateController:
+    """
+    Suggests per-client send rates from measured load.
+    
+    A client is asked to slow down (x0.75, not below RATE_MIN_HZ) when the
+    server is falling behind: more than RATE_OVERRUN_HIGH of the frames
+    since the last evaluation overran their interval, frames wake up late
+    by more than a quarter of a frame, or more than RATE_INBOX_HIGH_FRAMES
+    frames' worth of packets wait in the smoother inbox (the frame thread
+    is not draining it). The charge a working smoother holds is not a load
+    signal: it grows with the stroke speed, not with lag. Sending above
+    RATE_MAX_HZ gains nothing either, as the output runs at 60 FPS. When
+    all signals are quiet the rate is raised again (x1.25) up to the
+    maximum. Suggestions within RATE_HYSTERESIS of the last one are not
+    sent.
+    
+    Runs on the shared TimerScheduler (one recurring timer, no thread of
+    its own). note_packet() is called on the UDP listener thread and only
+    touches that client's record.
+    """
+    
+    def __init__(
+        self,
+        scheduler: TimerScheduler,
+        load_probe: Callable[[str], LoadSample],
+        on_ack: Optional[Callable[[str, float], None]] = None,
+        frame_interval: float = 1.0 / 60,
+        interval: float = RATE_EVAL_INTERVAL,
+        min_hz: float = RATE_MIN_HZ,
+        max_hz: float = RATE_MAX_HZ,
+        clock: Optional[Callable[[], float]] = None
+    ):
+        """
+        Args:
+            scheduler: Shared timer heap
+            load_probe: Returns (frames, frames_overrun, frame_lag_seconds,
+                        inbox_depth) of the frame loop serving a client
+            on_ack: Optional callback with each acknowledged rate (client_ip, hz)
+            frame_interval: Output frame interval (seconds)
+            interval: Seconds between evaluations
+            min_hz: Lowest rate ever suggested
+            max_hz: Highest useful rate
+            clock: Packet arrival clock (default time.monotonic; injectable
+                   for simulation)
+        """
+        self._scheduler = scheduler
+        self._load_probe = load_probe
+        self._on_ack = on_ack
+        self._frame_interval = frame_interval
+        self._interval = interval
+        self._min_hz = min_hz
+        self._max_hz = max_hz
+        self._clock = clock or time.monotonic
+        
+        self._clients: Dict[str, _ClientRate] = {}
+        self._lock = threading.Lock()
+        self._timer = None
+        
+        # === STATS ===
+        self.suggestions_sent = 0
+    
+    def start(self):
+        """Start the recurring evaluation timer."""
+        if self._timer is None:
+            self._timer = self._scheduler.call_later(self._interval, self._tick)
+    
+    def stop(self):
+        """Stop evaluating."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+    
+    def add_client(self, client_ip: str, client_socket: socket.socket):
+        """Start tracking an authenticated client."""
+        with self._lock:
+            self._clients[client_ip] = _ClientRate(client_socket)
+    
+    def remove_client(self, client_ip: str):
+        """Stop tracking a client."""
+        with self._lock:
+            self._clients.pop(client_ip, None)
+    
+    def note_packet(self, client_ip: str):
+        """Record the arrival of one input packet (UDP listener thread)."""
+        state = self._clients.get(client_ip)
+        if state is None:
+            return
+        
+        now = self._clock()
+        gap = now - state.last_arrival
+        if gap < INPUT_STROKE_GAP:  # Longer gaps are pauses, not rate
+            if state.interval_ewma == 0.0:
+                state.interval_ewma = gap
+            else:
+                state.jitter_ewma += 0.125 * (abs(gap - state.interval_ewma) - state.jitter_ewma)
+                state.interval_ewma += 0.125 * (gap - state.interval_ewma)
+        state.last_arrival = now
+        state.packets += 1
+    
+    def on_ack(self, client_ip: str, hz: str):
+        """Handle RATE_ACK <hz> from a client."""
+        try:
+            rate = float(hz)
+        except ValueError:
+            return
+        if rate <= 0:
+            return
+        
+        with self._lock:
+            state = self._clients.get(client_ip)
+            if state is None:
+                return
+            state.acked_hz = rate
+        
+        logger.info(f"Client {client_ip} acknowledged send rate {rate:g} Hz")
+        if self._on_ack:
+            self._on_ack(client_ip, rate)
+    
+    def stats(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Per-client rate snapshot."""
+        with self._lock:
+            return {
+                ip: {
+                    "measured_hz": round(1.0 / s.interval_ewma, 1) if s.interval_ewma else None,
+                    "jitter_ms": round(s.jitter_ewma * 1000.0, 2),
+                    "suggested_hz": s.suggested_hz,
+                    "acked_hz": s.acked_hz,
+                }
+                for ip, s in self._clients.items()
+            }
+    
+    def _target_rate(
+        self,
+        state: _ClientRate,
+        overrun_share: float,
+        frame_lag: float,
+        inbox_frames: float
+    ) -> Optional[float]:
+        """Rate to suggest for one client, or None to leave it alone."""
+        measured = 1.0 / state.interval_ewma
+        current = state.acked_hz or state.suggested_hz or measured
+        
+        overloaded = (
+            overrun_share > RATE_OVERRUN_HIGH
+            or frame_lag > self._frame_interval / 4
+            or inbox_frames > RATE_INBOX_HIGH_FRAMES
+        )
+        quiet = (
+            overrun_share < RATE_OVERRUN_LOW
+            and frame_lag < self._frame_interval / 8
+            and inbox_frames <= 1.0
+        )
+        
+        if overloaded:
+            target = current * 0.75
+        elif measured > self._max_hz * (1 + RATE_HYSTERESIS):
+            target = self._max_hz
+        elif state.suggested_hz is not None and quiet:
+            target = current * 1.25
+        else:
+            return None
+        
+        target = float(round(max(self._min_hz, min(target, self._max_hz))))
+        last = state.suggested_hz
+        if last is not None and abs(target - last) <= last * RATE_HYSTERESIS:
+            return None
+        return target
+    
+    def evaluate(self):
+        """Evaluate every active client once (normally from the timer)."""
+        with self._lock:
+            clients = list(self._clients.items())
+        
+        for client_ip, state in clients:
+            active = state.packets >= 2 and state.interval_ewma > 0
+            state.packets = 0
+            
+            try:
+                frames, frames_overrun, frame_lag, inbox_depth = self._load_probe(client_ip)
+            except Exception as e:
+                logger.error(f"Rate probe error: {e}")
+                continue
+            
+            # Overruns since the last evaluation (counters are cumulative)
+            new_frames = frames - state.frames if state.frames >= 0 else 0
+            overrun_share = (frames_overrun - state.frames_overrun) / new_frames if new_frames > 0 else 0.0
+            state.frames = frames
+            state.frames_overrun = frames_overrun
+            if not active:
+                continue  # Idle clients have nothing to slow down
+            
+            # Waiting packets, in frames of this client's packet spacing
+            inbox_frames = inbox_depth * state.interval_ewma / self._frame_interval
+            target = self._target_rate(state, overrun_share, frame_lag, inbox_frames)
+            if target is None:
+                continue
+            
+            # Shared timer thread: never wait for a slow peer
+            message = f"RATE {target:g} {1000.0 / target:.0f}\n".encode('utf-8')
+            if not send_nowait(state.client_socket, message):
+                continue  # Not sent: suggest it again at the next evaluation
+            
+            state.suggested_hz = target
+            self.suggestions_sent += 1
+            logger.debug(
+                "Rate for %s: %g Hz (overruns=%.0f%% lag=%.1fms inbox=%d)",
+                client_ip, target, overrun_share * 100.0, frame_lag * 1000.0, inbox_depth
+            )
+    
+    def _tick(self):
+        """Timer callback: evaluate, then re-arm."""
+        self.evaluate()
+        if self._timer is not None:
+            self._timer = self._scheduler.call_later(self._interval, self._tick)
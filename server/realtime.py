@@ -0,0 +1,148 @@
+"""
+Real-time mode for the frame and injection threads (--realtime).
+
+Under desktop load (a compile, a game) the 60 Hz frame threads are ordinary
+SCHED_OTHER threads and miss frames, which shows up as cursor stutter. This
+module applies, as far as the environment permits:
+
+- SCHED_FIFO for each frame/injection thread (falls back to a raised nice
+  value when real-time scheduling is not allowed)
+- CPU affinity for those threads (one CPU of the process's set)
+- mlockall() so the server's memory is never paged out
+- gc.freeze() after startup, so long-lived objects leave the GC scans
+
+Nothing here is fatal: every step records what was applied or why not,
+and report() summarizes it for the log.
+"""
+
+import os
+import gc
+import ctypes
+import ctypes.util
+import resource
+import threading
+import logging
+from typing import Dict, List, Optional
+
+from .config import REALTIME_PRIORITY, REALTIME_NICE
+
+logger = logging.getLogger(__name__)
+
+# mlockall() flags (<sys/mman.h>)
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+
+class RealtimeTuner:
+    """
+    Applies real-time settings to the process and to registered threads.
+    
+    setup_thread() is passed as the thread_setup hook to the smoothers,
+    the mixer and the injection writers, and runs on each of those threads
+    as it starts (scheduling policy and affinity are per thread on Linux).
+    """
+    
+    def __init__(
+        self,
+        priority: int = REALTIME_PRIORITY,
+        nice: int = REALTIME_NICE,
+        cpu: Optional[int] = None,
+        lock_memory: bool = True
+    ):
+        """
+        Args:
+            priority: SCHED_FIFO priority (1-99; low values still beat SCHED_OTHER)
+            nice: Nice value used when SCHED_FIFO is not permitted
+            cpu: CPU for the frame threads (None = first CPU of the process,
+                 only when more than one is available)
+            lock_memory: Call mlockall()
+        """
+        self._priority = priority
+        self._nice = nice
+        self._cpu = cpu
+        self._lock_memory = lock_memory
+        
+        self._lock = threading.Lock()
+        self._applied: Dict[str, str] = {}
+        self._threads: Dict[str, str] = {}  # role -> what was applied
+    
+    def _record(self, key: str, result: str):
+        with self._lock:
+            self._applied[key] = result
+    
+    def apply_process(self):
+        """Process-wide settings; call once at startup, before threads start."""
+        if self._lock_memory:
+            self._record("mlockall", self._mlockall())
+        
+        if self._cpu is None:
+            try:
+                cpus = sorted(os.sched_getaffinity(0))
+                if len(cpus) > 1:
+                    self._cpu = cpus[0]
+            except (AttributeError, OSError):
+                pass
+    
+    def _mlockall(self) -> str:
+        """Lock current (and, if the limit allows, future) pages in RAM."""
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            return "unavailable (no libc)"
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        
+        # MCL_FUTURE with a finite RLIMIT_MEMLOCK would make later
+        # allocations fail once the limit is reached
+        soft, _ = resource.getrlimit(resource.RLIMIT_MEMLOCK)
+        flags = MCL_CURRENT
+        if soft == resource.RLIM_INFINITY:
+            flags |= MCL_FUTURE
+        
+        if libc.mlockall(flags) != 0:
+            errno = ctypes.get_errno()
+            return f"failed ({os.strerror(errno)})"
+        return "current+future" if flags & MCL_FUTURE else "current"
+    
+    def setup_thread(self, role: str):
+        """Apply scheduling and affinity to the calling thread."""
+        results: List[str] = []
+        
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self._priority))
+            results.append(f"SCHED_FIFO {self._priority}")
+        except (AttributeError, OSError) as e:
+            try:
+                os.setpriority(os.PRIO_PROCESS, 0, self._nice)  # Linux: this thread only
+                results.append(f"nice {self._nice} (SCHED_FIFO: {_reason(e)})")
+            except (AttributeError, OSError) as e2:
+                results.append(f"SCHED_OTHER (FIFO: {_reason(e)}; nice: {_reason(e2)})")
+        
+        if self._cpu is not None:
+            try:
+                os.sched_setaffinity(0, {self._cpu})
+                results.append(f"CPU {self._cpu}")
+            except (AttributeError, OSError) as e:
+                results.append(f"affinity failed ({_reason(e)})")
+        
+        with self._lock:
+            self._threads[role] = ", ".join(results)
+    
+    def freeze_gc(self):
+        """Move everything allocated so far out of GC scans (after startup)."""
+        gc.collect()
+        gc.freeze()
+        self._record("gc_freeze", f"{gc.get_freeze_count()} objects")
+    
+    def report(self) -> Dict[str, str]:
+        """What was actually applied, per process setting and per thread."""
+        with self._lock:
+            summary = dict(self._applied)
+            for role, result in self._threads.items():
+                summary[f"thread {role}"] = result
+            return summary
+
+
+def _reason(error: Exception) -> str:
+    """Short reason for a failed setting."""
+    if isinstance(error, OSError) and error.errno is not None:
+        return os.strerror(error.errno)
+    return "not supported"
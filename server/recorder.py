@@ -0,0 +1,356 @@
+"""
+Session recording and replay (--record PATH).
+
+Every received UDP datagram and TCP control line is appended to a ring
+file of fixed 64-byte records with its time.monotonic() receive stamp.
+The file is created at full size and written through mmap, so disk use
+stays flat however long the session runs: once it is full, the oldest
+records are overwritten.
+
+File layout (little-endian):
+
+    header (64 bytes): magic "HKBMREC1", version u32, record size u32,
+                       capacity u64, records written u64, created (wall) f64
+    records:           stamp f64, kind u8, length u8, flags u16,
+                       source IPv4 u32, payload (48 bytes)
+
+Pairing codes and session tokens are never stored: AUTH and RESUME lines
+are recorded as the bare command word (FLAG_REDACTED).
+
+Replay (reads the file by mmap):
+
+    python3 -m server.recorder info session.rec
+    python3 -m server.recorder replay session.rec --code 123456 [--speed 0]
+    python3 -m server.recorder simulate session.rec
+    python3 -m server.recorder export session.rec trace.json
+
+"replay" drives a running server through its real sockets (authenticating
+with a fresh pairing code), at the original pace or faster; "simulate"
+feeds the movement through the deterministic simulator; "export" writes a
+JSON trace for the simulator and the tuner.
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import socket
+import struct
+import argparse
+import threading
+import logging
+from typing import Iterator, List, Optional, Tuple
+
+from .config import INPUT_PORT, CONTROL_PORT, RECORD_CAPACITY
+from .network import parse_input_packet
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"HKBMREC1"
+VERSION = 1
+_HEADER = struct.Struct("<8sIIQQd")
+_HEADER_SIZE = 64
+_HEAD_OFFSET = 24  # records written (u64) inside the header
+
+_RECORD_HEADER = struct.Struct("<dBBHI")
+RECORD_SIZE = 64
+PAYLOAD_SIZE = RECORD_SIZE - _RECORD_HEADER.size
+
+# Record kinds
+KIND_UDP = 1  # Input datagram
+KIND_TCP = 2  # Control line (without the newline)
+
+# Record flags
+FLAG_TRUNCATED = 1  # Payload longer than PAYLOAD_SIZE
+FLAG_REDACTED = 2   # Secret argument removed (AUTH / RESUME)
+
+_REDACTED_COMMANDS = ("AUTH", "RESUME")
+
+Record = Tuple[float, int, str, bytes, int]  # (stamp, kind, source IP, payload, flags)
+
+
+def _ip_to_int(ip: str) -> int:
+    try:
+        return int.from_bytes(socket.inet_aton(ip), "big")
+    except OSError:
+        return 0
+
+
+class SessionRecorder:
+    """
+    Appends datagrams and control lines to a ring file.
+    
+    record_datagram() and record_line() are passed to the listeners as
+    their on_datagram / on_line hooks. Several TCP client threads and the
+    UDP thread record concurrently, so appends are serialized by a lock
+    (only taken when recording is enabled).
+    """
+    
+    def __init__(self, path: str, capacity: int = RECORD_CAPACITY):
+        """
+        Args:
+            path: Ring file (created, or reset if it exists)
+            capacity: Number of records kept
+        """
+        self.path = path
+        self.capacity = capacity
+        size = _HEADER_SIZE + capacity * RECORD_SIZE
+        
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        _HEADER.pack_into(self._map, 0, MAGIC, VERSION, RECORD_SIZE, capacity, 0, time.time())
+        
+        self._head = 0
+        self._lock = threading.Lock()
+        self._sources = {}  # Dotted IP -> packed u32
+    
+    @property
+    def records_written(self) -> int:
+        return self._head
+    
+    def _append(self, stamp: float, kind: int, source_ip: str, payload, length: int, flags: int = 0):
+        """Write one record and publish it in the header."""
+        if length > PAYLOAD_SIZE:
+            length = PAYLOAD_SIZE
+            flags |= FLAG_TRUNCATED
+        
+        source = self._sources.get(source_ip)
+        if source is None:
+            source = _ip_to_int(source_ip)
+            self._sources[source_ip] = source
+        
+        with self._lock:
+            if self._map is None:
+                return
+            offset = _HEADER_SIZE + (self._head % self.capacity) * RECORD_SIZE
+            _RECORD_HEADER.pack_into(self._map, offset, stamp, kind, length, flags, source)
+            start = offset + _RECORD_HEADER.size
+            self._map[start:start + length] = payload[:length]
+            self._head += 1
+            struct.pack_into("<Q", self._map, _HEAD_OFFSET, self._head)  # Publish after the record
+    
+    def record_datagram(self, stamp: float, source_ip: str, buf, nbytes: int):
+        """on_datagram hook: one received UDP datagram (buf[:nbytes])."""
+        self._append(stamp, KIND_UDP, source_ip, buf, nbytes)
+    
+    def record_line(self, stamp: float, source_ip: str, line: str):
+        """on_line hook: one TCP control line; secrets are not stored."""
+        word = line.split(" ", 1)[0]
+        if word.upper() in _REDACTED_COMMANDS:
+            data = word.encode("utf-8", errors="ignore")
+            self._append(stamp, KIND_TCP, source_ip, data, len(data), FLAG_REDACTED)
+            return
+        data = line.encode("utf-8", errors="ignore")
+        self._append(stamp, KIND_TCP, source_ip, data, len(data))
+    
+    def close(self):
+        """Flush and close the file."""
+        with self._lock:
+            if self._map is None:
+                return
+            self._map.flush()
+            self._map.close()
+            self._map = None
+        os.close(self._fd)
+        logger.info(f"Session recording: {self._head} records in {self.path}")
+
+
+class SessionReader:
+    """Read-only mmap view of a recording, oldest record first."""
+    
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, capacity, head, created = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+            self.close()
+            raise ValueError(f"{path} is not a session recording")
+        
+        self.capacity = capacity
+        self.written = head
+        self.created = created
+    
+    def __len__(self) -> int:
+        return min(self.written, self.capacity)
+    
+    def __iter__(self) -> Iterator[Record]:
+        first = max(0, self.written - self.capacity)
+        for index in range(first, self.written):
+            offset = _HEADER_SIZE + (index % self.capacity) * RECORD_SIZE
+            stamp, kind, length, flags, source = _RECORD_HEADER.unpack_from(self._map, offset)
+            start = offset + _RECORD_HEADER.size
+            payload = bytes(self._map[start:start + length])
+            yield stamp, kind, socket.inet_ntoa(source.to_bytes(4, "big")), payload, flags
+    
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def to_trace(reader: SessionReader, source: Optional[str] = None) -> List[Tuple[float, str, int, int]]:
+    """MOVE/SCROLL datagrams as a simulator trace (seconds from the first one)."""
+    trace = []
+    first = None
+    for stamp, kind, source_ip, payload, _ in reader:
+        if kind != KIND_UDP or (source and source_ip != source):
+            continue
+        parsed = parse_input_packet(payload)
+        if parsed is None or parsed[0] not in ("MOVE", "SCROLL"):
+            continue
+        if first is None:
+            first = stamp
+        trace.append((stamp - first, parsed[0], parsed[1], parsed[2]))
+    trace.sort(key=lambda event: event[0])
+    return trace
+
+
+def replay(
+    reader: SessionReader,
+    host: str,
+    code: str,
+    speed: float = 1.0,
+    source: Optional[str] = None,
+    input_port: int = INPUT_PORT,
+    control_port: int = CONTROL_PORT
+) -> Tuple[int, int]:
+    """
+    Stream a recording through a running server's sockets.
+    
+    Authenticates with code (recorded AUTH/RESUME lines are skipped),
+    answers the server's PINGs, and sends every datagram and control line
+    at its recorded offset divided by speed (0 = as fast as possible).
+    
+    Returns:
+        (datagrams sent, control lines sent)
+    """
+    control = socket.create_connection((host, control_port), timeout=5.0)
+    control.sendall(f"AUTH {code}\n".encode())
+    reply = control.recv(256).decode(errors="ignore")
+    if not reply.startswith("AUTH_OK"):
+        control.close()
+        raise RuntimeError(f"Server refused AUTH: {reply.strip()}")
+    
+    running = True
+    
+    def answer_pings():
+        buffer = ""
+        control.settimeout(0.5)
+        while running:
+            try:
+                data = control.recv(1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            if not data:
+                return
+            buffer += data.decode(errors="ignore")
+            while "\n" in buffer:
+                line, buffer = buffer.split("\n", 1)
+                if line.startswith("PING "):
+                    try:
+                        control.sendall(("PONG " + line[5:] + "\n").encode())
+                    except OSError:
+                        return
+    
+    responder = threading.Thread(target=answer_pings, daemon=True)
+    responder.start()
+    
+    udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    datagrams = lines = 0
+    first = None
+    started = time.monotonic()
+    
+    try:
+        for stamp, kind, source_ip, payload, flags in reader:
+            if source and source_ip != source:
+                continue
+            if first is None:
+                first = stamp
+            if speed > 0:
+                delay = started + (stamp - first) / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            
+            if kind == KIND_UDP:
+                udp.sendto(payload, (host, input_port))
+                datagrams += 1
+            elif kind == KIND_TCP:
+                word = payload.split(b" ", 1)[0].upper()
+                if flags & FLAG_REDACTED or word == b"PONG":
+                    continue  # Session setup and stale heartbeats
+                control.sendall(payload + b"\n")
+                lines += 1
+    finally:
+        running = False
+        udp.close()
+        control.close()
+        responder.join(timeout=1.0)
+    return datagrams, lines
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Inspect and replay session recordings")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    info = commands.add_parser("info", help="Summarize a recording")
+    info.add_argument("path")
+    
+    replay_cmd = commands.add_parser("replay", help="Stream a recording into a running server")
+    replay_cmd.add_argument("path")
+    replay_cmd.add_argument("--code", required=True, help="Current pairing code of the server")
+    replay_cmd.add_argument("--host", default="127.0.0.1")
+    replay_cmd.add_argument("--speed", type=float, default=1.0,
+                            help="Playback speed factor (1 = original pace, 0 = as fast as possible)")
+    replay_cmd.add_argument("--source", help="Only replay traffic recorded from this client IP")
+    
+    simulate_cmd = commands.add_parser("simulate", help="Feed recorded movement through the simulator")
+    simulate_cmd.add_argument("path")
+    simulate_cmd.add_argument("--source", help="Only use traffic recorded from this client IP")
+    simulate_cmd.add_argument("--passthrough", action="store_true", help="Adaptive passthrough")
+    
+    export = commands.add_parser("export", help="Write recorded movement as a JSON trace")
+    export.add_argument("path")
+    export.add_argument("out")
+    export.add_argument("--source", help="Only use traffic recorded from this client IP")
+    
+    args = parser.parse_args()
+    reader = SessionReader(args.path)
+    
+    try:
+        if args.command == "info":
+            records = list(reader)
+            udp = sum(1 for record in records if record[1] == KIND_UDP)
+            sources = sorted({record[2] for record in records})
+            span = records[-1][0] - records[0][0] if records else 0.0
+            print(f"{args.path}: {len(records)} records ({udp} UDP, {len(records) - udp} TCP) "
+                  f"over {span:.1f}s, {reader.written} written, capacity {reader.capacity}")
+            print(f"recorded {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(reader.created))}, "
+                  f"sources: {', '.join(sources) or '-'}")
+        
+        elif args.command == "replay":
+            datagrams, lines = replay(reader, args.host, args.code, args.speed, args.source)
+            print(f"Replayed {datagrams} datagrams and {lines} control lines")
+        
+        elif args.command == "simulate":
+            from .simulator import print_metrics, simulate
+            trace = to_trace(reader, args.source)
+            if not trace:
+                print("No MOVE/SCROLL datagrams in the recording")
+                sys.exit(1)
+            print_metrics(os.path.basename(args.path), simulate(trace, passthrough=args.passthrough)["metrics"])
+        
+        elif args.command == "export":
+            trace = to_trace(reader, args.source)
+            with open(args.out, "w") as f:
+                json.dump({"events": [[round(t, 6), command, a, b] for t, command, a, b in trace]}, f)
+            print(f"Wrote {len(trace)} events to {args.out}")
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Held-key tracking and server-side key autorepeat.
+
+The client only sends key edges (KEY DOWN / KEY UP). The server tracks
+which keys are held so that a disconnect releases every one of them
+instead of leaving it stuck.
+
+With --key-repeat, repeat timing is also generated on the host from the
+shared timer heap, so a stalled TCP stream can neither stretch nor
+stutter the repeat. Each repeat reaches the keyboard as state REPEAT,
+which VirtualKeyboard writes as a release and a fresh press. libinput
+drops EV_KEY value 2, so a plain repeat event would never reach an
+application. Modifiers (KEY_NO_REPEAT) are held for chords and never
+re-pressed. Without --key-repeat the compositor repeats a held key from
+its own settings.
+"""
+
+import threading
+import time
+import logging
+from typing import Callable, Dict, Optional
+
+from .config import KEY_REPEAT_DELAY_MS, KEY_REPEAT_RATE_HZ, KEY_NO_REPEAT
+from .scheduler import TimerScheduler, TimerHandle
+
+logger = logging.getLogger(__name__)
+
+
+class KeyRepeater:
+    """
+    Tracks held keys and emits autorepeat events on a TimerScheduler.
+    
+    Each held key has at most one pending timer. Repeat deadlines are
+    computed from the previous deadline rather than from "now", so the
+    rate does not drift with scheduler latency.
+    
+    Example:
+        repeater = KeyRepeater(inject_key=keyboard.key_event, scheduler=timers)
+        repeater.key_event("KEY_A", "DOWN")   # DOWN now, REPEAT after delay
+        repeater.key_event("KEY_A", "UP")     # Cancels repeat, UP now
+        repeater.release_all("192.168.43.2")  # On that client's disconnect
+    """
+    
+    def __init__(
+        self,
+        inject_key: Callable[[str, str], None],
+        scheduler: TimerScheduler,
+        delay_ms: int = KEY_REPEAT_DELAY_MS,
+        rate_hz: float = KEY_REPEAT_RATE_HZ,
+        emit_repeats: bool = True
+    ):
+        """
+        Args:
+            inject_key: Callback to inject (key, state) with state DOWN/UP/REPEAT
+            scheduler: Shared timer heap that drives repeats
+            delay_ms: Hold time before the first repeat
+            rate_hz: Repeats per second after the delay
+            emit_repeats: Inject REPEAT for held keys from the timer heap;
+                          if False, only track held keys (for release_all)
+        """
+        self._inject_key = inject_key
+        self._scheduler = scheduler
+        self._delay = delay_ms / 1000.0
+        self._period = 1.0 / rate_hz
+        self._emit_repeats = emit_repeats
+        
+        # key -> pending repeat timer (None when repeats are disabled)
+        self._held: Dict[str, Optional[TimerHandle]] = {}
+        self._owners: Dict[str, str] = {}  # key -> client that pressed it
+        self._lock = threading.Lock()  # Orders repeats against UP edges
+    
+    def key_event(self, key: str, state: str, owner: str = ""):
+        """Handle a key edge from a client (owner: the client, for release_all)."""
+        with self._lock:
+            if state == "DOWN":
+                if key in self._held:
+                    return  # Already held: ignore client-side repeat
+                # Like a hardware keyboard, only the newest key repeats
+                for other, handle in self._held.items():
+                    if handle:
+                        handle.cancel()
+                        self._held[other] = None
+                self._inject_key(key, "DOWN")
+                self._held[key] = self._schedule(key, self._delay)
+                self._owners[key] = owner
+            else:
+                handle = self._held.pop(key, None)
+                self._owners.pop(key, None)
+                if handle:
+                    handle.cancel()
+                self._inject_key(key, "UP")
+    
+    def release_all(self, owner: Optional[str] = None):
+        """
+        Release held keys (e.g. on client disconnect).
+        
+        Args:
+            owner: Only release the keys this client pressed (None = all)
+        """
+        with self._lock:
+            keys = [key for key in self._held if owner is None or self._owners.get(key) == owner]
+            for key in keys:
+                handle = self._held.pop(key)
+                self._owners.pop(key, None)
+                if handle:
+                    handle.cancel()
+                try:
+                    self._inject_key(key, "UP")
+                except Exception as e:
+                    logger.error(f"Key release error: {e}")
+    
+    @property
+    def held_keys(self) -> int:
+        """Number of keys currently held down."""
+        return len(self._held)
+    
+    def _schedule(self, key: str, delay: float) -> Optional[TimerHandle]:
+        """Schedule the next repeat for key, if repeats are enabled."""
+        if not self._emit_repeats or key.upper() in KEY_NO_REPEAT:
+            return None
+        return self._scheduler.call_later(delay, self._repeat, key)
+    
+    def _repeat(self, key: str):
+        """Timer callback: emit one repeat and schedule the next."""
+        with self._lock:
+            handle = self._held.get(key)
+            # A fresh DOWN after a quick UP owns a future deadline: not ours to fire
+            if handle is None or handle.cancelled or handle.when > time.monotonic():
+                return
+            self._inject_key(key, "REPEAT")
+            self._held[key] = self._scheduler.call_at(handle.when + self._period, self._repeat, key)
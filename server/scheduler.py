@@ -0,0 +1,111 @@
+"""
+Single-thread timer heap for deferred server-side work.
+
+Used for key autorepeat and delayed macro steps so that no feature needs
+a thread per timer: every deadline lives in one heap, serviced by one
+thread that sleeps until the earliest one is due.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import logging
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TimerHandle:
+    """Handle for a scheduled callback; cancel() prevents it from running."""
+    
+    __slots__ = ("when", "callback", "args", "cancelled")
+    
+    def __init__(self, when: float, callback: Callable, args: tuple):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+    
+    def cancel(self):
+        """Cancel the callback (lazy removal: the heap entry is skipped)."""
+        self.cancelled = True
+
+
+class TimerScheduler:
+    """
+    Timer heap serviced by a single daemon thread.
+    
+    Deadlines use time.monotonic(). Callbacks run on the scheduler thread,
+    outside the heap lock, in deadline order. Exceptions are logged and
+    never kill the thread.
+    """
+    
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()  # Tie-breaker for equal deadlines
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        """Start the scheduler thread."""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop the scheduler thread; pending callbacks are discarded."""
+        with self._cond:
+            self._running = False
+            self._heap.clear()
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=0.5)
+            self._thread = None
+    
+    def call_at(self, when: float, callback: Callable, *args) -> TimerHandle:
+        """Run callback(*args) at the given time.monotonic() deadline."""
+        handle = TimerHandle(when, callback, args)
+        with self._cond:
+            heapq.heappush(self._heap, (when, next(self._counter), handle))
+            # Only wake the thread if this is the new earliest deadline
+            if self._heap[0][2] is handle:
+                self._cond.notify()
+        return handle
+    
+    def call_later(self, delay: float, callback: Callable, *args) -> TimerHandle:
+        """Run callback(*args) after delay seconds."""
+        return self.call_at(time.monotonic() + delay, callback, *args)
+    
+    def _run(self):
+        """Sleep until the earliest deadline, then run everything that is due."""
+        while True:
+            due: List[TimerHandle] = []
+            
+            with self._cond:
+                while self._running:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    timeout = self._heap[0][0] - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+                
+                if not self._running:
+                    return
+                
+                now = time.monotonic()
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap)[2])
+            
+            for handle in due:
+                if handle.cancelled:
+                    continue
+                try:
+                    handle.callback(*handle.args)
+                except Exception as e:
+                    logger.error(f"Timer callback error: {e}")
@@ -0,0 +1,470 @@
+"""
+Deterministic trace replay for the smoothers (virtual clock).
+
+The smoothers normally run off the wall clock from their own frame
+threads. Here they get a VirtualClock and step() is called directly, once
+per simulated frame, so a packet trace replays faster than real time and
+produces the same output every run.
+
+Traces are lists of (seconds, "MOVE"/"SCROLL", a, b) events: generated
+with jitter, loss and bursts (synthetic_trace), or loaded from a JSON file.
+Each replay reports:
+
+- conservation: output total vs. input total (pixels)
+- overshoot: how far the output ran past the input along its direction
+- lag: recv-to-inject latency and mean distance behind the input
+- smoothness: mean frame-to-frame speed change and stalled frames
+
+Golden trajectories of the built-in scenarios live in server/golden/;
+--check fails if any per-frame output changed.
+
+--rate-check replays movement through a RateController as well: a steady
+125 Hz stroke must keep its rate, and the same stroke with a stalling
+frame loop must be asked to slow down.
+
+Usage:
+    python3 -m server.simulator                    # metrics for all scenarios
+    python3 -m server.simulator --scenario jitter --frames
+    python3 -m server.simulator --trace trace.json
+    python3 -m server.simulator --check            # compare with golden files
+    python3 -m server.simulator --update-golden    # after an intended change
+    python3 -m server.simulator --rate-check       # send-rate feedback
+"""
+
+import os
+import sys
+import json
+import math
+import random
+import socket
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+from .ratecontrol import RateController
+from .scheduler import TimerScheduler
+from .smoother import InputSmoother, ScrollSmoother
+from .config import INPUT_SMOOTHER_PARAMS, SCROLL_SMOOTHER_PARAMS, WHEEL_HI_RES_UNITS, RATE_EVAL_INTERVAL
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+TraceEvent = Tuple[float, str, int, int]  # (seconds from start, command, a, b)
+
+
+class VirtualClock:
+    """Time source that only moves when the simulation moves it."""
+    
+    def __init__(self, start: float = 1000.0):
+        # Not 0: the smoothers treat a last-input time of 0 as "never"
+        self.now = start
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+def synthetic_trace(
+    kind: str = "MOVE",
+    rate: float = 125.0,
+    duration: float = 0.5,
+    delta: Tuple[int, int] = (4, 2),
+    jitter_ms: float = 0.0,
+    loss: float = 0.0,
+    burst_every: float = 0.0,
+    burst_hold_ms: float = 0.0,
+    seed: int = 1
+) -> List[TraceEvent]:
+    """
+    A stroke of constant-delta packets with network impairments.
+    
+    Args:
+        kind: "MOVE" or "SCROLL"
+        rate: Send rate of the client (packets per second)
+        duration: Length of the stroke (seconds)
+        delta: (a, b) values of every packet
+        jitter_ms: Standard deviation of the arrival delay (Gaussian, >= 0)
+        loss: Probability that a packet is lost
+        burst_every: Every this many seconds, packets are held back ...
+        burst_hold_ms: ... for this long and then arrive all at once
+        seed: Random seed (same seed = same trace)
+    """
+    rng = random.Random(seed)
+    events: List[TraceEvent] = []
+    count = int(duration * rate)
+    
+    for index in range(count):
+        sent = index / rate
+        if loss and rng.random() < loss:
+            continue
+        arrival = sent + abs(rng.gauss(0.0, jitter_ms / 1000.0)) if jitter_ms else sent
+        
+        if burst_every and burst_hold_ms:
+            window_start = math.floor(sent / burst_every) * burst_every
+            hold_end = window_start + burst_hold_ms / 1000.0
+            if sent < hold_end:
+                arrival = max(arrival, hold_end)
+        events.append((arrival, kind, delta[0], delta[1]))
+    
+    events.sort(key=lambda event: event[0])  # Jitter may reorder arrivals
+    return events
+
+
+# name -> (synthetic_trace kwargs, adaptive passthrough)
+SCENARIOS: Dict[str, Tuple[Dict[str, object], bool]] = {
+    "steady": ({}, False),
+    "jitter": ({"jitter_ms": 6.0}, False),
+    "loss": ({"loss": 0.1}, False),
+    "burst": ({"burst_every": 0.1, "burst_hold_ms": 40.0}, False),
+    "flick": ({"duration": 0.08, "delta": (20, -6)}, False),
+    "slow": ({"rate": 60.0, "duration": 1.0, "delta": (1, 0)}, False),
+    "passthrough": ({"rate": 125.0, "duration": 0.5}, True),
+    "scroll": ({"kind": "SCROLL", "rate": 30.0, "duration": 0.3, "delta": (1, 0)}, False),
+}
+
+
+def simulate(
+    trace: List[TraceEvent],
+    passthrough: bool = False,
+    tail: float = 0.5,
+    input_params: Optional[Dict[str, object]] = None,
+    scroll_params: Optional[Dict[str, object]] = None
+) -> Dict[str, object]:
+    """
+    Replay a trace through a fresh InputSmoother/ScrollSmoother pair.
+    
+    Args:
+        trace: Events sorted by arrival time
+        passthrough: Enable adaptive passthrough on the movement smoother
+        tail: Seconds simulated after the last event (continuation, drain)
+        input_params: InputSmoother parameters (default: server values)
+        scroll_params: ScrollSmoother parameters (default: server values)
+    
+    Returns:
+        {"frames": [[dx, dy, vertical, horizontal], ...], "metrics": {...}}
+    """
+    input_params = dict(INPUT_SMOOTHER_PARAMS if input_params is None else input_params)
+    scroll_params = dict(SCROLL_SMOOTHER_PARAMS if scroll_params is None else scroll_params)
+    clock = VirtualClock()
+    injected = [0, 0, 0, 0]  # Written by add_movement in passthrough
+    
+    def inject_move(dx: int, dy: int):
+        injected[0] += dx
+        injected[1] += dy
+    
+    def inject_scroll(vertical: int, horizontal: int):
+        injected[2] += vertical
+        injected[3] += horizontal
+    
+    input_smoother = InputSmoother(
+        inject_move=inject_move, adaptive_passthrough=passthrough, clock=clock, **input_params
+    )
+    scroll_smoother = ScrollSmoother(inject_scroll=inject_scroll, clock=clock, **scroll_params)
+    
+    interval = 1.0 / input_params.get("target_fps", 60)
+    start = clock.now
+    end = (trace[-1][0] if trace else 0.0) + tail
+    frames: List[List[int]] = []
+    next_event = 0
+    frame = 1
+    
+    while frame * interval <= end:
+        frame_time = start + frame * interval
+        while next_event < len(trace) and start + trace[next_event][0] <= frame_time:
+            arrival, command, a, b = trace[next_event]
+            clock.now = start + arrival
+            if command == "MOVE":
+                input_smoother.add_movement(a, b)
+            elif command == "SCROLL":
+                scroll_smoother.add_scroll(a, b)
+            next_event += 1
+        
+        clock.now = frame_time
+        dx, dy = input_smoother.step(frame_time)
+        vertical, horizontal = scroll_smoother.step(frame_time)
+        frames.append([dx + injected[0], dy + injected[1], vertical + injected[2], horizontal + injected[3]])
+        injected[:] = [0, 0, 0, 0]
+        input_smoother.note_injected()
+        frame += 1
+    
+    scroll_scale = scroll_params.get("sensitivity", 2.5)
+    if scroll_params.get("hires"):
+        scroll_scale *= WHEEL_HI_RES_UNITS
+    metrics = trajectory_metrics(trace, frames, interval, scroll_scale)
+    metrics["latency"] = input_smoother.latency.summary()
+    return {"frames": frames, "metrics": metrics}
+
+
+def trajectory_metrics(
+    trace: List[TraceEvent],
+    frames: List[List[int]],
+    interval: float,
+    scroll_scale: float = 1.0
+) -> Dict[str, object]:
+    """
+    Conservation, overshoot, lag and smoothness of one replay.
+    
+    Measured on the movement channel, or on the scroll channel (input
+    scaled to output units) when the trace has no MOVE events.
+    """
+    moves = [event for event in trace if event[1] == "MOVE"]
+    if moves:
+        events = [(t, a, b) for t, _, a, b in moves]
+        outputs = [(frame[0], frame[1]) for frame in frames]
+    else:
+        events = [(t, a * scroll_scale, b * scroll_scale) for t, command, a, b in trace if command == "SCROLL"]
+        outputs = [(frame[2], frame[3]) for frame in frames]
+    
+    total_in = (sum(e[1] for e in events), sum(e[2] for e in events))
+    total_out = (sum(o[0] for o in outputs), sum(o[1] for o in outputs))
+    magnitude = math.hypot(*total_in)
+    direction = (total_in[0] / magnitude, total_in[1] / magnitude) if magnitude else (0.0, 0.0)
+    
+    in_x = in_y = out_x = out_y = 0.0
+    next_event = 0
+    overshoot = 0.0
+    lag_sum = 0.0
+    lag_frames = 0
+    last_input = events[-1][0] if events else 0.0
+    speeds: List[float] = []
+    
+    for index, (dx, dy) in enumerate(outputs):
+        frame_time = (index + 1) * interval
+        while next_event < len(events) and events[next_event][0] <= frame_time:
+            in_x += events[next_event][1]
+            in_y += events[next_event][2]
+            next_event += 1
+        out_x += dx
+        out_y += dy
+        speeds.append(math.hypot(dx, dy))
+        
+        overshoot = max(overshoot, (out_x * direction[0] + out_y * direction[1]) - magnitude)
+        if frame_time <= last_input:
+            lag_sum += math.hypot(in_x - out_x, in_y - out_y)
+            lag_frames += 1
+    
+    # Smoothness over the span where output was moving
+    moving = [index for index, speed in enumerate(speeds) if speed > 0]
+    jerk = 0.0
+    stalls = 0
+    if moving:
+        span = speeds[moving[0]:moving[-1] + 1]
+        stalls = sum(1 for speed in span if speed == 0)
+        if len(span) > 1:
+            jerk = sum(abs(b - a) for a, b in zip(span, span[1:])) / (len(span) - 1)
+    
+    return {
+        "input_total": [round(total_in[0], 3), round(total_in[1], 3)],
+        "output_total": list(total_out),
+        "conservation_error": round(math.hypot(total_out[0] - total_in[0], total_out[1] - total_in[1]), 3),
+        "overshoot_px": round(max(0.0, overshoot), 3),
+        "mean_lag_px": round(lag_sum / lag_frames, 3) if lag_frames else 0.0,
+        "jerk_px": round(jerk, 3),
+        "stalled_frames": stalls,
+        "frames": len(frames),
+    }
+
+
+def simulate_rate(
+    trace: List[TraceEvent],
+    stall_every: float = 0.0,
+    stall_ms: float = 0.0,
+    target_fps: int = 60
+) -> Dict[str, object]:
+    """
+    Replay MOVE events through an InputSmoother watched by a RateController.
+    
+    The controller evaluates every RATE_EVAL_INTERVAL of simulated time,
+    probing the simulated frame loop the way the server probes the real
+    one. With stall_every/stall_ms the frame loop does not run for the last
+    stall_ms of every stall_every seconds (a GC pause, CPU starvation): the
+    packets pile up in the inbox and the frame after the stall is late.
+    
+    Returns:
+        {"suggestions": [(seconds, hz), ...], "rates": controller stats}
+    """
+    clock = VirtualClock()
+    smoother = InputSmoother(inject_move=lambda dx, dy: None, clock=clock, **INPUT_SMOOTHER_PARAMS)
+    interval = 1.0 / target_fps
+    loop = {"frames": 0, "overrun": 0, "lag": 0.0}
+    
+    def probe(client_ip: str):
+        return loop["frames"], loop["overrun"], loop["lag"], smoother.inbox_depth
+    
+    client, peer = socket.socketpair()
+    controller = RateController(TimerScheduler(), load_probe=probe, frame_interval=interval, clock=clock)
+    controller.add_client("sim", client)
+    suggestions: List[Tuple[float, float]] = []
+    
+    start = clock.now
+    end = (trace[-1][0] if trace else 0.0) + interval
+    next_event = 0
+    next_eval = RATE_EVAL_INTERVAL
+    frame = 1
+    stalled_since = 0.0
+    
+    try:
+        while frame * interval <= end:
+            offset = frame * interval
+            while next_event < len(trace) and trace[next_event][0] <= offset:
+                arrival, command, a, b = trace[next_event]
+                clock.now = start + arrival
+                if command == "MOVE":
+                    smoother.add_movement(a, b)
+                    controller.note_packet("sim")
+                next_event += 1
+            clock.now = start + offset
+            
+            if stall_every and offset % stall_every > stall_every - stall_ms / 1000.0:
+                stalled_since = stalled_since or offset
+            else:
+                if stalled_since:
+                    # The frame after a stall overran and woke up late
+                    loop["overrun"] += 1
+                    loop["lag"] += 0.1 * ((offset - stalled_since) - loop["lag"])
+                    stalled_since = 0.0
+                else:
+                    loop["lag"] -= 0.1 * loop["lag"]
+                smoother.step(clock.now)
+                loop["frames"] += 1
+            
+            if offset >= next_eval:
+                before = controller.suggestions_sent
+                controller.evaluate()
+                if controller.suggestions_sent != before:
+                    suggestions.append((round(offset, 3), controller.stats()["sim"]["suggested_hz"]))
+                next_eval += RATE_EVAL_INTERVAL
+            frame += 1
+        rates = controller.stats()["sim"]
+    finally:
+        client.close()
+        peer.close()
+    return {"suggestions": suggestions, "rates": rates}
+
+
+def rate_check() -> int:
+    """Run the send-rate checks; returns the number of failures."""
+    failures = 0
+    stroke = synthetic_trace(rate=125.0, duration=5.0)
+    cases = [
+        ("steady 125 Hz", simulate_rate(stroke), False),
+        ("stalled loop", simulate_rate(stroke, stall_every=1.0, stall_ms=200.0), True),
+    ]
+    for name, result, expect_slowdown in cases:
+        suggestions = result["suggestions"]
+        slowed = any(hz < result["rates"]["measured_hz"] for _, hz in suggestions)
+        ok = slowed if expect_slowdown else not suggestions
+        failures += not ok
+        print(f"{name:16s} measured={result['rates']['measured_hz']}Hz "
+              f"suggestions={suggestions}  {'OK' if ok else 'FAIL'}")
+    return failures
+
+
+def run_scenario(name: str) -> Dict[str, object]:
+    """Replay one built-in scenario."""
+    trace_kwargs, passthrough = SCENARIOS[name]
+    return simulate(synthetic_trace(**trace_kwargs), passthrough=passthrough)
+
+
+def load_trace(path: str) -> List[TraceEvent]:
+    """Read a JSON trace: a list (or {"events": list}) of [seconds, command, a, b]."""
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data["events"]
+    trace = [(float(t), str(command).upper(), int(a), int(b)) for t, command, a, b in data]
+    trace.sort(key=lambda event: event[0])
+    return trace
+
+
+def _golden_path(name: str) -> str:
+    return os.path.join(GOLDEN_DIR, f"{name}.json")
+
+
+def write_golden(name: str, result: Dict[str, object]):
+    """Store a scenario's trajectory (one frame per line, diff-friendly)."""
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    lines = ",\n".join("    " + json.dumps(frame) for frame in result["frames"])
+    with open(_golden_path(name), "w") as f:
+        f.write('{\n  "scenario": %s,\n  "metrics": %s,\n  "frames": [\n%s\n  ]\n}\n' % (
+            json.dumps(name), json.dumps(result["metrics"], sort_keys=True), lines
+        ))
+
+
+def check_golden(name: str, result: Dict[str, object]) -> Optional[str]:
+    """None if the trajectory matches the golden file, else what differs."""
+    path = _golden_path(name)
+    if not os.path.exists(path):
+        return "no golden file (run --update-golden)"
+    with open(path) as f:
+        golden = json.load(f)["frames"]
+    
+    frames = result["frames"]
+    for index, (expected, actual) in enumerate(zip(golden, frames)):
+        if expected != actual:
+            return f"frame {index}: expected {expected}, got {actual}"
+    if len(golden) != len(frames):
+        return f"{len(frames)} frames, golden has {len(golden)}"
+    return None
+
+
+def print_metrics(name: str, metrics: Dict[str, object]):
+    """Print one summary line of trajectory metrics."""
+    latency = metrics["latency"]
+    print(
+        f"{name:12s} in={metrics['input_total']} out={metrics['output_total']} "
+        f"err={metrics['conservation_error']} overshoot={metrics['overshoot_px']}px "
+        f"lag={metrics['mean_lag_px']}px p50={latency['p50_ms']}ms p99={latency['p99_ms']}ms "
+        f"jerk={metrics['jerk_px']}px stalls={metrics['stalled_frames']}"
+    )
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Deterministic smoother trace replay")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='Built-in scenario to run (repeatable, default: all)')
+    parser.add_argument('--trace', metavar='PATH',
+                        help='Replay a JSON trace of [seconds, command, a, b] events')
+    parser.add_argument('--passthrough', action='store_true',
+                        help='Adaptive passthrough for --trace replays')
+    parser.add_argument('--frames', action='store_true',
+                        help='Print the per-frame output')
+    parser.add_argument('--check', action='store_true',
+                        help='Compare scenario trajectories with the golden files')
+    parser.add_argument('--update-golden', action='store_true',
+                        help='Rewrite the golden files from the current smoothers')
+    parser.add_argument('--rate-check', action='store_true',
+                        help='Check send-rate feedback against steady and stalled strokes')
+    args = parser.parse_args()
+    
+    if args.rate_check:
+        failures = rate_check()
+        print("OK: rate feedback" if not failures else f"FAIL: {failures} rate check(s)")
+        sys.exit(1 if failures else 0)
+    
+    if args.trace:
+        runs = [(os.path.basename(args.trace), simulate(load_trace(args.trace), passthrough=args.passthrough))]
+    else:
+        runs = [(name, run_scenario(name)) for name in (args.scenario or sorted(SCENARIOS))]
+    
+    failures = 0
+    for name, result in runs:
+        print_metrics(name, result["metrics"])
+        if args.frames:
+            for index, frame in enumerate(result["frames"]):
+                print(f"  {index:4d} {frame}")
+        if args.update_golden and not args.trace:
+            write_golden(name, result)
+        elif args.check and not args.trace:
+            problem = check_golden(name, result)
+            if problem:
+                failures += 1
+                print(f"  FAIL: {problem}")
+    
+    if args.update_golden:
+        print(f"Golden files written to {GOLDEN_DIR}")
+    elif args.check:
+        print("OK: trajectories match" if not failures else f"FAIL: {failures} scenario(s) changed")
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -48,10 +48,19 @@ smoothness - the hallmark of professional gaming mice and trackpads.
 
 import threading
 import time
+import logging
 from collections import deque
-from typing import Callable, Optional
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 import math
 
+from .config import (
+    WHEEL_HI_RES_UNITS, INPUT_STROKE_GAP, LATENCY_TRACK_SAMPLES, INPUT_INBOX_SIZE,
+    PASSTHROUGH_ENTER_JITTER_MS, PASSTHROUGH_EXIT_JITTER_MS, PASSTHROUGH_MIN_PACKETS
+)
+from .metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
 
 class InputSmoother:
     """
@@ -88,7 +97,11 @@ class InputSmoother:
         discharge_rate: float = 0.22,  # Optimization R3: 22% discharge (faster response)
         continuation_timeout_ms: int = 80,  # Optimization R3: 80ms (tighter control)
         smoothing_factor: float = 0.35,
-        velocity_decay: float = 0.75  # Optimization R3: 75% decay (smoother tail)
+        velocity_decay: float = 0.75,  # Optimization R3: 75% decay (smoother tail)
+        adaptive_passthrough: bool = False,
+        thread_setup: Optional[Callable[[str], None]] = None,
+        latency: Optional[Histogram] = None,
+        clock: Optional[Callable[[], float]] = None
     ):
         """
         Initialize the capacitor-style input smoother.
@@ -102,14 +115,31 @@ class InputSmoother:
                                     Lower (80) = tighter, Higher (120) = more momentum
             smoothing_factor: Velocity averaging blend (0.0-1.0)
             velocity_decay: Momentum fade rate during continuation (0.0-1.0)
+            adaptive_passthrough: Bypass the capacitor while input is already
+                                  dense and steady (see add_movement)
+            thread_setup: Optional hook run first on the discharge thread (role)
+            latency: Histogram for recv-to-inject latency (shared between
+                     smoothers; a private one if None)
+            clock: Time source for input timing and latency (None = wall
+                   clock). A virtual clock plus calling step() directly,
+                   without start(), replays traces deterministically.
         """
         # === OUTPUT CALLBACK ===
         self._inject_move = inject_move
+        self._thread_setup = thread_setup
+        
+        # === CLOCKS ===
+        # Input/step timing; receive stamps use time.monotonic() unless injected
+        self._clock = clock or time.time
+        self._stamp_clock = clock or time.monotonic
         
         # === TIMING CONFIGURATION ===
         self._target_fps = target_fps  # Frames per second for output
         self._discharge_rate = discharge_rate  # Base discharge rate
         self._continuation_timeout = continuation_timeout_ms / 1000.0  # Convert to seconds
+        self._effective_continuation = self._continuation_timeout  # RTT-adjusted
+        self._network_rtt = 0.0  # Control-channel RTT (seconds), 0 = unknown
+        self._input_interval = 0.0  # Client's acknowledged send interval, 0 = unknown
         self._smoothing_factor = smoothing_factor
         self._velocity_decay = velocity_decay
         
@@ -141,6 +171,43 @@ class InputSmoother:
         self._last_input_time = 0.0  # When we last received input
         self._is_active = False  # Whether we're currently processing movement
         
+        # === PRODUCER HANDOFF ===
+        # Packets from the network thread, drained at the start of each frame.
+        # Bounded: when the frame loop stalls, further packets are folded into
+        # _overflow, running totals (dx, dy, packets, first recv stamp, last
+        # arrival) written only by the producer. The frame loop applies what
+        # was added since _overflow_taken as one packet.
+        self._inbox: Deque[Tuple[int, int, float, float]] = deque(maxlen=INPUT_INBOX_SIZE)
+        self._overflow: Tuple[int, int, int, float, float] = (0, 0, 0, 0.0, 0.0)
+        self._overflow_taken: Tuple[int, int, int] = (0, 0, 0)  # Frame loop only
+        self._last_arrival = 0.0  # Producer only: passthrough statistics
+        
+        # === LATENCY TRACKING ===
+        # [receive stamp, charge not yet discharged] per packet, oldest first.
+        # A packet is delivered once all of its charge has been discharged;
+        # its stamp then waits in _delivered until the pixels are injected.
+        self._in_flight: Deque[List[float]] = deque(maxlen=LATENCY_TRACK_SAMPLES)
+        self._delivered: Deque[float] = deque(maxlen=LATENCY_TRACK_SAMPLES)
+        self.latency = latency if latency is not None else Histogram()
+        
+        # === ADAPTIVE PASSTHROUGH ===
+        # Inter-arrival statistics decide whether the capacitor is needed
+        self._adaptive_passthrough = adaptive_passthrough
+        self._passthrough = False  # True = add_movement injects directly
+        self._arrival_interval = 0.0  # EWMA of packet gaps (seconds)
+        self._arrival_jitter = 0.0  # EWMA of |gap - mean gap| (seconds)
+        self._steady_packets = 0  # Consecutive packets meeting the enter condition
+        
+        # === STATS ===
+        self.packets_received = 0
+        self.pixels_output = 0  # Sum of |dx| + |dy| released
+        self.frame_lag = 0.0  # EWMA of frame wake-up lateness (seconds)
+        self.mode_switches = 0  # Capacitor <-> passthrough transitions
+        self.inbox_overflows = 0  # Packets folded because the inbox was full
+        self.frames = 0
+        self.frames_overrun = 0  # Frames whose work exceeded the interval
+        self.frame_time = Histogram()  # Step + inject cost per frame
+        
         # === THREAD CONTROL ===
         self._running = False
         self._thread: Optional[threading.Thread] = None
@@ -166,7 +233,49 @@ class InputSmoother:
             self._thread.join(timeout=0.5)
             self._thread = None
     
-    def add_movement(self, dx: int, dy: int):
+    def set_network_rtt(self, rtt: float):
+        """
+        Feed the measured control-channel RTT (seconds) for latency-aware tuning.
+        
+        On a slow link the gaps between packets grow with the RTT, so the
+        continuation is stretched to bridge a gap of about one RTT (capped
+        at 2x the configured timeout). On a fast link nothing changes.
+        """
+        self._network_rtt = rtt
+        self._update_continuation()
+    
+    def set_input_rate(self, hz: float):
+        """
+        Feed the send rate the client acknowledged (RATE_ACK).
+        
+        A client sending slower leaves longer gaps between packets: the
+        velocity estimate assumes that interval for the first packet, and
+        the continuation covers at least two packet intervals so a single
+        late packet does not stall the cursor.
+        """
+        self._input_interval = 1.0 / hz if hz > 0 else 0.0
+        self._update_continuation()
+    
+    def _update_continuation(self):
+        """Recompute the continuation timeout from RTT and input interval."""
+        gap = max(self._network_rtt, 2 * self._input_interval)
+        self._effective_continuation = max(
+            self._continuation_timeout,
+            min(gap, 2 * self._continuation_timeout)
+        )
+    
+    @property
+    def inbox_depth(self) -> int:
+        """
+        Packets handed over but not yet taken by the frame loop.
+        
+        A running frame loop drains the inbox every frame, so more than a
+        frame's worth of packets here means the loop is falling behind.
+        Folded overflow packets count too.
+        """
+        return len(self._inbox) + self._overflow[2] - self._overflow_taken[2]
+    
+    def add_movement(self, dx: int, dy: int, recv_time: float = 0.0):
         """
         CHARGE the capacitor with incoming movement.
         
@@ -176,177 +285,447 @@ class InputSmoother:
         Args:
             dx: Horizontal movement (positive = right)
             dy: Vertical movement (positive = down)
+            recv_time: time.monotonic() (or the injected clock) when the
+                       packet was received (0 = now); used for latency
         
         The capacitor model:
         - Movement adds to the existing charge
         - Velocity is calculated for continuation
         - Direction is stored for momentum
+        
+        Lock-free handoff: the network thread only appends (dx, dy, time) to
+        the bounded inbox (deque.append is atomic); the frame loop drains it
+        at the start of step(). A packet arriving mid-frame therefore never
+        waits for the smoother lock. If the frame loop stalls (GC pause,
+        starvation) and the inbox fills up, further packets are summed into
+        one instead of growing the queue, so nothing replays as a burst of
+        stale packets and no movement is lost.
+        
+        Adaptive passthrough: when packets already arrive at least once per
+        frame with low jitter, holding them in the capacitor only adds
+        latency. The smoother then injects the whole charge right here and
+        step() outputs nothing; once jitter rises it falls back to the
+        capacitor. The sub-pixel remainder is carried across both switches.
+        The arrival statistics belong to this thread. Processing a packet
+        inline needs the lock, but it is only tried, never waited for:
+        while step() holds it, the packet goes through the inbox and step()
+        releases it (at most one frame later).
+        """
+        current_time = self._clock()
+        if not recv_time:
+            recv_time = self._stamp_clock()
+        
+        if not self._adaptive_passthrough:
+            self._hand_off(dx, dy, current_time, recv_time)
+            return
+        
+        switched = None
+        if self._last_arrival > 0:
+            switched = self._update_passthrough(current_time - self._last_arrival)
+        self._last_arrival = current_time
+        
+        int_dx = int_dy = 0
+        if self._lock.acquire(blocking=False):
+            try:
+                self._drain_inbox_locked()  # Keep packet order
+                self._apply_movement_locked(dx, dy, current_time, recv_time)
+                
+                # === PASSTHROUGH: release the whole charge now ===
+                if self._passthrough:
+                    int_dx, int_dy = self._release_charge_locked()
+            finally:
+                self._lock.release()
+        else:
+            self._hand_off(dx, dy, current_time, recv_time)
+        
+        if switched is not None:
+            logger.info(
+                f"Smoother mode: {'passthrough' if switched else 'capacitor'} "
+                f"(interval={self._arrival_interval * 1000:.1f}ms "
+                f"jitter={self._arrival_jitter * 1000:.1f}ms)"
+            )
+        if int_dx != 0 or int_dy != 0:
+            self._inject_move(int_dx, int_dy)
+        self.note_injected()
+    
+    def _hand_off(self, dx: int, dy: int, current_time: float, recv_time: float):
+        """Queue a packet for the frame loop, folding it in if the inbox is full (producer)."""
+        inbox = self._inbox
+        if len(inbox) < INPUT_INBOX_SIZE:  # Only the consumer pops: the room stays
+            inbox.append((dx, dy, current_time, recv_time))
+            return
+        
+        total_dx, total_dy, packets, first_recv, _ = self._overflow
+        if packets == self._overflow_taken[2]:
+            first_recv = recv_time  # First packet of a new fold
+        self._overflow = (total_dx + dx, total_dy + dy, packets + 1, first_recv, current_time)
+        self.inbox_overflows += 1
+    
+    def _drain_inbox_locked(self):
+        """Apply every packet handed over by add_movement (lock held)."""
+        inbox = self._inbox
+        # Packets queued before the overflow, then the folded overflow, then
+        # whatever was appended meanwhile
+        queued = len(inbox)
+        while queued:
+            dx, dy, arrival_time, recv_time = inbox.popleft()
+            self._apply_movement_locked(dx, dy, arrival_time, recv_time)
+            queued -= 1
+        
+        total_dx, total_dy, packets, first_recv, last_arrival = self._overflow
+        taken_dx, taken_dy, taken = self._overflow_taken
+        if packets != taken:
+            self._overflow_taken = (total_dx, total_dy, packets)
+            self._apply_movement_locked(total_dx - taken_dx, total_dy - taken_dy, last_arrival, first_recv)
+            self.packets_received += packets - taken - 1
+        
+        while inbox:
+            dx, dy, arrival_time, recv_time = inbox.popleft()
+            self._apply_movement_locked(dx, dy, arrival_time, recv_time)
+    
+    def _release_charge_locked(self) -> Tuple[int, int]:
+        """Move the whole charge into the output; returns whole pixels (lock held)."""
+        self._deliver_all_locked()
+        self._subpixel_x += self._charge_x
+        self._subpixel_y += self._charge_y
+        self._charge_x = 0.0
+        self._charge_y = 0.0
+        int_dx = int(self._subpixel_x)
+        int_dy = int(self._subpixel_y)
+        self._subpixel_x -= int_dx
+        self._subpixel_y -= int_dy
+        self.pixels_output += abs(int_dx) + abs(int_dy)
+        return int_dx, int_dy
+    
+    def _apply_movement_locked(self, dx: int, dy: int, current_time: float, recv_time: float):
+        """Charge the capacitor with one packet received at current_time (lock held)."""
+        # === ADD TO CAPACITOR CHARGE ===
+        # Incoming movement adds to the buffer
+        self._charge_x += dx
+        self._charge_y += dy
+        self.packets_received += 1
+        if dx or dy:
+            self._in_flight.append([recv_time, float(abs(dx) + abs(dy))])
+        
+        # === CALCULATE VELOCITY FOR CONTINUATION ===
+        # This allows momentum to continue after input stops
+        interval = self._input_interval or 1.0 / self._target_fps
+        dt = current_time - self._last_input_time if self._last_input_time > 0 else interval
+        if dt < 0.001:
+            dt = interval  # Prevent division issues
+        
+        # Calculate frames elapsed since last input
+        frames = max(dt * self._target_fps, 1)
+        
+        # Calculate velocity as movement per frame
+        new_vx = dx / frames
+        new_vy = dy / frames
+        
+        # === QUICK TURN LOGIC (Optimization) ===
+        # If new movement opposes current velocity, reset momentum immediately
+        # This prevents the "drifty" feeling when changing direction quickly
+        # Dot product < 0 means opposing directions
+        if (dx * self._velocity_x + dy * self._velocity_y) < 0:
+            self._velocity_x = 0
+            self._velocity_y = 0
+        
+        # === SMOOTH VELOCITY (exponential moving average) ===
+        # Blend new velocity with previous for stability
+        # Optimization R3: 0.6 (60% new) makes it react faster to input changes
+        blend = 0.6
+        self._velocity_x = self._velocity_x * (1 - blend) + new_vx * blend
+        self._velocity_y = self._velocity_y * (1 - blend) + new_vy * blend
+        
+        # === UPDATE DIRECTION VECTOR ===
+        # Store normalized direction for continuation
+        speed = math.sqrt(self._velocity_x**2 + self._velocity_y**2)
+        if speed > 0.05:  # Minimum threshold to update direction
+            self._direction_x = self._velocity_x / speed
+            self._direction_y = self._velocity_y / speed
+            self._speed = speed
+        
+        # === UPDATE STATE ===
+        self._is_active = True
+        self._last_input_time = current_time
+    
+    def _update_passthrough(self, gap: float) -> Optional[bool]:
+        """
+        Update inter-arrival statistics with one packet gap.
+        
+        Called on the producer thread only, which owns these statistics.
+        Returns the new mode (True = passthrough) if it changed, else None.
+        Gaps longer than INPUT_STROKE_GAP are pauses between strokes and
+        say nothing about the link, so they are ignored.
         """
-        current_time = time.time()
+        if gap >= INPUT_STROKE_GAP:
+            return None
+        
+        if self._arrival_interval == 0.0:
+            self._arrival_interval = gap
+            return None
+        self._arrival_jitter += 0.125 * (abs(gap - self._arrival_interval) - self._arrival_jitter)
+        self._arrival_interval += 0.125 * (gap - self._arrival_interval)
+        
+        frame_interval = 1.0 / self._target_fps
+        jitter_ms = self._arrival_jitter * 1000.0
+        
+        if self._passthrough:
+            # Leave at the higher jitter threshold (hysteresis)
+            if jitter_ms > PASSTHROUGH_EXIT_JITTER_MS or self._arrival_interval > 1.5 * frame_interval:
+                self._passthrough = False
+                self._steady_packets = 0
+                self.mode_switches += 1
+                return False
+            return None
         
+        if jitter_ms < PASSTHROUGH_ENTER_JITTER_MS and self._arrival_interval <= frame_interval:
+            self._steady_packets += 1
+            if self._steady_packets >= PASSTHROUGH_MIN_PACKETS:
+                self._passthrough = True
+                self.mode_switches += 1
+                return True
+        else:
+            self._steady_packets = 0
+        return None
+    
+    def flush(self) -> Tuple[int, int]:
+        """
+        Release ALL pending charge at once and stop any continuation.
+        
+        Used as an ordering barrier before a button edge: the movement that
+        came before the click is injected first, so the click lands exactly
+        where the client put the cursor. Momentum is cancelled because it is
+        synthetic movement that would carry the cursor past that point. The
+        fractional sub-pixel rest is kept as usual.
+        
+        Returns:
+            (dx, dy) integer pixels that were injected
+        """
         with self._lock:
-            # === ADD TO CAPACITOR CHARGE ===
-            # Incoming movement adds to the buffer
-            self._charge_x += dx
-            self._charge_y += dy
+            self._drain_inbox_locked()
+            self._deliver_all_locked()
+            self._subpixel_x += self._charge_x
+            self._subpixel_y += self._charge_y
+            self._charge_x = 0.0
+            self._charge_y = 0.0
             
-            # === CALCULATE VELOCITY FOR CONTINUATION ===
-            # This allows momentum to continue after input stops
-            interval = 1.0 / self._target_fps
-            dt = current_time - self._last_input_time if self._last_input_time > 0 else interval
-            if dt < 0.001:
-                dt = interval  # Prevent division issues
+            self._is_active = False
+            self._speed = 0
+            self._velocity_x = 0
+            self._velocity_y = 0
             
-            # Calculate frames elapsed since last input
-            frames = max(dt * self._target_fps, 1)
+            int_dx = int(self._subpixel_x)
+            int_dy = int(self._subpixel_y)
+            self._subpixel_x -= int_dx
+            self._subpixel_y -= int_dy
+            self.pixels_output += abs(int_dx) + abs(int_dy)
+        
+        if int_dx != 0 or int_dy != 0:
+            self._inject_move(int_dx, int_dy)
+        self.note_injected()
+        return int_dx, int_dy
+    
+    @property
+    def passthrough(self) -> bool:
+        """Whether movement currently bypasses the capacitor."""
+        return self._passthrough
+    
+    # === RECV-TO-INJECT LATENCY ===
+    
+    def _discharged_locked(self, amount: float):
+        """Consume amount of discharged charge from the oldest packets (lock held)."""
+        in_flight = self._in_flight
+        while in_flight and amount > 0.0:
+            entry = in_flight[0]
+            if entry[1] > amount:
+                entry[1] -= amount
+                return
+            amount -= entry[1]
+            self._delivered.append(in_flight.popleft()[0])
+    
+    def _deliver_all_locked(self):
+        """The capacitor is empty: every tracked packet is delivered (lock held)."""
+        in_flight = self._in_flight
+        while in_flight:
+            self._delivered.append(in_flight.popleft()[0])
+    
+    def note_injected(self):
+        """
+        Record latency for packets whose last pixels were just injected.
+        
+        Called right after the injection by whoever injects (the discharge
+        loop, add_movement in passthrough, flush, or a SmootherMixer).
+        """
+        delivered = self._delivered
+        if not delivered:
+            return
+        now = self._stamp_clock()
+        while delivered:
+            try:
+                stamp = delivered.popleft()
+            except IndexError:
+                break
+            self.latency.observe(now - stamp)
+    
+    def _discharge_loop(self):
+        """
+        DISCHARGE the capacitor at a constant rate.
+        
+        Runs step() once per frame at target_fps and injects the result.
+        The injection syscall happens after the state lock is released,
+        so incoming packets are never blocked behind a kernel write.
+        """
+        if self._thread_setup:
+            self._thread_setup("input-smoother")
+        
+        interval = 1.0 / self._target_fps  # Time between frames
+        next_frame = time.time()
+        
+        while self._running:
+            loop_start = time.time()
             
-            # Calculate velocity as movement per frame
-            new_vx = dx / frames
-            new_vy = dy / frames
+            # Host load indicator: how late this frame woke up
+            self.frame_lag += 0.1 * (max(0.0, loop_start - next_frame) - self.frame_lag)
+            next_frame = loop_start + interval
             
-            # === QUICK TURN LOGIC (Optimization) ===
-            # If new movement opposes current velocity, reset momentum immediately
-            # This prevents the "drifty" feeling when changing direction quickly
-            # Dot product < 0 means opposing directions
-            if (dx * self._velocity_x + dy * self._velocity_y) < 0:
-                self._velocity_x = 0
-                self._velocity_y = 0
+            int_dx, int_dy = self.step(self._clock())
             
-            # === SMOOTH VELOCITY (exponential moving average) ===
-            # Blend new velocity with previous for stability
-            # Optimization R3: 0.6 (60% new) makes it react faster to input changes
-            blend = 0.6
-            self._velocity_x = self._velocity_x * (1 - blend) + new_vx * blend
-            self._velocity_y = self._velocity_y * (1 - blend) + new_vy * blend
-            
-            # === UPDATE DIRECTION VECTOR ===
-            # Store normalized direction for continuation
-            speed = math.sqrt(self._velocity_x**2 + self._velocity_y**2)
-            if speed > 0.05:  # Minimum threshold to update direction
-                self._direction_x = self._velocity_x / speed
-                self._direction_y = self._velocity_y / speed
-                self._speed = speed
-            
-            # === UPDATE STATE ===
-            self._is_active = True
-            self._last_input_time = current_time
+            # === OUTPUT TO SYSTEM ===
+            # Inject movement into the virtual mouse
+            if int_dx != 0 or int_dy != 0:
+                self._inject_move(int_dx, int_dy)
+            self.note_injected()
+            
+            # === MAINTAIN CONSTANT FRAME RATE ===
+            # Sleep for remaining time in this frame
+            elapsed = time.time() - loop_start
+            self.frames += 1
+            self.frame_time.observe(elapsed)
+            if elapsed > interval:
+                self.frames_overrun += 1
+            sleep_time = interval - elapsed
+            if sleep_time > 0:
+                time.sleep(sleep_time)
     
-    def _discharge_loop(self):
+    def step(self, current_time: float) -> Tuple[int, int]:
         """
-        DISCHARGE the capacitor at a constant rate.
+        Run one DISCHARGE frame and return the whole pixels to output.
         
-        This is the heart of the smoothing algorithm. It runs at a fixed
-        frame rate (target_fps) and outputs movement continuously.
+        This is the heart of the smoothing algorithm. It is called once
+        per frame, by the discharge loop or by a SmootherMixer that drives
+        many smoothers from a single frame loop.
         
-        The loop handles three states:
+        Each frame is in one of three states:
         1. DISCHARGE: Buffer has charge → output portion of it
         2. CONTINUATION: Buffer empty but within timeout → add momentum
         3. IDLE: Timeout reached → stop movement
         
-        This provides smooth, gap-free cursor movement regardless of
-        when input packets arrive.
+        Returns:
+            (dx, dy) integer pixels; the fractional rest stays in the
+            sub-pixel accumulator for the next frame
         """
-        interval = 1.0 / self._target_fps  # Time between frames
-        
-        while self._running:
-            loop_start = time.time()
+        with self._lock:
+            # === TAKE OVER PACKETS HANDED OFF SINCE THE LAST FRAME ===
+            self._drain_inbox_locked()
             
-            with self._lock:
-                current_time = time.time()
-                time_since_input = current_time - self._last_input_time
+            # === PASSTHROUGH: add_movement already injected everything ===
+            # (except packets it handed over while this lock was held)
+            if self._passthrough:
+                if self._charge_x or self._charge_y:
+                    return self._release_charge_locked()
+                return 0, 0
+            
+            time_since_input = current_time - self._last_input_time
+            
+            out_dx = 0.0
+            out_dy = 0.0
+            
+            # === STATE 1: DISCHARGE (buffer has charge) ===
+            if self._charge_x != 0 or self._charge_y != 0:
+                # Calculate charge magnitude for adaptive discharge
+                charge_magnitude = math.sqrt(self._charge_x**2 + self._charge_y**2)
                 
-                out_dx = 0.0
-                out_dy = 0.0
+                # === ADAPTIVE DISCHARGE RATE ===
+                # Like an RC circuit: more charge = faster discharge
+                # This provides:
+                # - Fast response for large movements (gaming)
+                # - Smooth precision for small movements (accuracy)
+                if charge_magnitude > 10:
+                    # Large movement: discharge faster (up to 27%)
+                    rate = min(self._discharge_rate * 1.5, 0.27)
+                elif charge_magnitude < 2:
+                    # Small movement: discharge slower (minimum 12%)
+                    rate = max(self._discharge_rate * 0.7, 0.12)
+                else:
+                    # Normal movement: use base rate
+                    rate = self._discharge_rate
                 
-                # === STATE 1: DISCHARGE (buffer has charge) ===
-                if self._charge_x != 0 or self._charge_y != 0:
-                    # Calculate charge magnitude for adaptive discharge
-                    charge_magnitude = math.sqrt(self._charge_x**2 + self._charge_y**2)
-                    
-                    # === ADAPTIVE DISCHARGE RATE ===
-                    # Like an RC circuit: more charge = faster discharge
-                    # This provides:
-                    # - Fast response for large movements (gaming)
-                    # - Smooth precision for small movements (accuracy)
-                    if charge_magnitude > 10:
-                        # Large movement: discharge faster (up to 27%)
-                        rate = min(self._discharge_rate * 1.5, 0.27)
-                    elif charge_magnitude < 2:
-                        # Small movement: discharge slower (minimum 12%)
-                        rate = max(self._discharge_rate * 0.7, 0.12)
-                    else:
-                        # Normal movement: use base rate
-                        rate = self._discharge_rate
-                    
-                    # === CALCULATE DISCHARGE AMOUNT ===
-                    out_dx = self._charge_x * rate
-                    out_dy = self._charge_y * rate
-                    
-                    # === REMOVE DISCHARGED AMOUNT FROM BUFFER ===
-                    self._charge_x -= out_dx
-                    self._charge_y -= out_dy
-                    
-                    # === CLEAR TINY RESIDUALS ===
-                    # When charge is nearly zero, release everything
-                    # Prevents "stuck" sub-pixel amounts
-                    if abs(self._charge_x) < 0.02:
-                        out_dx += self._charge_x
-                        self._charge_x = 0
-                    if abs(self._charge_y) < 0.02:
-                        out_dy += self._charge_y
-                        self._charge_y = 0
+                # === CALCULATE DISCHARGE AMOUNT ===
+                out_dx = self._charge_x * rate
+                out_dy = self._charge_y * rate
                 
-                # === STATE 2: CONTINUATION (momentum after input stops) ===
-                elif self._is_active and time_since_input < self._continuation_timeout:
-                    # Calculate progress through continuation (0.0 → 1.0)
-                    progress = time_since_input / self._continuation_timeout
-                    
-                    # === SMOOTH EASE-OUT CURVE ===
-                    # Like a capacitor discharge curve: fast at first, then slows
-                    # pow(1-progress, 2) gives quadratic ease-out
-                    fade = math.pow(1.0 - progress, 2)
-                    
-                    # Calculate continuation speed with fade
-                    continue_speed = self._speed * fade * 0.5
-                    
-                    # Add continuation movement in stored direction
-                    if continue_speed > 0.03:  # Minimum threshold
-                        out_dx = self._direction_x * continue_speed
-                        out_dy = self._direction_y * continue_speed
+                # === REMOVE DISCHARGED AMOUNT FROM BUFFER ===
+                self._charge_x -= out_dx
+                self._charge_y -= out_dy
                 
-                # === STATE 3: IDLE (timeout reached) ===
-                elif self._is_active and time_since_input >= self._continuation_timeout:
-                    # Reset state - no more movement
-                    self._is_active = False
-                    self._speed = 0
-                    self._velocity_x = 0
-                    self._velocity_y = 0
+                # === CLEAR TINY RESIDUALS ===
+                # When charge is nearly zero, release everything
+                # Prevents "stuck" sub-pixel amounts
+                if abs(self._charge_x) < 0.02:
+                    out_dx += self._charge_x
+                    self._charge_x = 0
+                if abs(self._charge_y) < 0.02:
+                    out_dy += self._charge_y
+                    self._charge_y = 0
                 
-                # === SUB-PIXEL ACCUMULATION ===
-                # Accumulate fractional pixels to ensure precision
-                # This is critical for slow, accurate movements
-                self._subpixel_x += out_dx
-                self._subpixel_y += out_dy
+                # Packets whose charge has now left the capacitor
+                if self._charge_x == 0 and self._charge_y == 0:
+                    self._deliver_all_locked()
+                else:
+                    self._discharged_locked(abs(out_dx) + abs(out_dy))
+            
+            # === STATE 2: CONTINUATION (momentum after input stops) ===
+            elif self._is_active and time_since_input < self._effective_continuation:
+                # Calculate progress through continuation (0.0 → 1.0)
+                progress = time_since_input / self._effective_continuation
                 
-                # Extract integer pixels for output
-                int_dx = int(self._subpixel_x)
-                int_dy = int(self._subpixel_y)
+                # === SMOOTH EASE-OUT CURVE ===
+                # Like a capacitor discharge curve: fast at first, then slows
+                # pow(1-progress, 2) gives quadratic ease-out
+                fade = math.pow(1.0 - progress, 2)
                 
-                # Keep the fractional part for next frame
-                self._subpixel_x -= int_dx
-                self._subpixel_y -= int_dy
+                # Calculate continuation speed with fade
+                continue_speed = self._speed * fade * 0.5
                 
-                # === OUTPUT TO SYSTEM ===
-                # Inject movement into the virtual mouse
-                if int_dx != 0 or int_dy != 0:
-                    self._inject_move(int_dx, int_dy)
+                # Add continuation movement in stored direction
+                if continue_speed > 0.03:  # Minimum threshold
+                    out_dx = self._direction_x * continue_speed
+                    out_dy = self._direction_y * continue_speed
             
-            # === MAINTAIN CONSTANT FRAME RATE ===
-            # Sleep for remaining time in this frame
-            elapsed = time.time() - loop_start
-            sleep_time = interval - elapsed
-            if sleep_time > 0:
-                time.sleep(sleep_time)
+            # === STATE 3: IDLE (timeout reached) ===
+            elif self._is_active and time_since_input >= self._effective_continuation:
+                # Reset state - no more movement
+                self._is_active = False
+                self._speed = 0
+                self._velocity_x = 0
+                self._velocity_y = 0
+            
+            # === SUB-PIXEL ACCUMULATION ===
+            # Accumulate fractional pixels to ensure precision
+            # This is critical for slow, accurate movements
+            self._subpixel_x += out_dx
+            self._subpixel_y += out_dy
+            
+            # Extract integer pixels for output
+            int_dx = int(self._subpixel_x)
+            int_dy = int(self._subpixel_y)
+            
+            # Keep the fractional part for next frame
+            self._subpixel_x -= int_dx
+            self._subpixel_y -= int_dy
+            
+            self.pixels_output += abs(int_dx) + abs(int_dy)
+            return int_dx, int_dy
 
 
 class ScrollSmoother:
@@ -358,6 +737,10 @@ class ScrollSmoother:
     
     This turns jerky "tick-based" scrolling into fluid, pixel-perfect
     scrolling with physics-based momentum.
+    
+    With hires=True the output is emitted in 1/120-notch units (for
+    REL_WHEEL_HI_RES) instead of whole notches, so a slow scroll comes out
+    as a steady trickle rather than occasional full notches.
     """
     
     def __init__(
@@ -368,9 +751,14 @@ class ScrollSmoother:
         discharge_rate: float = 0.18,  # Optimization: Slower discharge = smoother feel
         continuation_timeout_ms: int = 120,  # Optimization: Slight boost for glide
         smoothing_factor: float = 0.4,
-        momentum_decay: float = 0.92   # Optimization: Less friction for long flicks
+        momentum_decay: float = 0.92,  # Optimization: Less friction for long flicks
+        hires: bool = False,           # Emit 1/120-notch units instead of notches
+        thread_setup: Optional[Callable[[str], None]] = None,
+        clock: Optional[Callable[[], float]] = None
     ):
         self._inject_scroll = inject_scroll
+        self._thread_setup = thread_setup  # Hook run first on the discharge thread
+        self._clock = clock or time.time   # Injectable for deterministic replay
         
         # === TIMING ===
         self._target_fps = target_fps
@@ -378,6 +766,10 @@ class ScrollSmoother:
         self._discharge_rate = discharge_rate
         self._continuation_timeout = continuation_timeout_ms / 1000.0
         
+        # === OUTPUT UNITS ===
+        # Charge is kept in notches; output is scaled just before rounding
+        self._output_scale = WHEEL_HI_RES_UNITS if hires else 1
+        
         # === THE CAPACITOR (Scroll Buffer) ===
         self._charge_v = 0.0  # Vertical
         self._charge_h = 0.0  # Horizontal
@@ -395,6 +787,12 @@ class ScrollSmoother:
         self._last_input_time = 0.0
         self._is_active = False
         
+        # === STATS ===
+        self.packets_received = 0
+        self.frames = 0
+        self.frames_overrun = 0
+        self.frame_time = Histogram()
+        
         # === THREAD CONTROL ===
         self._running = False
         self._thread: Optional[threading.Thread] = None
@@ -423,7 +821,7 @@ class ScrollSmoother:
             vertical: Vertical scroll amount (positive = up)
             horizontal: Horizontal scroll amount (positive = right)
         """
-        current_time = time.time()
+        current_time = self._clock()
         
         # Apply sensitivity multiplier
         vertical *= self._sensitivity
@@ -433,7 +831,8 @@ class ScrollSmoother:
             # === ADD TO CHARGE ===
             self._charge_v += vertical
             self._charge_h += horizontal
-
+            self.packets_received += 1
+            
             
             # === CALCULATE VELOCITY (for momentum/flick) ===
             interval = 1.0 / self._target_fps
@@ -459,86 +858,314 @@ class ScrollSmoother:
         """
         DISCHARGE the scroll capacitor smoothly.
         """
+        if self._thread_setup:
+            self._thread_setup("scroll-smoother")
+        
         interval = 1.0 / self._target_fps
         
         while self._running:
             loop_start = time.time()
             
-            with self._lock:
-                current_time = time.time()
-                time_since_input = current_time - self._last_input_time
+            int_v, int_h = self.step(self._clock())
+            
+            # Inject if we have enough for a step
+            if int_v != 0 or int_h != 0:
+                self._inject_scroll(int_v, int_h)
+            
+            # Maintain FPS
+            elapsed = time.time() - loop_start
+            self.frames += 1
+            self.frame_time.observe(elapsed)
+            if elapsed > interval:
+                self.frames_overrun += 1
+            sleep_time = interval - elapsed
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+    
+    def step(self, current_time: float) -> Tuple[int, int]:
+        """
+        Run one scroll DISCHARGE frame and return the whole units to output.
+        
+        Returns:
+            (vertical, horizontal) in notches, or 1/120 notches in hires mode
+        """
+        with self._lock:
+            time_since_input = current_time - self._last_input_time
+            
+            out_v = 0.0
+            out_h = 0.0
+            
+            # === STATE 1: DISCHARGE (Buffer has charge) ===
+            if self._charge_v != 0 or self._charge_h != 0:
+                # Adaptive rate based on charge amount
+                mag = math.sqrt(self._charge_v**2 + self._charge_h**2)
                 
-                out_v = 0.0
-                out_h = 0.0
+                # Optimization: More aggressive adaptive rate for snappiness
+                if mag > 8:
+                    # Fast flick: discharge fast (up to 45%)
+                    rate = min(self._discharge_rate * 1.8, 0.45)
+                elif mag < 2:
+                    # Slow scroll: standard smooth rate
+                    rate = self._discharge_rate
+                else:
+                    # Normal scroll: slight boost
+                    rate = self._discharge_rate * 1.2
                 
-                # === STATE 1: DISCHARGE (Buffer has charge) ===
-                if self._charge_v != 0 or self._charge_h != 0:
-                    # Adaptive rate based on charge amount
-                    mag = math.sqrt(self._charge_v**2 + self._charge_h**2)
-                    
-                    # Optimization: More aggressive adaptive rate for snappiness
-                    if mag > 8:
-                        # Fast flick: discharge fast (up to 45%)
-                        rate = min(self._discharge_rate * 1.8, 0.45)
-                    elif mag < 2:
-                        # Slow scroll: standard smooth rate
-                        rate = self._discharge_rate
-                    else:
-                        # Normal scroll: slight boost
-                        rate = self._discharge_rate * 1.2
-                    
-                    # Calculate discharge
-                    discharge_v = self._charge_v * rate
-                    discharge_h = self._charge_h * rate
-                    
-                    out_v = discharge_v
-                    out_h = discharge_h
-                    
-                    self._charge_v -= discharge_v
-                    self._charge_h -= discharge_h
-                    
-                    # Clear tiny residuals - optimization: looser threshold for responsiveness
-                    if abs(self._charge_v) < 0.1:
-                        out_v += self._charge_v
-                        self._charge_v = 0
-                    if abs(self._charge_h) < 0.1:
-                        out_h += self._charge_h
-                        self._charge_h = 0
+                # Calculate discharge
+                discharge_v = self._charge_v * rate
+                discharge_h = self._charge_h * rate
                 
-                # === STATE 2: MOMENTUM (Flick) ===
-                elif self._is_active and time_since_input < 0.8: # Optimization: 0.8s max momentum
-                    # Apply drag to velocity
-                    self._velocity_v *= self._momentum_decay
-                    self._velocity_h *= self._momentum_decay
-                    
-                    # Output remaining velocity
-                    out_v = self._velocity_v
-                    out_h = self._velocity_h
-                    
-                    # Stop if too slow - optimization: higher cutoff for punchier stop
-                    if abs(self._velocity_v) < 0.2 and abs(self._velocity_h) < 0.2:
-                        self._is_active = False
-
+                out_v = discharge_v
+                out_h = discharge_h
                 
-                # === OUTPUT PROCESSING ===
-                # Accumulate sub-pixels (sub-notches)
-                self._subpixel_v += out_v
-                self._subpixel_h += out_h
+                self._charge_v -= discharge_v
+                self._charge_h -= discharge_h
                 
-                # Extract integer scroll units
-                int_v = int(self._subpixel_v)
-                int_h = int(self._subpixel_h)
+                # Clear tiny residuals - optimization: looser threshold for responsiveness
+                if abs(self._charge_v) < 0.1:
+                    out_v += self._charge_v
+                    self._charge_v = 0
+                if abs(self._charge_h) < 0.1:
+                    out_h += self._charge_h
+                    self._charge_h = 0
+            
+            # === STATE 2: MOMENTUM (Flick) ===
+            elif self._is_active and time_since_input < 0.8: # Optimization: 0.8s max momentum
+                # Apply drag to velocity
+                self._velocity_v *= self._momentum_decay
+                self._velocity_h *= self._momentum_decay
                 
-                # Keep fraction
-                self._subpixel_v -= int_v
-                self._subpixel_h -= int_h
+                # Output remaining velocity
+                out_v = self._velocity_v
+                out_h = self._velocity_h
                 
-                # Inject if we have enough for a step
-                if int_v != 0 or int_h != 0:
-                    self._inject_scroll(int_v, int_h)
+                # Stop if too slow - optimization: higher cutoff for punchier stop
+                if abs(self._velocity_v) < 0.2 and abs(self._velocity_h) < 0.2:
+                    self._is_active = False
+            
+            
+            # === OUTPUT PROCESSING ===
+            # Accumulate sub-pixels (sub-notches, or sub-1/120 units in hires mode)
+            self._subpixel_v += out_v * self._output_scale
+            self._subpixel_h += out_h * self._output_scale
+            
+            # Extract integer scroll units
+            int_v = int(self._subpixel_v)
+            int_h = int(self._subpixel_h)
+            
+            # Keep fraction
+            self._subpixel_v -= int_v
+            self._subpixel_h -= int_h
+            
+            return int_v, int_h
+
+
+class AbsolutePositionSampler:
+    """
+    Latest-wins sampler for absolute (tablet-style) pointer positions.
+    
+    Unlike relative motion, an absolute coordinate supersedes every earlier
+    one. Incoming samples simply overwrite a single slot and a fixed-rate
+    loop injects the newest position once per frame. Stale intermediate
+    samples are discarded rather than injected, so a burst of packets
+    costs one uinput report per frame at most.
+    """
+    
+    def __init__(
+        self,
+        inject_position: Callable[[int, int], None],
+        target_fps: int = 60
+    ):
+        self._inject_position = inject_position
+        self._target_fps = target_fps
+        
+        # === LATEST SAMPLE SLOT ===
+        self._x = 0
+        self._y = 0
+        self._pending = False
+        
+        # === COUNTERS ===
+        self.samples_injected = 0
+        self.samples_discarded = 0  # Overwritten before reaching a frame
+        
+        # === THREAD CONTROL ===
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """Start the frame loop."""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._frame_loop, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop the frame loop."""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=0.5)
+            self._thread = None
+    
+    def set_position(self, x: int, y: int):
+        """Store the latest absolute position, replacing any unsent one."""
+        with self._lock:
+            if self._pending:
+                self.samples_discarded += 1
+            self._x = x
+            self._y = y
+            self._pending = True
+    
+    def _frame_loop(self):
+        """Inject the newest position once per frame (outside the lock)."""
+        interval = 1.0 / self._target_fps
+        
+        while self._running:
+            loop_start = time.time()
+            
+            with self._lock:
+                pending = self._pending
+                x, y = self._x, self._y
+                self._pending = False
+            
+            if pending:
+                self._inject_position(x, y)
+                self.samples_injected += 1
             
-            # Maintain FPS
             elapsed = time.time() - loop_start
             sleep_time = interval - elapsed
             if sleep_time > 0:
                 time.sleep(sleep_time)
+
+
+class SmootherMixer:
+    """
+    Drives many per-client smoothers from ONE frame loop (multi-client mode).
+    
+    Each client owns an InputSmoother and a ScrollSmoother that are never
+    started (no threads of their own). Every frame the mixer calls step()
+    on all of them, sums their output and injects a single merged report,
+    so the per-frame cost is one cheap step per client plus one write.
+    """
+    
+    def __init__(
+        self,
+        inject_frame: Callable[[int, int, int, int], None],
+        target_fps: int = 60,
+        thread_setup: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Args:
+            inject_frame: Callback for the merged report (dx, dy, vertical, horizontal)
+            target_fps: Output frame rate
+            thread_setup: Optional hook run first on the frame thread (role)
+        """
+        self._inject_frame = inject_frame
+        self._thread_setup = thread_setup
+        self._target_fps = target_fps
+        
+        # client key -> (InputSmoother, ScrollSmoother)
+        self._clients: Dict[str, Tuple[InputSmoother, ScrollSmoother]] = {}
+        self._clients_lock = threading.Lock()
+        
+        # === STATS ===
+        self.frames = 0
+        self.frames_overrun = 0      # Frames whose work exceeded the interval
+        self.last_frame_cost = 0.0   # Seconds spent stepping + injecting
+        self.total_frame_cost = 0.0
+        self.frame_lag = 0.0         # EWMA of frame wake-up lateness (seconds)
+        self.frame_time = Histogram()
+        
+        # === THREAD CONTROL ===
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+    
+    def add_client(self, key: str, input_smoother: InputSmoother, scroll_smoother: ScrollSmoother):
+        """Register a client's smoother pair."""
+        with self._clients_lock:
+            self._clients[key] = (input_smoother, scroll_smoother)
+    
+    def remove_client(self, key: str) -> Optional[Tuple[InputSmoother, ScrollSmoother]]:
+        """Unregister a client; returns its smoother pair (state intact)."""
+        with self._clients_lock:
+            return self._clients.pop(key, None)
+    
+    def get_client(self, key: str) -> Optional[Tuple[InputSmoother, ScrollSmoother]]:
+        """Look up a client's smoother pair."""
+        return self._clients.get(key)
+    
+    def flush_movement(self):
+        """Flush every client's pending movement (clients share one cursor)."""
+        with self._clients_lock:
+            pairs = list(self._clients.values())
+        for input_smoother, _ in pairs:
+            input_smoother.flush()
+    
+    @property
+    def client_count(self) -> int:
+        """Number of registered clients."""
+        return len(self._clients)
+    
+    def start(self):
+        """Start the shared frame loop."""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._frame_loop, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop the shared frame loop."""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=0.5)
+            self._thread = None
+    
+    def step(self, current_time: float) -> Tuple[int, int, int, int]:
+        """Step every client once and return the merged (dx, dy, vertical, horizontal)."""
+        with self._clients_lock:
+            pairs = list(self._clients.values())
+        
+        dx = dy = vertical = horizontal = 0
+        for input_smoother, scroll_smoother in pairs:
+            move_x, move_y = input_smoother.step(current_time)
+            scroll_v, scroll_h = scroll_smoother.step(current_time)
+            dx += move_x
+            dy += move_y
+            vertical += scroll_v
+            horizontal += scroll_h
+        return dx, dy, vertical, horizontal
+    
+    def _frame_loop(self):
+        """Merge all clients into one injected report per frame."""
+        if self._thread_setup:
+            self._thread_setup("mixer")
+        
+        interval = 1.0 / self._target_fps
+        next_frame = time.time()
+        
+        while self._running:
+            loop_start = time.time()
+            self.frame_lag += 0.1 * (max(0.0, loop_start - next_frame) - self.frame_lag)
+            next_frame = loop_start + interval
+            
+            dx, dy, vertical, horizontal = self.step(loop_start)
+            if dx != 0 or dy != 0 or vertical != 0 or horizontal != 0:
+                self._inject_frame(dx, dy, vertical, horizontal)
+            with self._clients_lock:
+                pairs = list(self._clients.values())
+            for input_smoother, _ in pairs:
+                input_smoother.note_injected()
+            
+            elapsed = time.time() - loop_start
+            self.frames += 1
+            self.last_frame_cost = elapsed
+            self.total_frame_cost += elapsed
+            self.frame_time.observe(elapsed)
+            if elapsed > interval:
+                self.frames_overrun += 1
+            
+            sleep_time = interval - elapsed
+            if sleep_time > 0:
+                time.sleep(sleep_time)
@@ -0,0 +1,418 @@
+"""
+Offline parameter sweep for the movement smoother (NumPy, optional).
+
+Instead of another hand-tuning round, this replays traces through every
+combination of smoother constants at once: the InputSmoother state
+(charge, sub-pixel, velocity, direction, ...) is held in NumPy arrays with
+one column per combination, and each frame of step() is evaluated for all
+columns in one vectorized pass. The arithmetic mirrors smoother.py
+operation for operation, so the column holding the server's current
+values reproduces the simulator's golden trajectory exactly (--verify).
+
+Swept constants: discharge_rate and continuation_timeout_ms, the two that
+shape the output (smoothing_factor and velocity_decay are accepted by
+InputSmoother but do not enter step()).
+
+Each combination is ranked on a weighted latency-versus-smoothness cost:
+
+    lag_px * w_lag + jerk_px * w_jerk + overshoot_px * w_overshoot
+      + stalled_frames * w_stall + conservation_error * w_loss
+
+summed over all traces (see simulator.trajectory_metrics for the terms).
+The best combination is written as a JSON profile that the server loads
+with --tuning PATH.
+
+NumPy is only needed here; the server itself stays dependency-free.
+
+Usage:
+    python3 -m server.tuner --out tuning.json
+    python3 -m server.tuner --trace stroke1.json --trace stroke2.json --out tuning.json
+    python3 -m server.tuner --verify
+"""
+
+import sys
+import json
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .config import INPUT_SMOOTHER_PARAMS, SCROLL_SMOOTHER_PARAMS
+from .simulator import SCENARIOS, TraceEvent, load_trace, simulate, synthetic_trace
+
+DEFAULT_WEIGHTS = {
+    "lag": 1.0,
+    "jerk": 4.0,
+    "overshoot": 2.0,
+    "stall": 1.0,
+    "loss": 2.0,
+}
+
+
+def sweep_trace(
+    trace: List[TraceEvent],
+    discharge_rates,
+    continuation_timeouts_ms,
+    target_fps: int = 60,
+    tail: float = 0.5
+):
+    """
+    Replay one trace through every (discharge_rate, timeout) column at once.
+    
+    Args:
+        trace: Events sorted by arrival time (only MOVE is used)
+        discharge_rates: Array of discharge rates, one per column
+        continuation_timeouts_ms: Array of timeouts (ms), one per column
+        target_fps: Output frame rate
+        tail: Seconds simulated after the last event
+    
+    Returns:
+        (out_x, out_y) integer arrays of shape (frames, columns)
+    """
+    rate = np.asarray(discharge_rates, dtype=np.float64)
+    timeout = np.asarray(continuation_timeouts_ms, dtype=np.float64) / 1000.0
+    columns = rate.shape[0]
+    
+    # Same virtual clock origin as the simulator (0 means "no input yet")
+    start = 1000.0
+    interval = 1.0 / target_fps
+    moves = [event for event in trace if event[1] == "MOVE"]
+    end = (trace[-1][0] if trace else 0.0) + tail
+    
+    # === VECTORIZED SMOOTHER STATE (one column per combination) ===
+    charge_x = np.zeros(columns)
+    charge_y = np.zeros(columns)
+    subpixel_x = np.zeros(columns)
+    subpixel_y = np.zeros(columns)
+    velocity_x = np.zeros(columns)
+    velocity_y = np.zeros(columns)
+    direction_x = np.zeros(columns)
+    direction_y = np.zeros(columns)
+    speed = np.zeros(columns)
+    active = np.zeros(columns, dtype=bool)
+    last_input_time = 0.0  # Shared: every column sees the same packets
+    
+    # Adaptive discharge rates (smoother.py STATE 1)
+    rate_large = np.minimum(rate * 1.5, 0.27)
+    rate_small = np.maximum(rate * 0.7, 0.12)
+    
+    frames_x: List = []
+    frames_y: List = []
+    next_event = 0
+    frame = 1
+    
+    while frame * interval <= end:
+        frame_time = start + frame * interval
+        
+        # === CHARGE (_apply_movement_locked) ===
+        while next_event < len(moves) and start + moves[next_event][0] <= frame_time:
+            arrival, _, dx, dy = moves[next_event]
+            current_time = start + arrival
+            charge_x += dx
+            charge_y += dy
+            
+            dt = current_time - last_input_time if last_input_time > 0 else interval
+            if dt < 0.001:
+                dt = interval
+            frames_elapsed = max(dt * target_fps, 1)
+            new_vx = dx / frames_elapsed
+            new_vy = dy / frames_elapsed
+            
+            turn = (dx * velocity_x + dy * velocity_y) < 0
+            velocity_x[turn] = 0
+            velocity_y[turn] = 0
+            
+            blend = 0.6
+            velocity_x = velocity_x * (1 - blend) + new_vx * blend
+            velocity_y = velocity_y * (1 - blend) + new_vy * blend
+            
+            new_speed = np.sqrt(velocity_x**2 + velocity_y**2)
+            update = new_speed > 0.05
+            safe_speed = np.where(update, new_speed, 1.0)
+            direction_x = np.where(update, velocity_x / safe_speed, direction_x)
+            direction_y = np.where(update, velocity_y / safe_speed, direction_y)
+            speed = np.where(update, new_speed, speed)
+            
+            active[:] = True
+            last_input_time = current_time
+            next_event += 1
+        
+        # === DISCHARGE / CONTINUATION / IDLE (step) ===
+        time_since_input = frame_time - last_input_time
+        out_x = np.zeros(columns)
+        out_y = np.zeros(columns)
+        
+        charged = (charge_x != 0) | (charge_y != 0)
+        magnitude = np.sqrt(charge_x**2 + charge_y**2)
+        frame_rate = np.where(magnitude > 10, rate_large, np.where(magnitude < 2, rate_small, rate))
+        out_x = np.where(charged, charge_x * frame_rate, out_x)
+        out_y = np.where(charged, charge_y * frame_rate, out_y)
+        charge_x = charge_x - out_x
+        charge_y = charge_y - out_y
+        
+        residual_x = charged & (np.abs(charge_x) < 0.02)
+        residual_y = charged & (np.abs(charge_y) < 0.02)
+        out_x = np.where(residual_x, out_x + charge_x, out_x)
+        out_y = np.where(residual_y, out_y + charge_y, out_y)
+        charge_x = np.where(residual_x, 0.0, charge_x)
+        charge_y = np.where(residual_y, 0.0, charge_y)
+        
+        continuing = ~charged & active & (time_since_input < timeout)
+        progress = np.where(continuing, time_since_input / timeout, 0.0)
+        continue_speed = speed * (1.0 - progress) ** 2 * 0.5
+        momentum = continuing & (continue_speed > 0.03)
+        out_x = np.where(momentum, direction_x * continue_speed, out_x)
+        out_y = np.where(momentum, direction_y * continue_speed, out_y)
+        
+        idle = ~charged & active & (time_since_input >= timeout)
+        active = active & ~idle
+        speed = np.where(idle, 0.0, speed)
+        velocity_x = np.where(idle, 0.0, velocity_x)
+        velocity_y = np.where(idle, 0.0, velocity_y)
+        
+        subpixel_x = subpixel_x + out_x
+        subpixel_y = subpixel_y + out_y
+        int_x = np.trunc(subpixel_x)
+        int_y = np.trunc(subpixel_y)
+        subpixel_x = subpixel_x - int_x
+        subpixel_y = subpixel_y - int_y
+        
+        frames_x.append(int_x.astype(np.int64))
+        frames_y.append(int_y.astype(np.int64))
+        frame += 1
+    
+    return np.array(frames_x), np.array(frames_y)
+
+
+def sweep_metrics(trace: List[TraceEvent], out_x, out_y, target_fps: int = 60) -> Dict[str, object]:
+    """
+    simulator.trajectory_metrics for every column at once.
+    
+    Returns a dict of arrays (one value per column).
+    """
+    interval = 1.0 / target_fps
+    moves = [event for event in trace if event[1] == "MOVE"]
+    frame_count = out_x.shape[0]
+    frame_times = (np.arange(frame_count) + 1) * interval
+    
+    # Cumulative input at each frame (shared by all columns)
+    in_x = np.zeros(frame_count)
+    in_y = np.zeros(frame_count)
+    for arrival, _, dx, dy in moves:
+        index = max(0, int(np.searchsorted(frame_times, arrival)))
+        if index < frame_count:
+            in_x[index] += dx
+            in_y[index] += dy
+    in_x = np.cumsum(in_x)
+    in_y = np.cumsum(in_y)
+    total_in_x = sum(event[2] for event in moves)
+    total_in_y = sum(event[3] for event in moves)
+    magnitude = float(np.hypot(total_in_x, total_in_y))
+    unit_x, unit_y = (total_in_x / magnitude, total_in_y / magnitude) if magnitude else (0.0, 0.0)
+    
+    cum_x = np.cumsum(out_x, axis=0)
+    cum_y = np.cumsum(out_y, axis=0)
+    
+    # Overshoot past the input along its direction
+    overshoot = np.maximum(0.0, ((cum_x * unit_x + cum_y * unit_y) - magnitude).max(axis=0))
+    
+    # Mean distance behind the input while input is arriving
+    last_input = moves[-1][0] if moves else 0.0
+    during = frame_times <= last_input
+    if during.any():
+        lag = np.hypot(in_x[during, None] - cum_x[during], in_y[during, None] - cum_y[during]).mean(axis=0)
+    else:
+        lag = np.zeros(out_x.shape[1])
+    
+    # Smoothness over the span where output was moving
+    speeds = np.hypot(out_x, out_y)
+    moving = speeds > 0
+    any_moving = moving.any(axis=0)
+    first = np.argmax(moving, axis=0)
+    last = frame_count - 1 - np.argmax(moving[::-1], axis=0)
+    rows = np.arange(frame_count)[:, None]
+    in_span = (rows >= first) & (rows <= last) & any_moving
+    stalls = (in_span & ~moving).sum(axis=0)
+    pair_in_span = in_span[:-1] & in_span[1:]
+    jumps = (np.abs(np.diff(speeds, axis=0)) * pair_in_span).sum(axis=0)
+    pairs = pair_in_span.sum(axis=0)
+    jerk = np.where(pairs > 0, jumps / np.maximum(pairs, 1), 0.0)
+    
+    conservation = np.hypot(cum_x[-1] - total_in_x, cum_y[-1] - total_in_y)
+    
+    return {
+        "mean_lag_px": lag,
+        "jerk_px": jerk,
+        "overshoot_px": overshoot,
+        "stalled_frames": stalls,
+        "conservation_error": conservation,
+    }
+
+
+def cost(metrics: Dict[str, object], weights: Dict[str, float]):
+    """Weighted latency-versus-smoothness cost per column."""
+    return (
+        metrics["mean_lag_px"] * weights["lag"]
+        + metrics["jerk_px"] * weights["jerk"]
+        + metrics["overshoot_px"] * weights["overshoot"]
+        + metrics["stalled_frames"] * weights["stall"]
+        + metrics["conservation_error"] * weights["loss"]
+    )
+
+
+def default_traces() -> List[Tuple[str, List[TraceEvent]]]:
+    """The simulator's movement scenarios (passthrough is not modelled here)."""
+    traces = []
+    for name, (trace_kwargs, passthrough) in sorted(SCENARIOS.items()):
+        if passthrough or trace_kwargs.get("kind", "MOVE") != "MOVE":
+            continue
+        traces.append((name, synthetic_trace(**trace_kwargs)))
+    return traces
+
+
+def load_profile(path: str) -> Tuple[Dict[str, object], Dict[str, object]]:
+    """
+    Read a tuning profile; returns (input smoother params, scroll smoother params).
+    
+    Values in the profile override the defaults in config.py. Unknown keys
+    are rejected so a typo cannot silently leave a default in place.
+    """
+    with open(path) as f:
+        profile = json.load(f)
+    
+    params = []
+    for section, defaults in (("input_smoother", INPUT_SMOOTHER_PARAMS),
+                              ("scroll_smoother", SCROLL_SMOOTHER_PARAMS)):
+        merged = dict(defaults)
+        overrides = profile.get(section, {})
+        unknown = set(overrides) - set(defaults)
+        if unknown:
+            raise ValueError(f"Unknown {section} parameter(s) in {path}: {', '.join(sorted(unknown))}")
+        merged.update(overrides)
+        params.append(merged)
+    return params[0], params[1]
+
+
+def _grid(spec: List[float]):
+    """Inclusive arange from [start, stop, step]."""
+    start, stop, step = spec
+    return np.round(np.arange(start, stop + step / 2, step), 6)
+
+
+def verify() -> bool:
+    """Check the vectorized replay against the scalar simulator (current parameters)."""
+    ok = True
+    for name, trace in default_traces():
+        expected = simulate(trace)["frames"]
+        out_x, out_y = sweep_trace(
+            trace,
+            [INPUT_SMOOTHER_PARAMS["discharge_rate"]],
+            [INPUT_SMOOTHER_PARAMS["continuation_timeout_ms"]],
+            INPUT_SMOOTHER_PARAMS["target_fps"]
+        )
+        actual = [[int(x), int(y)] for x, y in zip(out_x[:, 0], out_y[:, 0])]
+        matches = actual == [frame[:2] for frame in expected]
+        ok = ok and matches
+        print(f"{name:12s} {'OK' if matches else 'MISMATCH'} ({len(actual)} frames)")
+    return ok
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Vectorized smoother parameter sweep")
+    parser.add_argument('--trace', action='append', metavar='PATH',
+                        help='JSON trace to tune on (repeatable, default: simulator scenarios)')
+    parser.add_argument('--rates', type=float, nargs=3, default=[0.08, 0.30, 0.005],
+                        metavar=('START', 'STOP', 'STEP'),
+                        help='discharge_rate grid (default: 0.08 0.30 0.005)')
+    parser.add_argument('--timeouts', type=float, nargs=3, default=[40, 200, 5],
+                        metavar=('START', 'STOP', 'STEP'),
+                        help='continuation_timeout_ms grid (default: 40 200 5)')
+    parser.add_argument('--weight', action='append', default=[], metavar='TERM=VALUE',
+                        help=f'Cost weight override (terms: {", ".join(DEFAULT_WEIGHTS)})')
+    parser.add_argument('--top', type=int, default=10, help='Combinations to print (default: 10)')
+    parser.add_argument('--out', metavar='PATH', help='Write the best combination as a tuning profile')
+    parser.add_argument('--verify', action='store_true',
+                        help='Check the vectorized replay against the simulator and exit')
+    args = parser.parse_args()
+    
+    if np is None:
+        print("The tuner needs NumPy (pip install numpy); the server itself does not.")
+        sys.exit(2)
+    
+    if args.verify:
+        sys.exit(0 if verify() else 1)
+    
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in args.weight:
+        term, _, value = item.partition("=")
+        if term not in weights:
+            parser.error(f"unknown cost term: {term}")
+        weights[term] = float(value)
+    
+    if args.trace:
+        traces = [(path, load_trace(path)) for path in args.trace]
+    else:
+        traces = default_traces()
+    
+    rate_grid, timeout_grid = np.meshgrid(_grid(args.rates), _grid(args.timeouts), indexing="ij")
+    rates = rate_grid.ravel()
+    timeouts = timeout_grid.ravel()
+    fps = INPUT_SMOOTHER_PARAMS["target_fps"]
+    print(f"Sweeping {rates.size} combinations over {len(traces)} trace(s)")
+    
+    total = np.zeros(rates.size)
+    per_metric: Dict[str, object] = {}
+    for _, trace in traces:
+        out_x, out_y = sweep_trace(trace, rates, timeouts, fps)
+        metrics = sweep_metrics(trace, out_x, out_y, fps)
+        total += cost(metrics, weights)
+        for key, values in metrics.items():
+            per_metric[key] = per_metric.get(key, 0) + values
+    
+    # Ties (e.g. a timeout that never comes into play) go to the current values
+    distance = (
+        np.abs(rates - INPUT_SMOOTHER_PARAMS["discharge_rate"]) / max(args.rates[2], 1e-9)
+        + np.abs(timeouts - INPUT_SMOOTHER_PARAMS["continuation_timeout_ms"]) / max(args.timeouts[2], 1e-9)
+    )
+    order = np.lexsort((distance, np.round(total, 6)))
+    current = np.flatnonzero(
+        np.isclose(rates, INPUT_SMOOTHER_PARAMS["discharge_rate"])
+        & np.isclose(timeouts, INPUT_SMOOTHER_PARAMS["continuation_timeout_ms"])
+    )
+    
+    def describe(index: int) -> str:
+        return (
+            f"rate={rates[index]:.3f} timeout={timeouts[index]:.0f}ms cost={total[index]:.2f} "
+            f"lag={per_metric['mean_lag_px'][index]:.1f}px jerk={per_metric['jerk_px'][index]:.2f}px "
+            f"overshoot={per_metric['overshoot_px'][index]:.1f}px stalls={int(per_metric['stalled_frames'][index])}"
+        )
+    
+    for rank, index in enumerate(order[:args.top], 1):
+        print(f"{rank:3d}. {describe(index)}")
+    if current.size:
+        print(f"current: {describe(current[0])} (rank {int(np.flatnonzero(order == current[0])[0]) + 1})")
+    
+    if args.out:
+        best = order[0]
+        profile = {
+            "input_smoother": {
+                "discharge_rate": float(rates[best]),
+                "continuation_timeout_ms": int(round(timeouts[best])),
+            },
+            "cost": round(float(total[best]), 3),
+            "weights": weights,
+            "traces": [name for name, _ in traces],
+            "combinations": int(rates.size),
+        }
+        with open(args.out, "w") as f:
+            json.dump(profile, f, indent=2)
+            f.write("\n")
+        print(f"Profile written to {args.out} (load with --tuning {args.out})")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,16 +8,25 @@ import os
 import struct
 import fcntl
 import ctypes
-from typing import Optional
+import select
+import logging
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Deque, Tuple, Union
 
 from .config import (
-    MOUSE_DEVICE_NAME, KEYBOARD_DEVICE_NAME,
+    MOUSE_DEVICE_NAME, KEYBOARD_DEVICE_NAME, ABSOLUTE_MOUSE_DEVICE_NAME,
     KEY_MAP, BUTTON_MAP,
-    EV_SYN, EV_KEY, EV_REL,
+    EV_SYN, EV_KEY, EV_REL, EV_ABS,
     REL_X, REL_Y, REL_WHEEL, REL_HWHEEL,
-    SYN_REPORT
+    REL_WHEEL_HI_RES, REL_HWHEEL_HI_RES, WHEEL_HI_RES_UNITS,
+    ABS_X, ABS_Y, ABS_CNT, ABS_AXIS_MAX,
+    SYN_REPORT, UINPUT_PENDING_MAX
 )
 
+logger = logging.getLogger(__name__)
+
 
 # ioctl constants
 UINPUT_MAX_NAME_SIZE = 80
@@ -26,6 +35,7 @@ UINPUT_MAX_NAME_SIZE = 80
 UI_SET_EVBIT = 0x40045564
 UI_SET_KEYBIT = 0x40045565
 UI_SET_RELBIT = 0x40045566
+UI_SET_ABSBIT = 0x40045567
 UI_DEV_CREATE = 0x5501
 UI_DEV_DESTROY = 0x5502
 
@@ -48,18 +58,100 @@ UI_DEV_DESTROY = 0x5502
 # name: 80 bytes
 # bustype, vendor, product, version: 4 * 2 bytes = 8 bytes
 # ff_effects_max: 4 bytes
-# abs arrays: 4 * 64 * 4 = 1024 bytes (we don't use these for rel devices)
+# abs arrays: 4 * 64 * 4 = 1024 bytes (zero for rel devices, ranges for abs)
+
+UINPUT_USER_DEV_SIZE = 80 + 8 + 4 + (4 * ABS_CNT * 4)
+
+# struct input_event {
+#     struct timeval time;  # 16 bytes on 64-bit
+#     __u16 type;
+#     __u16 code;
+#     __s32 value;
+# };
+# Total: 24 bytes on 64-bit systems
+INPUT_EVENT_FORMAT = "llHHi"
+INPUT_EVENT_SIZE = struct.calcsize(INPUT_EVENT_FORMAT)
+
+# EV_KEY values for key states
+KEY_STATE_VALUES = {"UP": 0, "DOWN": 1}
+
+# Prebuilt sync event (every report ends with one)
+SYN_EVENT = struct.pack(INPUT_EVENT_FORMAT, 0, 0, EV_SYN, SYN_REPORT, 0)
+
+# A pending report is either exact bytes (keys, buttons, raw events) or a
+# dict of relative axis deltas {code: value} that later motion can fold into.
+PendingReport = Union[bytes, Dict[int, int]]
+
+# What a queued report is, for choosing what a full queue may give up
+REPORT_MOTION = 0   # Relative/absolute motion or wheel: can be dropped
+REPORT_PRESS = 1    # Key/button presses only: droppable with their release
+REPORT_RELEASE = 2  # Contains a release (or is not parsable): never dropped
 
-UINPUT_USER_DEV_SIZE = 80 + 8 + 4 + (4 * 64 * 4)
+
+def _report_kind(report: PendingReport) -> int:
+    """Classify a pending report (REPORT_MOTION / REPORT_PRESS / REPORT_RELEASE)."""
+    if isinstance(report, dict):
+        return REPORT_MOTION
+    if len(report) % INPUT_EVENT_SIZE:
+        return REPORT_RELEASE  # Remainder of a partial write: keep intact
+    kind = REPORT_MOTION
+    for _, _, ev_type, _, value in struct.iter_unpack(INPUT_EVENT_FORMAT, report):
+        if ev_type == EV_KEY:
+            if value == 0:
+                return REPORT_RELEASE
+            kind = REPORT_PRESS
+        elif ev_type not in (EV_SYN, EV_REL, EV_ABS):
+            return REPORT_RELEASE
+    return kind
+
+
+def _single_key(report: PendingReport) -> Optional[Tuple[int, int]]:
+    """(code, value) if report is exactly one key/button event, else None."""
+    if isinstance(report, dict) or len(report) % INPUT_EVENT_SIZE:
+        return None
+    keys = [
+        (code, value)
+        for _, _, ev_type, code, value in struct.iter_unpack(INPUT_EVENT_FORMAT, report)
+        if ev_type == EV_KEY
+    ]
+    return keys[0] if len(keys) == 1 else None
 
 
 class UInputDevice:
-    """Base class for uinput virtual devices."""
+    """
+    Base class for uinput virtual devices.
+    
+    The uinput fd is opened with O_NONBLOCK. When the kernel buffer is full
+    (e.g. the compositor stalls), writes fail with EAGAIN. Instead of losing
+    the event, the report is parked in a bounded per-device pending queue:
+    - Relative motion/wheel reports are coalesced into a single report
+    - Key and button reports are kept as-is, in exact order
+    - The queue is flushed as soon as the fd is writable again
     
-    def __init__(self, name: str):
+    When the queue is full, motion goes first. After that, the oldest press
+    whose release is also queued is dropped together with that release.
+    Releases are never dropped: a lost key/button UP would leave it stuck
+    in the compositor. They are queued even past the bound.
+    """
+    
+    def __init__(self, name: str, max_pending: int = UINPUT_PENDING_MAX):
         self.name = name
         self.fd: Optional[int] = None
         self._closed = False
+        
+        # === WRITE BACKPRESSURE QUEUE ===
+        self._pending: Deque[PendingReport] = deque()
+        self._max_pending = max_pending
+        self._write_lock = threading.Lock()  # Keeps reports atomic across threads
+        self._flush_wakeup = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+        
+        # === COUNTERS ===
+        self.reports_queued = 0     # Reports parked because of EAGAIN
+        self.reports_coalesced = 0  # Motion reports folded into a queued one
+        self.reports_dropped = 0    # Reports discarded because the queue was full
+        self.reports_written = 0    # Reports fully handed to the kernel
+        self.write_errors = 0       # Writes that failed with an error other than EAGAIN
     
     def _open_uinput(self) -> int:
         """Open /dev/uinput and return file descriptor."""
@@ -72,29 +164,196 @@ class UInputDevice:
                     continue
         raise OSError("Cannot open uinput device. Are you running as root?")
     
+    @staticmethod
+    def _pack_event(ev_type: int, code: int, value: int) -> bytes:
+        """Pack a single input_event (time is 0, the kernel fills it in)."""
+        return struct.pack(INPUT_EVENT_FORMAT, 0, 0, ev_type, code, value)
+    
+    @staticmethod
+    def _pack_report(report: PendingReport) -> bytes:
+        """Serialize a pending report into raw input_event bytes."""
+        if isinstance(report, dict):
+            events = [
+                struct.pack(INPUT_EVENT_FORMAT, 0, 0, EV_REL, code, value)
+                for code, value in report.items() if value != 0
+            ]
+            return b''.join(events) + SYN_EVENT
+        return report
+    
     def _write_event(self, ev_type: int, code: int, value: int):
         """Write an input event to the device."""
+        self._submit(self._pack_event(ev_type, code, value))
+    
+    def _sync(self):
+        """Send a sync event to flush the event queue."""
+        self._submit(SYN_EVENT)
+    
+    def _submit(self, report: PendingReport):
+        """
+        Write a report, or queue it if the kernel buffer is full.
+        
+        Anything already pending is flushed first so ordering is preserved:
+        a new report is never written ahead of an older queued one.
+        """
         if self.fd is None:
             raise RuntimeError("Device not initialized")
         
-        # struct input_event {
-        #     struct timeval time;  # 16 bytes on 64-bit
-        #     __u16 type;
-        #     __u16 code;
-        #     __s32 value;
-        # };
-        # Total: 24 bytes on 64-bit systems
+        with self._write_lock:
+            if self._pending:
+                try:
+                    self._flush_pending_locked()
+                except OSError:  # EAGAIN is handled inside; counted like a direct write
+                    self.write_errors += 1
+                    raise
+            
+            if not self._pending:
+                data = self._pack_report(report)
+                try:
+                    written = os.write(self.fd, data)
+                except BlockingIOError:
+                    written = 0
+                except OSError:
+                    self.write_errors += 1
+                    raise
+                if written >= len(data):
+                    self.reports_written += 1
+                    return
+                if written:
+                    # Partial write: keep the exact remainder
+                    report = data[written:]
+            
+            self._enqueue_locked(report)
+    
+    def write_prebuilt(self, buffer: bytes):
+        """
+        Write a prebuilt buffer of packed input events (including SYNs).
+        
+        The buffer goes out in one write and is kept intact and in order
+        if it has to be queued.
+        """
+        self._submit(buffer)
+    
+    def _enqueue_locked(self, report: PendingReport):
+        """Park a report in the pending queue (caller holds _write_lock)."""
+        # === COALESCE RELATIVE MOTION ===
+        # Consecutive motion/wheel reports merge into the queued tail
+        if isinstance(report, dict) and self._pending and isinstance(self._pending[-1], dict):
+            tail = self._pending[-1]
+            for code, value in report.items():
+                tail[code] = tail.get(code, 0) + value
+            self.reports_coalesced += 1
+            return
+        
+        # === BOUNDED QUEUE ===
+        if len(self._pending) >= self._max_pending:
+            kind = _report_kind(report)
+            # Motion only displaces motion; keys may also displace a finished press/release pair
+            if not (self._evict_motion_locked() or (kind != REPORT_MOTION and self._evict_press_pair_locked())):
+                if kind != REPORT_RELEASE:
+                    self.reports_dropped += 1
+                    return
+                # Releases are queued past the bound rather than lost
         
-        # We use 0 for time (kernel will fill it in)
-        event = struct.pack("llHHi", 0, 0, ev_type, code, value)
-        os.write(self.fd, event)
+        self._pending.append(dict(report) if isinstance(report, dict) else report)
+        self.reports_queued += 1
+        self._start_flusher()
     
-    def _sync(self):
-        """Send a sync event to flush the event queue."""
-        self._write_event(EV_SYN, SYN_REPORT, 0)
+    def _evict_motion_locked(self) -> bool:
+        """Drop the oldest queued motion report to make room."""
+        for index, queued in enumerate(self._pending):
+            if _report_kind(queued) == REPORT_MOTION:
+                del self._pending[index]
+                self.reports_dropped += 1
+                return True
+        return False
+    
+    def _evict_press_pair_locked(self) -> bool:
+        """Drop the oldest queued press together with its queued release."""
+        pending = self._pending
+        for index, queued in enumerate(pending):
+            press = _single_key(queued)
+            if press is None or press[1] != 1:
+                continue
+            for later in range(index + 1, len(pending)):
+                event = _single_key(pending[later])
+                if event is not None and event[0] == press[0]:
+                    if event[1] != 0:
+                        break  # Pressed again before any release: keep both
+                    del pending[later]
+                    del pending[index]
+                    self.reports_dropped += 2
+                    return True
+        return False
+    
+    def _flush_pending_locked(self):
+        """Write queued reports in order until empty or EAGAIN (caller holds _write_lock)."""
+        while self._pending:
+            data = self._pack_report(self._pending[0])
+            try:
+                written = os.write(self.fd, data)
+            except BlockingIOError:
+                return
+            if written < len(data):
+                self._pending[0] = data[written:]
+                return
+            self._pending.popleft()
+            self.reports_written += 1
+    
+    def _start_flusher(self):
+        """Wake (or lazily start) the thread that drains the pending queue."""
+        if self._flush_thread is None:
+            self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flush_thread.start()
+        self._flush_wakeup.set()
+    
+    def _flush_loop(self):
+        """Wait for the fd to become writable and drain the pending queue."""
+        while not self._closed:
+            self._flush_wakeup.wait()
+            fd = self.fd
+            if fd is None:
+                break
+            
+            try:
+                select.select([], [fd], [], 0.1)
+                with self._write_lock:
+                    self._flush_pending_locked()
+                    if not self._pending:
+                        self._flush_wakeup.clear()
+                        continue
+            except (OSError, ValueError) as e:
+                if not self._closed:
+                    logger.error(f"uinput flush error on {self.name}: {e}")
+                with self._write_lock:
+                    self.write_errors += 1
+                    self.reports_dropped += len(self._pending)
+                    self._pending.clear()
+                    self._flush_wakeup.clear()
+                continue
+            
+            # Still full: uinput reports POLLOUT unconditionally, so back off briefly
+            time.sleep(0.001)
     
-    def _create_device(self, setup_func):
-        """Create the uinput device with given setup function."""
+    @property
+    def write_stats(self) -> Dict[str, int]:
+        """Backpressure counters for this device."""
+        return {
+            "pending": len(self._pending),
+            "queued": self.reports_queued,
+            "coalesced": self.reports_coalesced,
+            "dropped": self.reports_dropped,
+            "written": self.reports_written,
+            "errors": self.write_errors,
+        }
+    
+    def _create_device(self, setup_func, abs_ranges: Optional[Dict[int, Tuple[int, int]]] = None):
+        """
+        Create the uinput device with given setup function.
+        
+        Args:
+            setup_func: Callback that enables event types and codes via ioctl
+            abs_ranges: Optional {abs_code: (absmin, absmax)} for EV_ABS axes
+        """
         self.fd = self._open_uinput()
         
         # Setup event types and codes
@@ -110,8 +369,15 @@ class UInputDevice:
         user_dev += struct.pack("HHHH", 0x03, 0x1234, 0x5678, 1)
         # ff_effects_max
         user_dev += struct.pack("i", 0)
-        # abs arrays (not used for relative devices)
-        user_dev += b'\x00' * (4 * 64 * 4)
+        # abs arrays: absmax, absmin, absfuzz, absflat (all zero for relative devices)
+        absmax = [0] * ABS_CNT
+        absmin = [0] * ABS_CNT
+        for code, (lo, hi) in (abs_ranges or {}).items():
+            absmin[code] = lo
+            absmax[code] = hi
+        user_dev += struct.pack(f"{ABS_CNT}i", *absmax)
+        user_dev += struct.pack(f"{ABS_CNT}i", *absmin)
+        user_dev += b'\x00' * (4 * ABS_CNT * 2)
         
         os.write(self.fd, user_dev)
         
@@ -121,6 +387,11 @@ class UInputDevice:
     def close(self):
         """Destroy the uinput device."""
         if self.fd is not None and not self._closed:
+            self._closed = True
+            self._flush_wakeup.set()
+            if self._flush_thread:
+                self._flush_thread.join(timeout=0.5)
+                self._flush_thread = None
             try:
                 fcntl.ioctl(self.fd, UI_DEV_DESTROY)
             except:
@@ -129,7 +400,6 @@ class UInputDevice:
                 os.close(self.fd)
             except:
                 pass
-            self._closed = True
             self.fd = None
     
     def __enter__(self):
@@ -141,10 +411,23 @@ class UInputDevice:
 
 
 class VirtualMouse(UInputDevice):
-    """Virtual mouse device for cursor movement, scrolling, and clicks."""
+    """
+    Virtual mouse device for cursor movement, scrolling, and clicks.
+    
+    The wheel is advertised with high-resolution axes (REL_WHEEL_HI_RES,
+    REL_HWHEEL_HI_RES) so fractional scrolling reaches applications as-is.
+    Legacy REL_WHEEL/REL_HWHEEL notches are synthesised alongside for
+    applications that only understand whole notches.
+    """
     
     def __init__(self, name: str = MOUSE_DEVICE_NAME):
         super().__init__(name)
+        
+        # === LEGACY NOTCH ACCUMULATOR ===
+        # High-resolution units not yet worth a full legacy notch
+        self._wheel_remainder_v = 0
+        self._wheel_remainder_h = 0
+        
         self._setup_mouse()
     
     def _setup_mouse(self):
@@ -163,17 +446,15 @@ class VirtualMouse(UInputDevice):
             fcntl.ioctl(self.fd, UI_SET_RELBIT, REL_Y)
             fcntl.ioctl(self.fd, UI_SET_RELBIT, REL_WHEEL)
             fcntl.ioctl(self.fd, UI_SET_RELBIT, REL_HWHEEL)
+            fcntl.ioctl(self.fd, UI_SET_RELBIT, REL_WHEEL_HI_RES)
+            fcntl.ioctl(self.fd, UI_SET_RELBIT, REL_HWHEEL_HI_RES)
         
         self._create_device(setup)
     
     def move(self, dx: int, dy: int):
         """Move the cursor by relative delta values."""
-        if dx != 0:
-            self._write_event(EV_REL, REL_X, dx)
-        if dy != 0:
-            self._write_event(EV_REL, REL_Y, dy)
         if dx != 0 or dy != 0:
-            self._sync()
+            self._submit({REL_X: dx, REL_Y: dy})
     
     def scroll(self, vertical: int, horizontal: int = 0):
         """
@@ -183,12 +464,52 @@ class VirtualMouse(UInputDevice):
             vertical: Positive = scroll up, Negative = scroll down
             horizontal: Positive = scroll right, Negative = scroll left
         """
-        if vertical != 0:
-            self._write_event(EV_REL, REL_WHEEL, vertical)
-        if horizontal != 0:
-            self._write_event(EV_REL, REL_HWHEEL, horizontal)
-        if vertical != 0 or horizontal != 0:
-            self._sync()
+        self.scroll_hires(vertical * WHEEL_HI_RES_UNITS, horizontal * WHEEL_HI_RES_UNITS)
+    
+    def scroll_hires(self, vertical: int, horizontal: int = 0):
+        """
+        Scroll the mouse wheel in high-resolution (1/120 notch) units.
+        
+        Emits REL_WHEEL_HI_RES/REL_HWHEEL_HI_RES directly and a legacy
+        REL_WHEEL/REL_HWHEEL notch in the same report each time the
+        accumulated amount crosses a whole notch.
+        
+        Args:
+            vertical: Positive = scroll up, Negative = scroll down
+            horizontal: Positive = scroll right, Negative = scroll left
+        """
+        if vertical == 0 and horizontal == 0:
+            return
+        self._submit(self._wheel_report(vertical, horizontal))
+    
+    def frame(self, dx: int, dy: int, vertical: int = 0, horizontal: int = 0):
+        """
+        Inject motion and hi-res scroll together as ONE report (one SYN).
+        
+        Used when several clients' output is merged per frame.
+        """
+        report = self._wheel_report(vertical, horizontal) if (vertical or horizontal) else {}
+        report[REL_X] = dx
+        report[REL_Y] = dy
+        if any(report.values()):
+            self._submit(report)
+    
+    def _wheel_report(self, vertical: int, horizontal: int) -> Dict[int, int]:
+        """Build hi-res wheel deltas plus any legacy notches now due."""
+        # Truncate toward zero so direction changes never emit a stray notch
+        self._wheel_remainder_v += vertical
+        self._wheel_remainder_h += horizontal
+        notches_v = int(self._wheel_remainder_v / WHEEL_HI_RES_UNITS)
+        notches_h = int(self._wheel_remainder_h / WHEEL_HI_RES_UNITS)
+        self._wheel_remainder_v -= notches_v * WHEEL_HI_RES_UNITS
+        self._wheel_remainder_h -= notches_h * WHEEL_HI_RES_UNITS
+        
+        return {
+            REL_WHEEL_HI_RES: vertical,
+            REL_HWHEEL_HI_RES: horizontal,
+            REL_WHEEL: notches_v,
+            REL_HWHEEL: notches_h,
+        }
     
     def click(self, button: str, state: str):
         """
@@ -203,12 +524,64 @@ class VirtualMouse(UInputDevice):
             raise ValueError(f"Unknown button: {button}")
         
         value = 1 if state.upper() == "DOWN" else 0
-        self._write_event(EV_KEY, button_code, value)
-        self._sync()
+        self._submit(self._pack_event(EV_KEY, button_code, value) + SYN_EVENT)
+
+
+class VirtualAbsoluteMouse(UInputDevice):
+    """
+    Tablet-style virtual pointer using absolute EV_ABS X/Y axes.
+    
+    Each report carries the full position, so a dropped or coalesced
+    frame never causes drift: only the latest coordinate matters.
+    Kept as a separate device because compositors classify a device
+    as either relative or absolute.
+    """
+    
+    def __init__(self, name: str = ABSOLUTE_MOUSE_DEVICE_NAME, axis_max: int = ABS_AXIS_MAX):
+        super().__init__(name)
+        self.axis_max = axis_max
+        self._setup_absolute()
+    
+    def _setup_absolute(self):
+        """Configure and create the virtual absolute pointer."""
+        def setup():
+            # Enable event types
+            fcntl.ioctl(self.fd, UI_SET_EVBIT, EV_KEY)  # Buttons mark it as a pointer
+            fcntl.ioctl(self.fd, UI_SET_EVBIT, EV_ABS)  # For position
+            
+            for button_code in BUTTON_MAP.values():
+                fcntl.ioctl(self.fd, UI_SET_KEYBIT, button_code)
+            
+            # Enable absolute axes
+            fcntl.ioctl(self.fd, UI_SET_ABSBIT, ABS_X)
+            fcntl.ioctl(self.fd, UI_SET_ABSBIT, ABS_Y)
+        
+        self._create_device(setup, abs_ranges={
+            ABS_X: (0, self.axis_max),
+            ABS_Y: (0, self.axis_max),
+        })
+    
+    def move_to(self, x: int, y: int):
+        """Move the cursor to an absolute position (0..axis_max on both axes)."""
+        x = min(max(x, 0), self.axis_max)
+        y = min(max(y, 0), self.axis_max)
+        self._submit(
+            self._pack_event(EV_ABS, ABS_X, x)
+            + self._pack_event(EV_ABS, ABS_Y, y)
+            + SYN_EVENT
+        )
 
 
 class VirtualKeyboard(UInputDevice):
-    """Virtual keyboard device for key press/release events."""
+    """
+    Virtual keyboard device for key press/release events.
+    
+    A REPEAT is written as a release report followed by a press report.
+    libinput drops EV_KEY value 2, but it passes a fresh press on to
+    applications like any other keystroke. The fresh press also restarts
+    the compositor's own repeat delay, so the server's timing is the only
+    one in effect.
+    """
     
     def __init__(self, name: str = KEYBOARD_DEVICE_NAME):
         super().__init__(name)
@@ -232,17 +605,104 @@ class VirtualKeyboard(UInputDevice):
         
         Args:
             key: Key name (e.g., "KEY_A", "KEY_ENTER")
-            state: "DOWN" (press) or "UP" (release)
+            state: "DOWN" (press), "UP" (release) or "REPEAT" (re-press of
+                   a held key)
         """
         keycode = KEY_MAP.get(key.upper())
         if keycode is None:
             raise ValueError(f"Unknown key: {key}")
         
-        value = 1 if state.upper() == "DOWN" else 0
-        self._write_event(EV_KEY, keycode, value)
-        self._sync()
+        state = state.upper()
+        if state == "REPEAT":
+            # Separate reports: the pending queue treats them like any release and press
+            self._submit(self._pack_event(EV_KEY, keycode, 0) + SYN_EVENT)
+            state = "DOWN"
+        value = KEY_STATE_VALUES.get(state, 0)
+        self._submit(self._pack_event(EV_KEY, keycode, value) + SYN_EVENT)
     
     def type_key(self, key: str):
         """Press and release a key (convenience method)."""
         self.key_event(key, "DOWN")
         self.key_event(key, "UP")
+
+
+class NullMouse:
+    """
+    Drop-in VirtualMouse stand-in that only counts events.
+    
+    Lets the full server pipeline run without /dev/uinput or root
+    (loopback load tests, replay, benchmarks).
+    """
+    
+    def __init__(self, name: str = MOUSE_DEVICE_NAME):
+        self.name = name
+        self.reports = 0
+        self.moved_x = 0
+        self.moved_y = 0
+        self.scrolled_v = 0
+        self.scrolled_h = 0
+        self.clicks = 0
+        self.last_position: Optional[Tuple[int, int]] = None
+    
+    def move(self, dx: int, dy: int):
+        self.frame(dx, dy)
+    
+    def move_to(self, x: int, y: int):
+        self.reports += 1
+        self.last_position = (x, y)
+    
+    def scroll(self, vertical: int, horizontal: int = 0):
+        self.scroll_hires(vertical * WHEEL_HI_RES_UNITS, horizontal * WHEEL_HI_RES_UNITS)
+    
+    def scroll_hires(self, vertical: int, horizontal: int = 0):
+        self.frame(0, 0, vertical, horizontal)
+    
+    def frame(self, dx: int, dy: int, vertical: int = 0, horizontal: int = 0):
+        self.reports += 1
+        self.moved_x += dx
+        self.moved_y += dy
+        self.scrolled_v += vertical
+        self.scrolled_h += horizontal
+    
+    def click(self, button: str, state: str):
+        if BUTTON_MAP.get(button.upper()) is None:
+            raise ValueError(f"Unknown button: {button}")
+        self.reports += 1
+        self.clicks += 1
+    
+    @property
+    def write_stats(self) -> Dict[str, int]:
+        return {"pending": 0, "queued": 0, "coalesced": 0, "dropped": 0, "written": self.reports, "errors": 0}
+    
+    def close(self):
+        pass
+
+
+class NullKeyboard:
+    """Drop-in VirtualKeyboard stand-in that only counts events."""
+    
+    def __init__(self, name: str = KEYBOARD_DEVICE_NAME):
+        self.name = name
+        self.reports = 0
+        self.key_events = 0
+    
+    def key_event(self, key: str, state: str):
+        if KEY_MAP.get(key.upper()) is None:
+            raise ValueError(f"Unknown key: {key}")
+        events = 2 if state.upper() == "REPEAT" else 1  # Release + press
+        self.reports += events
+        self.key_events += events
+    
+    def type_key(self, key: str):
+        self.key_event(key, "DOWN")
+        self.key_event(key, "UP")
+    
+    def write_prebuilt(self, buffer: bytes):
+        self.reports += 1
+    
+    @property
+    def write_stats(self) -> Dict[str, int]:
+        return {"pending": 0, "queued": 0, "coalesced": 0, "dropped": 0, "written": self.reports, "errors": 0}
+    
+    def close(self):
+        pass